@@ -0,0 +1,174 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid
+from dotenv import load_dotenv
+
+from database import get_db
+from utils.leases import acquire_lease
+
+load_dotenv()
+
+# Results older than RESULT_ARCHIVE_AFTER_DAYS move to results_archive; 0 disables the job
+RESULT_ARCHIVE_AFTER_DAYS = int(os.getenv("RESULT_ARCHIVE_AFTER_DAYS", "0"))
+RESULT_ARCHIVE_INTERVAL_HOURS = float(os.getenv("RESULT_ARCHIVE_INTERVAL_HOURS", "24"))
+RESULT_ARCHIVE_BATCH_SIZE = int(os.getenv("RESULT_ARCHIVE_BATCH_SIZE", "1000"))
+
+ARCHIVE_COLLECTION = "results_archive"
+ROLLUP_COLLECTION = "result_rollups"
+# Rollups remember this many recently applied batch ids; a batch is only ever retried by the next pass
+ROLLUP_APPLIED_BATCHES = 50
+
+async def ensure_archive_collection(db) -> None:
+    """Create the archive collection with zstd block compression if it does not exist yet"""
+    try:
+        await db.create_collection(
+            ARCHIVE_COLLECTION,
+            storageEngine={"wiredTiger": {"configString": "block_compressor=zstd"}}
+        )
+        print(f"✅ [ARCHIVE] Created {ARCHIVE_COLLECTION} with zstd compression")
+    except CollectionInvalid:
+        pass
+
+async def find_result(db, result_id: ObjectId) -> Optional[Dict[str, Any]]:
+    """Find a result in the hot collection, falling back to the archive"""
+    result = await db.results.find_one({"_id": result_id})
+    if result is None:
+        result = await db[ARCHIVE_COLLECTION].find_one({"_id": result_id})
+    return result
+
+async def load_rollups(db, user_id: ObjectId) -> List[Dict[str, Any]]:
+    """Summary rollups of a user's archived results, one per topic and difficulty"""
+    return await db[ROLLUP_COLLECTION].find({"user_id": user_id}, {"applied_batches": 0}).to_list(None)
+
+def merge_stats(results: List[Dict[str, Any]], rollups: List[Dict[str, Any]], field: str) -> Dict[str, Dict[str, Any]]:
+    """Per-topic or per-difficulty totals over hot results plus archived rollups, so they add up to the overall totals"""
+    stats: Dict[str, Dict[str, Any]] = {}
+    for key, count, score, questions in (
+        [(r[field], 1, r["score"], r["total_questions"]) for r in results]
+        + [(r[field], r["count"], r["total_score"], r["total_questions"]) for r in rollups]
+    ):
+        entry = stats.setdefault(key, {"count": 0, "total_score": 0, "total_questions": 0})
+        entry["count"] += count
+        entry["total_score"] += score
+        entry["total_questions"] += questions
+    for entry in stats.values():
+        entry["average_score"] = entry["total_score"] / entry["count"] if entry["count"] > 0 else 0
+    return stats
+
+def _rollup_updates(docs: List[Dict[str, Any]], batch_id: ObjectId) -> List[UpdateOne]:
+    """Writes folding one claimed batch into rollups; a rollup that already recorded the batch id is left alone
+
+    Missing rollups are created first, so the guarded increments never need an
+    upsert that could insert a second rollup next to one that skipped the batch.
+    """
+    totals: Dict[Tuple[Any, str, str], Dict[str, Any]] = {}
+    for doc in docs:
+        key = (doc["user_id"], doc["topic"], doc["difficulty"])
+        entry = totals.setdefault(key, {"count": 0, "total_score": 0, "total_questions": 0, "total_time_taken": 0, "last_date": doc["date"]})
+        entry["count"] += 1
+        entry["total_score"] += doc["score"]
+        entry["total_questions"] += doc["total_questions"]
+        entry["total_time_taken"] += doc.get("time_taken") or 0
+        entry["last_date"] = max(entry["last_date"], doc["date"])
+
+    keys = [{"user_id": user_id, "topic": topic, "difficulty": difficulty} for user_id, topic, difficulty in totals]
+    seeds = [UpdateOne(key, {"$setOnInsert": {"applied_batches": []}}, upsert=True) for key in keys]
+    return seeds + [
+        UpdateOne(
+            {**key, "applied_batches": {"$ne": batch_id}},
+            {
+                "$inc": {
+                    "count": entry["count"],
+                    "total_score": entry["total_score"],
+                    "total_questions": entry["total_questions"],
+                    "total_time_taken": entry["total_time_taken"]
+                },
+                "$max": {"last_date": entry["last_date"]},
+                "$push": {"applied_batches": {"$each": [batch_id], "$slice": -ROLLUP_APPLIED_BATCHES}}
+            }
+        )
+        for key, entry in zip(keys, totals.values())
+    ]
+
+async def _apply_rollup(db, docs: List[Dict[str, Any]], batch_id: ObjectId) -> None:
+    # Ordered, so every rollup exists before its guarded increment runs
+    await db[ROLLUP_COLLECTION].bulk_write(_rollup_updates(docs, batch_id), ordered=True)
+
+async def archive_old_results(db, older_than_days: int, batch_size: int = RESULT_ARCHIVE_BATCH_SIZE) -> int:
+    """Move results older than the cutoff into the archive and fold them into rollups
+
+    Each batch is copied to the archive first (re-copies are ignored), claimed
+    under a rollup batch id, rolled up and only then removed from the hot
+    collection, so an interrupted run can simply be restarted. Rollups record
+    the batch ids they have applied, so a batch retried after a crash between
+    the rollup and the rolled_up flag is not counted twice.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    archive = db[ARCHIVE_COLLECTION]
+    archived = 0
+
+    while True:
+        batch = await db.results.find({"date": {"$lt": cutoff}}).limit(batch_size).to_list(None)
+        if not batch:
+            break
+        ids = [doc["_id"] for doc in batch]
+
+        try:
+            await archive.insert_many([{**doc, "rolled_up": False} for doc in batch], ordered=False)
+        except BulkWriteError as e:
+            # Duplicate keys are documents copied by an earlier, interrupted run
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+
+        # Claim unclaimed copies; copies claimed by an interrupted run keep their batch id
+        await archive.update_many(
+            {"_id": {"$in": ids}, "rolled_up": False, "rollup_batch": {"$exists": False}},
+            {"$set": {"rollup_batch": ObjectId()}}
+        )
+        pending = await archive.find({"_id": {"$in": ids}, "rolled_up": False}).to_list(None)
+        claims: Dict[ObjectId, List[Dict[str, Any]]] = {}
+        for doc in pending:
+            claims.setdefault(doc["rollup_batch"], []).append(doc)
+        for batch_id, docs in claims.items():
+            await _apply_rollup(db, docs, batch_id)
+            await archive.update_many({"_id": {"$in": [doc["_id"] for doc in docs]}}, {"$set": {"rolled_up": True}})
+
+        await db.results.delete_many({"_id": {"$in": ids}})
+        archived += len(batch)
+        print(f"🗄️ [ARCHIVE] Archived {archived} results older than {cutoff.date()}")
+
+    return archived
+
+async def run_archive_loop() -> None:
+    """Periodically archive old results while the app is running; one worker at a time runs the pass"""
+    while True:
+        try:
+            db = await get_db("ingest")
+            if await acquire_lease(db, "archive", RESULT_ARCHIVE_INTERVAL_HOURS * 3600):
+                archived = await archive_old_results(db, RESULT_ARCHIVE_AFTER_DAYS)
+                print(f"✅ [ARCHIVE] Retention pass complete, {archived} results archived")
+        except Exception as e:
+            print(f"❌ [ARCHIVE] Retention pass failed: {e}")
+        await asyncio.sleep(RESULT_ARCHIVE_INTERVAL_HOURS * 3600)
+
+if __name__ == "__main__":
+    from database import init_db, close_db
+
+    async def _main():
+        days = int(sys.argv[1]) if len(sys.argv) > 1 else RESULT_ARCHIVE_AFTER_DAYS
+        if days <= 0:
+            print("Usage: python archive.py <older_than_days>")
+            return
+        db = await init_db()
+        try:
+            await ensure_archive_collection(db)
+            await archive_old_results(db, days)
+        finally:
+            await close_db()
+
+    asyncio.run(_main())
@@ -0,0 +1,263 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+
+from database import get_db
+from utils.cache import LRUCache
+from utils.invalidation import invalidation_bus
+from utils.result_store import UNANSWERED
+
+load_dotenv()
+
+# Server-side assessment attempts: timer, answer key and autosaved answers live here, not in the browser
+ATTEMPT_SECONDS_PER_QUESTION = int(os.getenv("ATTEMPT_SECONDS_PER_QUESTION", "90"))
+ATTEMPT_GRACE_SECONDS = float(os.getenv("ATTEMPT_GRACE_SECONDS", "10"))
+ATTEMPT_AUTOSAVE_FLUSH_MS = int(os.getenv("ATTEMPT_AUTOSAVE_FLUSH_MS", "2000"))
+ATTEMPT_AUTOSAVE_MAX_PENDING = int(os.getenv("ATTEMPT_AUTOSAVE_MAX_PENDING", "20000"))
+# "memory" buffers saves in this worker; "direct" writes every save (serve.py picks it for several workers)
+ATTEMPT_AUTOSAVE_BACKEND = os.getenv("ATTEMPT_AUTOSAVE_BACKEND", "memory").lower()
+
+ATTEMPTS_COLLECTION = "attempts"
+
+# Attempt states; "grading" is held only while a submission writes its result
+ATTEMPT_ACTIVE = "active"
+ATTEMPT_GRADING = "grading"
+ATTEMPT_SUBMITTED = "submitted"
+
+# Everything an answer save needs to validate without a database read, keyed by attempt id
+attempt_cache = LRUCache(max_size=int(os.getenv("ATTEMPT_CACHE_SIZE", "10000")), ttl=3600)
+
+HEADER_PROJECTION = {"user_id": 1, "questions": 1, "deadline": 1, "status": 1}
+
+def attempt_header(attempt: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "user_id": str(attempt["user_id"]),
+        "options": [q["options"] for q in attempt["questions"]],
+        "deadline": attempt["deadline"],
+        "status": attempt["status"]
+    }
+
+async def get_attempt_header(db, attempt_id: str) -> Optional[Dict[str, Any]]:
+    """Read-through lookup of an attempt's owner, options, deadline and status"""
+    header = attempt_cache.get(attempt_id)
+    if header is not None:
+        return header
+    attempt = await db[ATTEMPTS_COLLECTION].find_one({"_id": ObjectId(attempt_id)}, HEADER_PROJECTION)
+    if attempt is None:
+        return None
+    header = attempt_header(attempt)
+    attempt_cache.set(attempt_id, header)
+    return header
+
+def invalidate_attempt(attempt_id: str) -> None:
+    """Drop a cached header here and in every other worker once the attempt's status changes"""
+    attempt_cache.pop(attempt_id)
+    invalidation_bus.publish("attempt", attempt_id)
+
+invalidation_bus.register("attempt", attempt_cache.pop)
+
+def grade_answers(answer_key: List[int], answers: List[int]) -> int:
+    """Number of answers matching the stored answer key"""
+    return sum(1 for correct, given in zip(answer_key, answers) if given != UNANSWERED and given == correct)
+
+class AnswerAutosaver:
+    """Coalesces answer saves in memory and writes them in debounced batches
+
+    Repeated saves of the same question only keep the latest answer, and every
+    attempt touched during a flush window costs one update in a single
+    bulk_write, so a class answering in lockstep does not turn into one write
+    per click. Answers not yet flushed are lost on a crash, which bounds loss to
+    one flush window.
+
+    The buffer belongs to one process: a submission or reload served by another
+    worker cannot see it. With backend "direct" every save is written at once
+    instead, which is what several workers need; clients also send their full
+    answer map with the submission.
+    """
+
+    def __init__(
+        self,
+        flush_interval_ms: int = ATTEMPT_AUTOSAVE_FLUSH_MS,
+        max_pending: int = ATTEMPT_AUTOSAVE_MAX_PENDING,
+        backend: str = ATTEMPT_AUTOSAVE_BACKEND
+    ):
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_pending = max_pending
+        self.direct = backend == "direct"
+        self._pending: Dict[str, Dict[int, int]] = {}
+        self._size = 0
+        self._dirty = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"saved": 0, "coalesced": 0, "flushed": 0, "batches": 0, "failed": 0}
+
+    async def start(self) -> None:
+        if self.direct:
+            print("💾 [AUTOSAVE] Answer autosave writes every save directly")
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            print(f"💾 [AUTOSAVE] Answer autosave started (flush every {self.flush_interval:.1f}s)")
+
+    async def stop(self) -> None:
+        """Stop the flusher and write everything still pending"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush()
+        print("🛑 [AUTOSAVE] Answer autosave stopped")
+
+    def pending(self) -> int:
+        return self._size
+
+    def record(self, attempt_id: str, answers: Dict[int, int]) -> None:
+        """Buffer answers (question index to option index) for the next flush"""
+        buffered = self._pending.setdefault(attempt_id, {})
+        for index, answer in answers.items():
+            if index in buffered:
+                self.stats["coalesced"] += 1
+            else:
+                self._size += 1
+            buffered[index] = answer
+        self.stats["saved"] += len(answers)
+        self._dirty.set()
+        if self._size >= self.max_pending:
+            self._full.set()
+
+    async def save(self, attempt_id: str, answers: Dict[int, int]) -> None:
+        """Record answers; written now with the direct backend, else buffered for the next flush"""
+        if not self.direct:
+            self.record(attempt_id, answers)
+            return
+        self.stats["saved"] += len(answers)
+        await self._write({attempt_id: answers})
+
+    def pending_answers(self, attempt_id: str) -> Dict[int, int]:
+        return dict(self._pending.get(attempt_id, {}))
+
+    async def _run(self) -> None:
+        while True:
+            await self._dirty.wait()
+            # Debounce: let saves accumulate for one window unless the buffer fills first
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    def _take(self, attempt_id: Optional[str] = None) -> Dict[str, Dict[int, int]]:
+        if attempt_id is None:
+            taken, self._pending = self._pending, {}
+        else:
+            taken = {attempt_id: self._pending.pop(attempt_id)} if attempt_id in self._pending else {}
+        self._size -= sum(len(answers) for answers in taken.values())
+        if not self._pending:
+            self._dirty.clear()
+        if self._size < self.max_pending:
+            self._full.clear()
+        return taken
+
+    def _restore(self, taken: Dict[str, Dict[int, int]]) -> None:
+        """Put back answers from a failed flush without overwriting newer saves"""
+        for attempt_id, answers in taken.items():
+            buffered = self._pending.setdefault(attempt_id, {})
+            for index, answer in answers.items():
+                if index not in buffered:
+                    buffered[index] = answer
+                    self._size += 1
+        if self._pending:
+            self._dirty.set()
+
+    async def flush(self, attempt_id: Optional[str] = None) -> int:
+        """Write pending answers of one attempt, or of all; returns how many attempts were updated"""
+        taken = self._take(attempt_id)
+        if not taken:
+            return 0
+        try:
+            return await self._write(taken)
+        except Exception as e:
+            self._restore(taken)
+            print(f"❌ [AUTOSAVE] Flush of {len(taken)} attempts failed, will retry: {e}")
+            if attempt_id is not None:
+                raise
+            return 0
+
+    async def _write(self, taken: Dict[str, Dict[int, int]]) -> int:
+        now = datetime.utcnow()
+        updates = [
+            UpdateOne(
+                {"_id": ObjectId(key), "status": ATTEMPT_ACTIVE},
+                {"$set": {**{f"answers.{index}": answer for index, answer in answers.items()}, "updated_at": now}}
+            )
+            for key, answers in taken.items()
+        ]
+        try:
+            db = await get_db()
+            await db[ATTEMPTS_COLLECTION].bulk_write(updates, ordered=False)
+        except Exception:
+            self.stats["failed"] += len(updates)
+            raise
+        self.stats["batches"] += 1
+        self.stats["flushed"] += len(updates)
+        return len(updates)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "backend": "direct" if self.direct else "memory",
+            "pending": self._size,
+            "attempts": len(self._pending),
+            **self.stats,
+            "cache": attempt_cache.stats()
+        }
+
+answer_autosaver = AnswerAutosaver()
+
+def answer_index(options: List[str], answer: Optional[str]) -> int:
+    """Option index of an answer; None or "" clears it, anything else must be one of the options"""
+    if answer is None or answer == "":
+        return UNANSWERED
+    if answer not in options:
+        raise ValueError(f"Answer is not one of the options: {answer}")
+    return options.index(answer)
+
+def remaining_seconds(deadline: datetime, now: Optional[datetime] = None) -> float:
+    return max(0.0, (deadline - (now or datetime.utcnow())).total_seconds())
+
+def accepts_answers(header: Dict[str, Any], now: Optional[datetime] = None) -> bool:
+    """Answers count until the deadline plus a grace period for requests in flight"""
+    return header["status"] == ATTEMPT_ACTIVE and remaining_seconds(header["deadline"], now) + ATTEMPT_GRACE_SECONDS > 0
+
+def merge_answers(stored: List[int], pending: Dict[int, int]) -> List[int]:
+    answers = list(stored)
+    for index, answer in pending.items():
+        if 0 <= index < len(answers):
+            answers[index] = answer
+    return answers
+
+def question_options(questions: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """Split server-chosen questions into what the client sees and the server-side answer key"""
+    public, answer_key = [], []
+    for q in questions:
+        options = q.get("options", [])
+        answer = q.get("answer", q.get("correctAnswer", ""))
+        if answer not in options:
+            raise ValueError(f"Correct answer is not one of the options: {q.get('question', '')}")
+        public.append({"question": q.get("question", ""), "options": options})
+        answer_key.append(options.index(answer))
+    return public, answer_key
+
+def graded_questions(attempt: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Questions of an attempt with their correct answers put back"""
+    return [
+        {**question, "answer": question["options"][correct]}
+        for question, correct in zip(attempt["questions"], attempt["answer_key"])
+    ]
@@ -0,0 +1,86 @@
+"""Drive a realistic API load through the full FastAPI app on the embedded local store
+
+Run from backend/: python -m benchmarks.api_load [users] [results_per_user] [concurrency]
+
+No MongoDB is needed: DB_BACKEND defaults to "local" (in memory) for this run.
+Set DB_BACKEND=mongo and MONGO_URI to run the same load against a real server.
+"""
+import asyncio
+import os
+import sys
+import time
+from typing import Dict, List
+
+os.environ.setdefault("DB_BACKEND", "local")
+os.environ.setdefault("LOGIN_IP_LIMIT", "1000000")
+os.environ.setdefault("LOGIN_EMAIL_LIMIT", "1000000")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import httpx
+
+from main import app
+
+QUESTIONS = [
+    {"question": f"Benchmark question {i}?", "options": ["a", "b", "c", "d"], "answer": "a"}
+    for i in range(10)
+]
+
+def _percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+async def _timed(latencies: Dict[str, List[float]], name: str, request) -> httpx.Response:
+    started = time.perf_counter()
+    response = await request
+    latencies.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+    response.raise_for_status()
+    return response
+
+async def _student(client: httpx.AsyncClient, latencies: Dict[str, List[float]], index: int, results: int) -> None:
+    email = f"bench{index}@example.com"
+    await _timed(latencies, "register", client.post("/auth/register", json={"email": email, "password": "benchmark"}))
+    login = await _timed(latencies, "login", client.post("/auth/login", json={"email": email, "password": "benchmark"}))
+    body = login.json()
+    user_id = body["user"]["id"]
+    headers = {"Authorization": f"Bearer {body['access_token']}"}
+
+    for i in range(results):
+        await _timed(latencies, "submit_result", client.post("/api/results", headers=headers, json={
+            "user_id": user_id,
+            "score": i % 11,
+            "total_questions": len(QUESTIONS),
+            "questions": QUESTIONS,
+            "user_answers": ["a" if (i + j) % 2 else "b" for j in range(len(QUESTIONS))],
+            "topic": ["Math", "Biology", "History"][i % 3],
+            "difficulty": "medium",
+            "time_taken": 60 + i
+        }))
+    await _timed(latencies, "history", client.get(f"/api/results/user/{user_id}", headers=headers))
+    await _timed(latencies, "analytics", client.get(f"/api/results/analytics/{user_id}", headers=headers))
+    await _timed(latencies, "profile", client.get(f"/db/users/{user_id}", headers=headers))
+
+async def main(users: int = 50, results: int = 10, concurrency: int = 10) -> None:
+    latencies: Dict[str, List[float]] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(index: int) -> None:
+        async with semaphore:
+            await _student(client, latencies, index, results)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(bounded(i) for i in range(users)))
+            elapsed = time.perf_counter() - started
+
+    total = sum(len(samples) for samples in latencies.values())
+    print(f"\nbackend={os.environ['DB_BACKEND']} users={users} results/user={results} concurrency={concurrency}")
+    print(f"{total} requests in {elapsed:.2f}s: {total / elapsed:,.0f} requests/s")
+    print(f"{'endpoint':<16}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for name, samples in latencies.items():
+        print(f"{name:<16}{len(samples):>8}{_percentile(samples, 0.5):>10.2f}{_percentile(samples, 0.95):>10.2f}{max(samples):>10.2f}")
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:4]]
+    asyncio.run(main(*args))
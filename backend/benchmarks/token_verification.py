@@ -0,0 +1,34 @@
+"""Compare cold and warm JWT verification throughput
+
+Run from backend/: python -m benchmarks.token_verification [iterations]
+"""
+import sys
+import time
+
+from utils.auth_utils import create_access_token, verify_token, token_cache
+
+def _rate(iterations: int, fn) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return iterations / (time.perf_counter() - start)
+
+def main(iterations: int = 20000) -> None:
+    token = create_access_token({"sub": "5f0000000000000000000000", "email": "bench@example.com"})
+
+    def cold():
+        token_cache.clear()
+        verify_token(token)
+
+    def warm():
+        verify_token(token)
+
+    verify_token(token)
+    cold_rate = _rate(iterations, cold)
+    warm_rate = _rate(iterations, warm)
+    print(f"cold (full jwt.decode): {cold_rate:>12,.0f} verifications/s")
+    print(f"warm (cache hit):       {warm_rate:>12,.0f} verifications/s")
+    print(f"speedup:                {warm_rate / cold_rate:>12.1f}x")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
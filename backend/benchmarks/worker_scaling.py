@@ -0,0 +1,165 @@
+"""Measure API throughput as the number of worker processes grows
+
+Run from backend/: python -m benchmarks.worker_scaling [workers,...] [seconds] [concurrency]
+
+Starts serve.py once per worker count (default 1,2,4) against MONGO_URI, waits
+until /api/ready has answered from every worker, then drives an authenticated
+read mix from several load-generator processes so the client is not the
+bottleneck. Expect near-linear scaling while workers <= CPU cores and the
+database keeps up; past that, workers compete for the same cores.
+"""
+import asyncio
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE_PORT = int(os.getenv("BENCH_BASE_PORT", "5101"))
+CLIENT_PROCESSES = int(os.getenv("BENCH_CLIENT_PROCESSES", str(max(1, (os.cpu_count() or 1) // 2))))
+READY_TIMEOUT_SECONDS = 60
+
+SERVER_ENV = {
+    "LOGIN_IP_LIMIT": "1000000",
+    "LOGIN_EMAIL_LIMIT": "1000000",
+    "BCRYPT_ROUNDS": "4",
+}
+
+def _percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+def _start_server(workers: int, port: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **SERVER_ENV},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+def _stop_server(server: subprocess.Popen) -> None:
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+async def _wait_ready(server: subprocess.Popen, base_url: str, workers: int) -> None:
+    """Poll /api/ready on fresh connections until every worker has reported ready"""
+    seen = set()
+    deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+    while len(seen) < workers:
+        if server.poll() is not None:
+            raise RuntimeError(f"serve.py exited with status {server.returncode}")
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"only {len(seen)}/{workers} workers became ready")
+        try:
+            async with httpx.AsyncClient(base_url=base_url) as client:
+                response = await client.get("/api/ready")
+            if response.status_code == 200:
+                seen.add(response.json()["worker"])
+                continue
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+
+async def _seed(base_url: str, tag: str) -> Tuple[str, str]:
+    """Register a user with a few results; returns (user_id, access_token)"""
+    email = f"scaling-{tag}@example.com"
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        await client.post("/auth/register", json={"email": email, "password": "benchmark"})
+        login = (await client.post("/auth/login", json={"email": email, "password": "benchmark"})).json()
+        user_id, token = login["user"]["id"], login["access_token"]
+        for i in range(10):
+            response = await client.post("/api/results", headers={"Authorization": f"Bearer {token}"}, json={
+                "user_id": user_id,
+                "score": i,
+                "total_questions": 10,
+                "questions": [{"question": f"Scaling question {j}?", "options": ["a", "b"], "answer": "a"} for j in range(10)],
+                "user_answers": ["a"] * i + ["b"] * (10 - i),
+                "topic": "Scaling",
+                "difficulty": "medium",
+                "time_taken": 60
+            })
+            response.raise_for_status()
+    return user_id, token
+
+async def _drive(base_url: str, user_id: str, token: str, seconds: float, concurrency: int) -> Tuple[int, int, List[float]]:
+    paths = [
+        f"/db/users/{user_id}",
+        f"/api/results/user/{user_id}",
+        f"/api/results/analytics/{user_id}",
+        "/api/results/percentile/Scaling/medium?percentage=50",
+    ]
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.monotonic() + seconds
+
+    async def loop(client: httpx.AsyncClient, offset: int) -> None:
+        nonlocal errors
+        i = offset
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await client.get(paths[i % len(paths)])
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+            i += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=30) as client:
+        await asyncio.gather(*(loop(client, i) for i in range(concurrency)))
+    return len(latencies), errors, latencies
+
+def _client_process(args: Tuple[str, str, str, float, int]) -> Tuple[int, int, List[float]]:
+    return asyncio.run(_drive(*args))
+
+def run(workers: int, port: int, seconds: float, concurrency: int) -> Dict[str, float]:
+    base_url = f"http://127.0.0.1:{port}"
+    server = _start_server(workers, port)
+    try:
+        asyncio.run(_wait_ready(server, base_url, workers))
+        user_id, token = asyncio.run(_seed(base_url, f"{port}-{int(time.time())}"))
+        per_client = max(1, concurrency // CLIENT_PROCESSES)
+        with multiprocessing.Pool(CLIENT_PROCESSES) as pool:
+            started = time.perf_counter()
+            outcomes = pool.map(_client_process, [(base_url, user_id, token, seconds, per_client)] * CLIENT_PROCESSES)
+            elapsed = time.perf_counter() - started
+    finally:
+        _stop_server(server)
+
+    latencies = [sample for _, _, samples in outcomes for sample in samples]
+    return {
+        "workers": workers,
+        "requests": sum(count for count, _, _ in outcomes),
+        "errors": sum(errors for _, errors, _ in outcomes),
+        "rps": sum(count for count, _, _ in outcomes) / elapsed,
+        "p50": _percentile(latencies, 0.5),
+        "p95": _percentile(latencies, 0.95)
+    }
+
+def main(worker_counts: List[int], seconds: float = 10, concurrency: int = 64) -> None:
+    print(f"cpus={os.cpu_count()} client_processes={CLIENT_PROCESSES} concurrency={concurrency} seconds={seconds}")
+    rows = [run(workers, BASE_PORT + i, seconds, concurrency) for i, workers in enumerate(worker_counts)]
+    baseline = rows[0]["rps"] / rows[0]["workers"]
+    print(f"\n{'workers':>8}{'requests':>10}{'errors':>8}{'req/s':>10}{'speedup':>9}{'efficiency':>12}{'p50 ms':>9}{'p95 ms':>9}")
+    for row in rows:
+        speedup = row["rps"] / rows[0]["rps"]
+        efficiency = row["rps"] / (baseline * row["workers"])
+        print(f"{row['workers']:>8}{row['requests']:>10}{row['errors']:>8}{row['rps']:>10,.0f}{speedup:>8.2f}x{efficiency:>11.0%}{row['p50']:>9.2f}{row['p95']:>9.2f}")
+
+if __name__ == "__main__":
+    counts = [int(n) for n in sys.argv[1].split(",")] if len(sys.argv) > 1 else [1, 2, 4]
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 64
+    main(counts, seconds, concurrency)
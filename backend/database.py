@@ -1,60 +1,279 @@
-
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import MongoClient
+from pymongo.monitoring import ConnectionPoolListener
 import os
+import time
+import threading
+from collections import deque
+from datetime import datetime
 from dotenv import load_dotenv
 import asyncio
 
 load_dotenv()
 
-# Database connection
+def _ingest_write_concern():
+    """w for the profile that writes results: at least 1 ("majority" allowed); journaling is always on"""
+    w = os.getenv("DB_INGEST_W", "1")
+    if w != "majority":
+        w = int(w)
+        if w < 1:
+            print(f"⚠️ [DB] DB_INGEST_W={w} would leave result writes unacknowledged; using 1")
+            w = 1
+    if os.getenv("DB_INGEST_JOURNAL", "true").lower() != "true":
+        print("⚠️ [DB] DB_INGEST_JOURNAL is ignored: result writes are always journaled")
+    return w
+
+# Named client profiles; each gets its own connection pool so workloads cannot starve each other
+DB_PROFILES = {
+    # Request/response traffic: logins, profile reads, single result writes
+    "oltp": {
+        "maxPoolSize": int(os.getenv("DB_OLTP_POOL_SIZE", "10")),
+        "minPoolSize": 1,
+        "socketTimeoutMS": 20000
+    },
+    # Long scans for reports and exports; may read from secondaries
+    "analytics": {
+        "maxPoolSize": int(os.getenv("DB_ANALYTICS_POOL_SIZE", "4")),
+        "minPoolSize": 0,
+        "readPreference": os.getenv("DB_ANALYTICS_READ_PREFERENCE", "secondaryPreferred"),
+        "socketTimeoutMS": int(os.getenv("DB_ANALYTICS_SOCKET_TIMEOUT_MS", "120000"))
+    },
+    # Batched result ingestion, archival and migrations; a success response promises a durable result
+    "ingest": {
+        "maxPoolSize": int(os.getenv("DB_INGEST_POOL_SIZE", "4")),
+        "minPoolSize": 0,
+        "w": _ingest_write_concern(),
+        "journal": True,
+        "socketTimeoutMS": 60000
+    },
+}
+DEFAULT_PROFILE = "oltp"
+
+# "mongo", or "local" for the embedded store (tests, benchmarks, single-node installs)
+DB_BACKEND = os.getenv("DB_BACKEND", "mongo").lower()
+# Local store file; empty keeps the data in memory only
+LOCAL_DB_PATH = os.getenv("LOCAL_DB_PATH", "")
+
+class PoolMetrics(ConnectionPoolListener):
+    """Connection pool counters for one profile, fed by pymongo's monitoring events
+
+    Events arrive on driver threads, hence the lock. Checkout wait time pairs each
+    checkout with the oldest outstanding start for the same server, which matches
+    the pool's FIFO wait queue.
+    """
+
+    def __init__(self, max_pool_size: int):
+        self.max_pool_size = max_pool_size
+        self._lock = threading.Lock()
+        self._started = {}
+        self.checked_out = 0
+        self.checkouts = 0
+        self.failed_checkouts = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self._started.setdefault(event.address, deque()).append(time.perf_counter())
+
+    def _finish_wait(self, address):
+        started = self._started.get(address)
+        return (time.perf_counter() - started.popleft()) * 1000 if started else 0.0
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            wait_ms = self._finish_wait(event.address)
+            self.checked_out += 1
+            self.checkouts += 1
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._finish_wait(event.address)
+            self.failed_checkouts += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_created(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): pass
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "max_pool_size": self.max_pool_size,
+                "checked_out": self.checked_out,
+                "waiting": sum(len(started) for started in self._started.values()),
+                "checkouts": self.checkouts,
+                "failed_checkouts": self.failed_checkouts,
+                "avg_wait_ms": round(self.wait_ms_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.wait_ms_max, 3)
+            }
+
+pool_metrics = {name: PoolMetrics(options["maxPoolSize"]) for name, options in DB_PROFILES.items()}
+
+# Connection supervision: ping interval, failures tolerated before reconnecting, reconnect backoff cap
+DB_HEALTH_INTERVAL_SECONDS = float(os.getenv("DB_HEALTH_INTERVAL_SECONDS", "10"))
+DB_RECONNECT_AFTER_FAILURES = int(os.getenv("DB_RECONNECT_AFTER_FAILURES", "3"))
+DB_RECONNECT_MAX_BACKOFF_SECONDS = float(os.getenv("DB_RECONNECT_MAX_BACKOFF_SECONDS", "60"))
+# Replaced clients stay open this long so requests and cursors started on them can finish
+DB_CLIENT_CLOSE_GRACE_SECONDS = float(os.getenv("DB_CLIENT_CLOSE_GRACE_SECONDS", "30"))
+
+# Database connection; client and db are the default (oltp) profile
 client = None
 db = None
+clients = {}
+dbs = {}
+
+# Only one coroutine connects or reconnects at a time
+_connect_lock = asyncio.Lock()
+# Clients replaced by a reconnect, closed once their grace period is over
+_retired_clients = []
+
+# Last known connection health, maintained by the supervisor and reported by /api/health
+connection_state = {
+    "backend": DB_BACKEND,
+    "status": "disconnected",
+    "last_ping_ms": None,
+    "last_ok": None,
+    "last_error": None,
+    "consecutive_failures": 0,
+    "reconnects": 0
+}
+
+def _unique(profile_clients):
+    """Each distinct client once; profiles may share one"""
+    return list({id(profile_client): profile_client for profile_client in profile_clients.values()}.values())
+
+async def _connect():
+    """Open a client per profile, verify the default one, then swap them in for the old ones"""
+    global client, db, clients, dbs
+    mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+    db_name = os.getenv("DB_NAME", "modlrn")
+    if DB_BACKEND == "local":
+        # One embedded store serves every profile and survives reconnects
+        from local_store import open_local_client
+        local_client = open_local_client(LOCAL_DB_PATH)
+        new_clients = {name: local_client for name in DB_PROFILES}
+    else:
+        new_clients = {
+            name: AsyncIOMotorClient(
+                mongo_uri,
+                maxIdleTimeMS=30000,
+                serverSelectionTimeoutMS=5000,
+                connectTimeoutMS=10000,
+                event_listeners=[pool_metrics[name]],
+                **options
+            )
+            for name, options in DB_PROFILES.items()
+        }
+    try:
+        await new_clients[DEFAULT_PROFILE].admin.command('ping')
+    except Exception:
+        for new_client in _unique(new_clients):
+            new_client.close()
+        raise
+
+    old_clients = clients
+    clients = new_clients
+    dbs = {name: new_client[db_name] for name, new_client in new_clients.items()}
+    client = clients[DEFAULT_PROFILE]
+    db = dbs[DEFAULT_PROFILE]
+    kept = {id(new_client) for new_client in new_clients.values()}
+    retired = [old_client for old_client in _unique(old_clients) if id(old_client) not in kept]
+    if retired:
+        _retired_clients.extend(retired)
+        asyncio.get_running_loop().call_later(DB_CLIENT_CLOSE_GRACE_SECONDS, _close_retired, retired)
+
+    connection_state.update(status="up", last_ok=datetime.utcnow(), last_error=None, consecutive_failures=0)
+    return db
+
+def _close_retired(retired):
+    for old_client in retired:
+        if old_client in _retired_clients:
+            _retired_clients.remove(old_client)
+            old_client.close()
 
 async def init_db():
     """Initialize database connection"""
-    global client, db
     try:
-        mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-        # Add connection pooling and timeout settings
-        client = AsyncIOMotorClient(
-            mongo_uri,
-            maxPoolSize=10,
-            minPoolSize=1,
-            maxIdleTimeMS=30000,
-            serverSelectionTimeoutMS=5000,
-            connectTimeoutMS=10000,
-            socketTimeoutMS=20000
-        )
-        db_name = os.getenv("DB_NAME", "modlrn")
-        db = client[db_name]
-        
-        # Test the connection
-        await client.admin.command('ping')
+        async with _connect_lock:
+            await _connect()
         print(f"✅ MongoDB Connected")
         return db
     except Exception as e:
+        connection_state.update(status="down", last_error=str(e))
         print(f"❌ MongoDB Connection Error")
         raise e
 
-async def get_db():
-    """Get database instance with retry logic"""
-    global db
+async def get_db(profile: str = DEFAULT_PROFILE):
+    """Get the shared database instance for a client profile; no I/O once connected, the supervisor handles health"""
     if db is None:
-        await init_db()
-    
-    # Test connection before returning
-    try:
-        await client.admin.command('ping')
-        return db
-    except Exception as e:
-        print(f"❌ Database connection lost, reconnecting...")
-        await init_db()
-        return db
+        async with _connect_lock:
+            if db is None:
+                await _connect()
+    return dbs[profile]
+
+async def run_connection_supervisor():
+    """Ping the server in the background and reconnect once, with backoff, after repeated failures"""
+    delay = DB_HEALTH_INTERVAL_SECONDS
+    while True:
+        await asyncio.sleep(delay)
+        delay = DB_HEALTH_INTERVAL_SECONDS
+        try:
+            started = time.perf_counter()
+            await client.admin.command('ping')
+            connection_state.update(
+                status="up",
+                last_ping_ms=round((time.perf_counter() - started) * 1000, 2),
+                last_ok=datetime.utcnow(),
+                consecutive_failures=0
+            )
+            continue
+        except Exception as e:
+            failures = connection_state["consecutive_failures"] + 1
+            connection_state.update(last_error=str(e), consecutive_failures=failures)
+            if failures < DB_RECONNECT_AFTER_FAILURES:
+                connection_state["status"] = "degraded"
+                print(f"⚠️ [DB] Ping failed ({failures}/{DB_RECONNECT_AFTER_FAILURES}): {e}")
+                continue
+
+        connection_state["status"] = "reconnecting"
+        print(f"❌ [DB] Connection lost, reconnecting...")
+        try:
+            async with _connect_lock:
+                await _connect()
+            connection_state["reconnects"] += 1
+            print(f"✅ [DB] Reconnected to MongoDB")
+        except Exception as e:
+            # Back off exponentially while the server stays unreachable
+            backoff = DB_HEALTH_INTERVAL_SECONDS * 2 ** (connection_state["consecutive_failures"] - DB_RECONNECT_AFTER_FAILURES + 1)
+            delay = min(backoff, DB_RECONNECT_MAX_BACKOFF_SECONDS)
+            connection_state.update(status="down", last_error=str(e))
+            print(f"❌ [DB] Reconnect failed, retrying in {delay:.0f}s: {e}")
+
+def get_connection_state():
+    """Snapshot of connection health for /api/health"""
+    return {
+        **connection_state,
+        "last_ok": connection_state["last_ok"].isoformat() if connection_state["last_ok"] else None
+    }
+
+def get_pool_metrics():
+    """Per-profile pool usage and checkout wait times for /api/health"""
+    return {name: metrics.snapshot() for name, metrics in pool_metrics.items()}
 
 async def close_db():
     """Close database connection"""
-    global client
-    if client:
-        client.close()
-        print("🔌 MongoDB Connection Closed") 
\ No newline at end of file
+    _close_retired(list(_retired_clients))
+    if clients:
+        for profile_client in _unique(clients):
+            profile_client.close()
+        print("🔌 MongoDB Connection Closed")
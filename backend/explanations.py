@@ -0,0 +1,293 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from dotenv import load_dotenv
+
+from database import get_db
+from archive import find_result, ARCHIVE_COLLECTION
+from routers.questions import model, request_explanations
+from utils.result_store import EXPLANATION_REPLACEABLE, hydrate_result, invalidate_result_views, is_fallback_explanation
+
+load_dotenv()
+
+# Background explanation generation; only started when Gemini is configured
+EXPLANATION_WORKERS = int(os.getenv("EXPLANATION_WORKERS", "2"))
+EXPLANATION_MAX_QUEUE = int(os.getenv("EXPLANATION_MAX_QUEUE", "1000"))
+EXPLANATION_MAX_ATTEMPTS = int(os.getenv("EXPLANATION_MAX_ATTEMPTS", "3"))
+EXPLANATION_RETRY_SECONDS = float(os.getenv("EXPLANATION_RETRY_SECONDS", "30"))
+# Pending jobs that did not fit in the queue, or were left by another worker, are picked up this often
+EXPLANATION_RESCAN_SECONDS = float(os.getenv("EXPLANATION_RESCAN_SECONDS", "30"))
+
+EXPLANATION_JOBS_COLLECTION = "explanation_jobs"
+
+# Job states; pending and running jobs are picked up again after a restart
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+ACTIVE_STATES = (JOB_PENDING, JOB_RUNNING)
+
+# A running job not updated for this long was abandoned by a worker that crashed
+JOB_STALE_SECONDS = 600
+
+# Long-poll waiters re-read the job record at least this often, so jobs run by another worker are noticed
+JOB_POLL_SECONDS = 1.0
+
+class ExplanationJobQueue:
+    """In-process worker pool that generates explanations after a result is saved
+
+    Every job has a persistent record in explanation_jobs keyed by the result id,
+    so submission returns immediately, status survives restarts and any worker
+    process can report it. Explanations are stored on the referenced question
+    documents, where hydrated results already read them from.
+    """
+
+    def __init__(self, workers: int = EXPLANATION_WORKERS, max_size: int = EXPLANATION_MAX_QUEUE):
+        self.workers = workers
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._tasks: List[asyncio.Task] = []
+        self._events: Dict[str, asyncio.Event] = {}
+        self._waiters: Dict[str, int] = {}
+        self._running: Set[ObjectId] = set()
+        self._queued: Set[ObjectId] = set()
+        self.stats = {"queued": 0, "done": 0, "failed": 0, "retried": 0, "overflow": 0}
+
+    async def start(self, db) -> None:
+        """Re-queue unfinished jobs, then start the workers and the periodic rescan"""
+        recovered = await self._recover(db)
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._rescan()))
+        print(f"🧠 [EXPLAIN] Explanation workers started ({self.workers} workers, {recovered} recovered jobs)")
+
+    async def _recover(self, db) -> int:
+        """Queue pending jobs, as many as fit; returns how many were queued"""
+        jobs = db[EXPLANATION_JOBS_COLLECTION]
+        now = datetime.utcnow()
+        # Other workers may be running jobs right now, so only take back abandoned ones
+        stale = now - timedelta(seconds=JOB_STALE_SECONDS)
+        await jobs.update_many({"status": JOB_RUNNING, "updated_at": {"$lt": stale}}, {"$set": {"status": JOB_PENDING}})
+        free = self._queue.maxsize - self._queue.qsize()
+        if free <= 0:
+            return 0
+        # Jobs that failed recently are already waiting out their retry delay
+        retry_after = now - timedelta(seconds=EXPLANATION_RETRY_SECONDS)
+        queued = 0
+        async for job in jobs.find(
+            {"status": JOB_PENDING, "$or": [{"updated_at": {"$exists": False}}, {"updated_at": {"$lt": retry_after}}]},
+            {"_id": 1}
+        ).limit(free + len(self._queued)):
+            queued += self._put(job["_id"])
+        return queued
+
+    async def _rescan(self) -> None:
+        while True:
+            await asyncio.sleep(EXPLANATION_RESCAN_SECONDS)
+            try:
+                queued = await self._recover(await get_db())
+                if queued:
+                    print(f"🧠 [EXPLAIN] Rescan queued {queued} pending jobs")
+            except Exception as e:
+                print(f"❌ [EXPLAIN] Rescanning pending jobs failed: {e}")
+
+    async def stop(self) -> None:
+        """Stop the workers and hand jobs they were running back as pending"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._running:
+            try:
+                db = await get_db()
+                await db[EXPLANATION_JOBS_COLLECTION].update_many(
+                    {"_id": {"$in": list(self._running)}, "status": JOB_RUNNING},
+                    {"$set": {"status": JOB_PENDING}}
+                )
+            except Exception as e:
+                print(f"⚠️ [EXPLAIN] Could not release {len(self._running)} running jobs: {e}")
+            self._running.clear()
+        print("🛑 [EXPLAIN] Explanation workers stopped")
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def _put(self, result_id: ObjectId) -> bool:
+        """Queue a job unless it is already queued; False when it was not added"""
+        if result_id in self._queued:
+            return False
+        try:
+            self._queue.put_nowait(result_id)
+        except asyncio.QueueFull:
+            # The job record stays pending and the next rescan queues it
+            self.stats["overflow"] += 1
+            print(f"⚠️ [EXPLAIN] Queue full, job for result {result_id} deferred")
+            return False
+        self._queued.add(result_id)
+        return True
+
+    async def enqueue(self, db, result_id: ObjectId) -> None:
+        """Record a pending job for a result and queue it"""
+        await db[EXPLANATION_JOBS_COLLECTION].update_one(
+            {"_id": result_id},
+            {"$setOnInsert": {"status": JOB_PENDING, "attempts": 0, "created_at": datetime.utcnow()}},
+            upsert=True
+        )
+        self.stats["queued"] += 1
+        self._put(result_id)
+
+    def event(self, result_id: str) -> asyncio.Event:
+        """Event set when this process finishes the job for a result; pair every call with release()"""
+        self._waiters[result_id] = self._waiters.get(result_id, 0) + 1
+        return self._events.setdefault(result_id, asyncio.Event())
+
+    def release(self, result_id: str) -> None:
+        """Drop a waiter; the event goes with the last one, e.g. when another worker ran the job"""
+        waiters = self._waiters.pop(result_id, 1) - 1
+        if waiters > 0:
+            self._waiters[result_id] = waiters
+        else:
+            self._events.pop(result_id, None)
+
+    async def _run(self) -> None:
+        while True:
+            result_id = await self._queue.get()
+            self._queued.discard(result_id)
+            try:
+                await self._process(await get_db(), result_id)
+            except Exception as e:
+                print(f"❌ [EXPLAIN] Job for result {result_id} crashed: {e}")
+            finally:
+                self._queue.task_done()
+            # Skipped when cancelled, so stop() can hand the job back
+            self._running.discard(result_id)
+
+    async def _process(self, db, result_id: ObjectId) -> None:
+        jobs = db[EXPLANATION_JOBS_COLLECTION]
+        job = await jobs.find_one_and_update(
+            {"_id": result_id, "status": JOB_PENDING},
+            {"$set": {"status": JOB_RUNNING, "updated_at": datetime.utcnow()}, "$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            # Finished or claimed by another worker
+            return
+
+        self._running.add(result_id)
+        try:
+            generated = await self._generate(db, result_id)
+            await jobs.update_one(
+                {"_id": result_id},
+                {"$set": {"status": JOB_DONE, "generated": generated, "updated_at": datetime.utcnow()}, "$unset": {"error": ""}}
+            )
+            self.stats["done"] += 1
+            print(f"✅ [EXPLAIN] Stored {generated} explanations for result {result_id}")
+        except Exception as e:
+            retry = job["attempts"] < EXPLANATION_MAX_ATTEMPTS
+            await jobs.update_one(
+                {"_id": result_id},
+                {"$set": {"status": JOB_PENDING if retry else JOB_FAILED, "error": str(e), "updated_at": datetime.utcnow()}}
+            )
+            if retry:
+                self.stats["retried"] += 1
+                print(f"⚠️ [EXPLAIN] Attempt {job['attempts']} for result {result_id} failed, retrying: {e}")
+                asyncio.get_running_loop().call_later(EXPLANATION_RETRY_SECONDS, self._put, result_id)
+                return
+            self.stats["failed"] += 1
+            print(f"❌ [EXPLAIN] Giving up on result {result_id}: {e}")
+
+        invalidate_result_views(result_id=str(result_id))
+        event = self._events.pop(str(result_id), None)
+        if event:
+            event.set()
+
+    async def _generate(self, db, result_id: ObjectId) -> int:
+        """Generate and store explanations for the questions of a result that lack one"""
+        result = await find_result(db, result_id)
+        if result is None:
+            raise LookupError("Result not found")
+        hydrated = await hydrate_result(db, result)
+
+        questions = hydrated.get("questions") or []
+        existing = {
+            e.get("questionIndex", i): e.get("explanation")
+            for i, e in enumerate(hydrated.get("explanations") or [])
+            if not is_fallback_explanation(e)
+        }
+        missing = [i for i in range(len(questions)) if not existing.get(i)]
+        if not missing:
+            return 0
+
+        generated = await request_explanations(result["topic"], result["difficulty"], [questions[i] for i in missing])
+        texts: Dict[int, str] = {}
+        for i, exp in enumerate(generated):
+            index = exp.get("questionIndex", i)
+            if isinstance(index, int) and 0 <= index < len(missing) and exp.get("explanation"):
+                texts[missing[index]] = exp["explanation"]
+        if not texts:
+            raise ValueError("Gemini returned no usable explanations")
+
+        if "question_ids" in result:
+            await db.questions.bulk_write([
+                UpdateOne(
+                    {"_id": result["question_ids"][i], **EXPLANATION_REPLACEABLE},
+                    {"$set": {"explanation": text}}
+                )
+                for i, text in texts.items()
+            ], ordered=False)
+        else:
+            # Legacy results embed their explanations
+            merged = [
+                {"questionIndex": i, "explanation": texts.get(i) or existing.get(i) or ""}
+                for i in range(len(questions))
+            ]
+            for collection in (db.results, db[ARCHIVE_COLLECTION]):
+                updated = await collection.update_one({"_id": result_id}, {"$set": {"explanations": merged}})
+                if updated.matched_count:
+                    break
+        return len(texts)
+
+explanation_queue: Optional[ExplanationJobQueue] = None
+
+async def start_explanation_queue(db) -> Optional[ExplanationJobQueue]:
+    """Create and start the explanation workers when Gemini is configured"""
+    global explanation_queue
+    if model and explanation_queue is None:
+        explanation_queue = ExplanationJobQueue()
+        await explanation_queue.start(db)
+    return explanation_queue
+
+async def stop_explanation_queue() -> None:
+    global explanation_queue
+    if explanation_queue:
+        await explanation_queue.stop()
+        explanation_queue = None
+
+def get_explanation_queue() -> Optional[ExplanationJobQueue]:
+    return explanation_queue
+
+async def get_job_status(db, result_id: ObjectId) -> Optional[str]:
+    job = await db[EXPLANATION_JOBS_COLLECTION].find_one({"_id": result_id}, {"status": 1})
+    return job["status"] if job else None
+
+async def wait_for_job(db, result_id: ObjectId, timeout: float) -> Optional[str]:
+    """Long-poll a job until it leaves the active states or the timeout passes; returns its status"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        status = await get_job_status(db, result_id)
+        remaining = deadline - loop.time()
+        if status not in ACTIVE_STATES or remaining <= 0:
+            return status
+        wait = min(remaining, JOB_POLL_SECONDS)
+        if explanation_queue:
+            queue = explanation_queue
+            try:
+                await asyncio.wait_for(queue.event(str(result_id)).wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                queue.release(str(result_id))
+        else:
+            await asyncio.sleep(wait)
@@ -0,0 +1,167 @@
+import asyncio
+import sys
+from datetime import datetime
+from typing import Any, Dict, List
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# Indexes required by the routers' hot query shapes, declared per collection
+REQUIRED_INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        # Login, registration and Google OAuth lookups
+        IndexModel([("email", ASCENDING)], name="email_1"),
+        # Face login scans users still embedding a descriptor until split_user_side_fields has
+        # finished; keyed on the first element so the index is not multikey, and empty afterwards
+        IndexModel([("face_descriptor.0", ASCENDING)], name="face_descriptor_present", sparse=True),
+    ],
+    "results": [
+        # Per-user history sorted newest first, analytics and stats
+        IndexModel([("user_id", ASCENDING), ("date", DESCENDING)], name="user_id_1_date_-1"),
+        # Idempotent submissions; only results sent with an Idempotency-Key are indexed
+        IndexModel(
+            [("user_id", ASCENDING), ("idempotency_key", ASCENDING)],
+            name="user_id_1_idempotency_key_1",
+            unique=True,
+            partialFilterExpression={"idempotency_key": {"$exists": True}}
+        ),
+        # Retention job cutoff scan
+        IndexModel([("date", ASCENDING)], name="date_1"),
+    ],
+    "results_archive": [
+        IndexModel([("user_id", ASCENDING), ("date", DESCENDING)], name="user_id_1_date_-1"),
+    ],
+    "result_rollups": [
+        IndexModel([("user_id", ASCENDING), ("topic", ASCENDING), ("difficulty", ASCENDING)], name="user_id_1_topic_1_difficulty_1", unique=True),
+    ],
+    "score_sketches": [
+        IndexModel([("topic", ASCENDING), ("difficulty", ASCENDING)], name="topic_1_difficulty_1", unique=True),
+    ],
+    "leaderboard_entries": [
+        IndexModel([("topic", ASCENDING), ("difficulty", ASCENDING), ("user_id", ASCENDING)], name="topic_1_difficulty_1_user_id_1", unique=True),
+        IndexModel([("topic", ASCENDING), ("difficulty", ASCENDING), ("percentage", DESCENDING), ("time_taken", ASCENDING)], name="topic_1_difficulty_1_percentage_-1_time_taken_1"),
+    ],
+    "explanation_jobs": [
+        # Recovery scan for unfinished jobs on startup
+        IndexModel([("status", ASCENDING)], name="status_1"),
+    ],
+    "refresh_tokens": [
+        # Revoking a session touches every token issued to it
+        IndexModel([("session_id", ASCENDING)], name="session_id_1"),
+        # Deleting an account revokes every session of the user
+        IndexModel([("user_id", ASCENDING)], name="user_id_1"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "login_codes": [
+        # One-time codes from redirect logins are only redeemable for a minute
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "revoked_sessions": [
+        # Revocations only matter while access tokens minted before them can still be valid
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "login_attempts": [
+        # Shared login throttle windows expire on their own
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "sessions": [
+        # Assessment sessions (SESSION_STORE_BACKEND=mongo) expire on their own
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "cache_invalidations": [
+        # Polled by every worker when CACHE_INVALIDATION_BACKEND=mongo
+        IndexModel([("created_at", ASCENDING)], name="created_at_1"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "attempts": [
+        # Resuming the newest unfinished attempt
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("started_at", DESCENDING)], name="user_id_1_status_1_started_at_-1"),
+    ],
+    "questions": [
+        # Dedup check and batched lookup when normalizing submitted questions
+        IndexModel([("topic", ASCENDING), ("question", ASCENDING)], name="topic_1_question_1"),
+    ],
+}
+
+# Representative query for every router access path, verified by check mode
+_PROBE_ID = ObjectId()
+QUERY_SHAPES: List[Dict[str, Any]] = [
+    {"name": "auth.login", "collection": "users", "filter": {"email": "probe@example.com"}},
+    {"name": "auth.face_login_legacy", "collection": "users", "filter": {"face_descriptor.0": {"$exists": True}}},
+    {"name": "user_faces.by_id", "collection": "user_faces", "filter": {"_id": _PROBE_ID}},
+    {"name": "user_settings.by_id", "collection": "user_settings", "filter": {"_id": _PROBE_ID}},
+    {"name": "users.by_id", "collection": "users", "filter": {"_id": _PROBE_ID}},
+    {"name": "results.by_user", "collection": "results", "filter": {"user_id": _PROBE_ID}, "sort": [("date", DESCENDING)]},
+    {"name": "results.by_user_topic", "collection": "results", "filter": {"user_id": _PROBE_ID, "topic": {"$regex": "probe", "$options": "i"}}, "sort": [("date", DESCENDING)]},
+    {"name": "results.by_id", "collection": "results", "filter": {"_id": _PROBE_ID}},
+    {"name": "results.idempotency", "collection": "results", "filter": {"user_id": _PROBE_ID, "idempotency_key": "probe"}},
+    {"name": "results.archive_cutoff", "collection": "results", "filter": {"date": {"$lt": datetime.utcnow()}}},
+    {"name": "results_archive.by_id", "collection": "results_archive", "filter": {"_id": _PROBE_ID}},
+    {"name": "results_archive.by_user", "collection": "results_archive", "filter": {"user_id": _PROBE_ID}, "sort": [("date", DESCENDING)]},
+    {"name": "result_rollups.by_user", "collection": "result_rollups", "filter": {"user_id": _PROBE_ID}},
+    {"name": "leaderboard_entries.top", "collection": "leaderboard_entries", "filter": {"topic": "probe", "difficulty": "probe"}, "sort": [("percentage", DESCENDING), ("time_taken", ASCENDING)]},
+    {"name": "explanation_jobs.unfinished", "collection": "explanation_jobs", "filter": {"status": {"$in": ["pending", "running"]}}},
+    {"name": "explanation_jobs.stale", "collection": "explanation_jobs", "filter": {"status": "running", "updated_at": {"$lt": datetime.utcnow()}}},
+    {"name": "refresh_tokens.by_session", "collection": "refresh_tokens", "filter": {"session_id": "probe", "revoked": False}},
+    {"name": "refresh_tokens.by_user", "collection": "refresh_tokens", "filter": {"user_id": "probe", "revoked": False, "expires_at": {"$gt": datetime.utcnow()}}},
+    {"name": "revoked_sessions.live", "collection": "revoked_sessions", "filter": {"expires_at": {"$gt": datetime.utcnow()}}},
+    {"name": "cache_invalidations.since", "collection": "cache_invalidations", "filter": {"created_at": {"$gte": datetime.utcnow()}, "origin": {"$ne": "probe"}}},
+    {"name": "attempts.active", "collection": "attempts", "filter": {"user_id": _PROBE_ID, "status": "active"}, "sort": [("started_at", DESCENDING)]},
+    {"name": "questions.dedup", "collection": "questions", "filter": {"question": "probe", "topic": "probe"}},
+    {"name": "questions.normalize", "collection": "questions", "filter": {"topic": "probe", "question": {"$in": ["probe"]}}},
+    {"name": "questions.by_topic", "collection": "questions", "filter": {"topic": {"$regex": "probe", "$options": "i"}}},
+    {"name": "questions.by_ids", "collection": "questions", "filter": {"_id": {"$in": [_PROBE_ID]}}},
+]
+
+async def ensure_indexes(db) -> None:
+    """Create every required index; existing indexes with the same spec are left untouched"""
+    for collection, indexes in REQUIRED_INDEXES.items():
+        try:
+            names = await db[collection].create_indexes(indexes)
+            print(f"✅ [INDEXES] {collection}: {', '.join(names)}")
+        except Exception as e:
+            print(f"❌ [INDEXES] Failed to create indexes for {collection}: {e}")
+
+def _plan_stages(plan: Any) -> List[str]:
+    """Collect every stage name in an explain plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+async def check_query_plans(db) -> List[str]:
+    """Explain every declared query shape and return the names of those doing a COLLSCAN"""
+    failures = []
+    for shape in QUERY_SHAPES:
+        cursor = db[shape["collection"]].find(shape["filter"])
+        if shape.get("sort"):
+            cursor = cursor.sort(shape["sort"])
+        explain = await cursor.explain()
+        stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        if "COLLSCAN" in stages:
+            print(f"❌ [INDEXES] {shape['name']} does a COLLSCAN")
+            failures.append(shape["name"])
+        else:
+            print(f"✅ [INDEXES] {shape['name']}: {' <- '.join(stages)}")
+    return failures
+
+if __name__ == "__main__":
+    from database import init_db, close_db
+
+    async def _main() -> int:
+        db = await init_db()
+        try:
+            await ensure_indexes(db)
+            if "--check" in sys.argv:
+                failures = await check_query_plans(db)
+                return 1 if failures else 0
+            return 0
+        finally:
+            await close_db()
+
+    sys.exit(asyncio.run(_main()))
@@ -0,0 +1,185 @@
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from pymongo.errors import BulkWriteError
+
+from database import get_db
+from utils.result_store import normalize_results_questions
+
+# Write-behind ingestion settings; disabled unless RESULT_INGEST_ENABLED is set
+RESULT_INGEST_ENABLED = os.getenv("RESULT_INGEST_ENABLED", "false").lower() == "true"
+RESULT_INGEST_MAX_QUEUE = int(os.getenv("RESULT_INGEST_MAX_QUEUE", "5000"))
+RESULT_INGEST_BATCH_SIZE = int(os.getenv("RESULT_INGEST_BATCH_SIZE", "500"))
+RESULT_INGEST_FLUSH_MS = int(os.getenv("RESULT_INGEST_FLUSH_MS", "50"))
+RESULT_INGEST_ENQUEUE_TIMEOUT_MS = int(os.getenv("RESULT_INGEST_ENQUEUE_TIMEOUT_MS", "2000"))
+# How long shutdown waits for queued results; whatever is left is failed back to its caller
+RESULT_INGEST_STOP_TIMEOUT_SECONDS = float(os.getenv("RESULT_INGEST_STOP_TIMEOUT_SECONDS", "10"))
+
+class IngestQueueFull(Exception):
+    """Raised when a result cannot be queued before the enqueue timeout"""
+
+class IngestWriteError(Exception):
+    """Raised when the batched write rejected a queued result"""
+
+    def __init__(self, message: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+
+class ResultIngestQueue:
+    """Bounded in-process queue that group-commits results with insert_many
+
+    Callers await ``submit`` until the batch containing their document has been
+    acknowledged by a journaled write, so a successful response still means the
+    result is durable. Submissions may hand over their questions unresolved; the
+    flush resolves them for the whole batch with one normalize_results_questions
+    call before the insert.
+    """
+
+    def __init__(
+        self,
+        max_size: int = RESULT_INGEST_MAX_QUEUE,
+        batch_size: int = RESULT_INGEST_BATCH_SIZE,
+        flush_interval_ms: int = RESULT_INGEST_FLUSH_MS,
+        enqueue_timeout_ms: int = RESULT_INGEST_ENQUEUE_TIMEOUT_MS,
+        stop_timeout_seconds: float = RESULT_INGEST_STOP_TIMEOUT_SECONDS
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.enqueue_timeout = enqueue_timeout_ms / 1000
+        self.stop_timeout = stop_timeout_seconds
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._task: Optional[asyncio.Task] = None
+        self._batch: List[Tuple[Dict[str, Any], Optional[Dict[str, Any]], asyncio.Future]] = []
+        self.stats = {"queued": 0, "written": 0, "failed": 0, "rejected": 0, "batches": 0}
+
+    async def start(self) -> None:
+        """Start the background flusher"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            print(f"🚚 [INGEST] Result ingestion queue started (max {self._queue.maxsize}, batch {self.batch_size})")
+
+    async def stop(self) -> None:
+        """Flush what was queued within the stop timeout, fail the rest, then stop the flusher"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=self.stop_timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ [INGEST] Queue not drained within {self.stop_timeout:.0f}s, failing {self.depth() + len(self._batch)} results")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._fail_leftovers()
+        print("🛑 [INGEST] Result ingestion queue stopped")
+
+    def _fail_leftovers(self) -> None:
+        """Fail the futures of the interrupted batch and of everything still queued"""
+        leftovers, self._batch = self._batch, []
+        while not self._queue.empty():
+            leftovers.append(self._queue.get_nowait())
+            self._queue.task_done()
+        for _, _, future in leftovers:
+            if not future.done():
+                future.set_exception(IngestWriteError("Result ingestion stopped before the result was written"))
+        self.stats["failed"] += len(leftovers)
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def submit(self, doc: Dict[str, Any], submission: Optional[Dict[str, Any]] = None) -> Any:
+        """Queue a result document and wait until its batch is acknowledged
+
+        ``submission`` (topic, difficulty, questions, user_answers, explanations)
+        is resolved into the document's question_ids and answer_indices by the flush.
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self._queue.put((doc, submission, future)), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.stats["rejected"] += 1
+            raise IngestQueueFull("Result ingestion queue is full")
+        self.stats["queued"] += 1
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self._batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                print(f"❌ [INGEST] Flush of {len(batch)} results crashed: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(IngestWriteError(str(e)))
+            # Skipped when cancelled mid-flush, so stop() can fail the interrupted batch
+            self._batch = []
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _flush(self, batch: List[Tuple[Dict[str, Any], Optional[Dict[str, Any]], asyncio.Future]]) -> None:
+        docs = [doc for doc, _, _ in batch]
+        failed: Dict[int, Dict[str, Any]] = {}
+        try:
+            # The ingest profile carries the write concern (DB_INGEST_W, always journaled)
+            db = await get_db("ingest")
+            unresolved = [(doc, submission) for doc, submission, _ in batch if submission is not None]
+            if unresolved:
+                # One set of question lookups and inserts for the whole batch
+                normalized = await normalize_results_questions(db, [submission for _, submission in unresolved])
+                for (doc, _), (question_ids, answer_indices) in zip(unresolved, normalized):
+                    doc["question_ids"], doc["answer_indices"] = question_ids, answer_indices
+            await db.results.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                failed[error["index"]] = error
+        except Exception as e:
+            print(f"❌ [INGEST] Batch of {len(batch)} results failed: {e}")
+            self.stats["failed"] += len(batch)
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(IngestWriteError(str(e)))
+            return
+
+        self.stats["batches"] += 1
+        self.stats["written"] += len(batch) - len(failed)
+        self.stats["failed"] += len(failed)
+        for i, (doc, _, future) in enumerate(batch):
+            if future.done():
+                continue
+            if i in failed:
+                future.set_exception(IngestWriteError(failed[i].get("errmsg", "Write failed"), failed[i].get("code")))
+            else:
+                future.set_result(doc["_id"])
+
+ingest_queue: Optional[ResultIngestQueue] = None
+
+async def start_ingest_queue() -> Optional[ResultIngestQueue]:
+    """Create and start the ingestion queue when enabled"""
+    global ingest_queue
+    if RESULT_INGEST_ENABLED and ingest_queue is None:
+        ingest_queue = ResultIngestQueue()
+        await ingest_queue.start()
+    return ingest_queue
+
+async def stop_ingest_queue() -> None:
+    """Drain and stop the ingestion queue"""
+    global ingest_queue
+    if ingest_queue:
+        await ingest_queue.stop()
+        ingest_queue = None
+
+def get_ingest_queue() -> Optional[ResultIngestQueue]:
+    return ingest_queue
@@ -0,0 +1,1087 @@
+import calendar
+import copy
+import operator
+import os
+import random
+import re
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import bson
+from bson import ObjectId
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError, OperationFailure
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+# In-process document store implementing the subset of Motor the app uses, selected with
+# DB_BACKEND=local. Collections live in memory; with LOCAL_DB_PATH set every write is also
+# committed to a SQLite file (WAL) and reloaded on startup. Single process only: each worker
+# would hold its own copy of the data.
+
+LOCAL_DB_SYNCHRONOUS = os.getenv("LOCAL_DB_SYNCHRONOUS", "NORMAL").upper()
+
+DUPLICATE_KEY = 11000
+_MISSING = object()
+
+# ---------------------------------------------------------------------------
+# Values, paths and comparisons
+# ---------------------------------------------------------------------------
+
+def _key(value: Any) -> Any:
+    """Hashable identity of a BSON value; numbers compare by value like the server does"""
+    if isinstance(value, (dict, list)):
+        return ("doc", bson.encode({"v": value}))
+    if isinstance(value, bool):
+        return ("bool", value)
+    if isinstance(value, (int, float)):
+        return ("num", value)
+    return (type(value).__name__, value)
+
+def _values(value: Any, parts: List[str]) -> List[Any]:
+    """Every value a dotted path reaches, traversing arrays of subdocuments like a query does"""
+    if not parts:
+        return [value]
+    head, rest = parts[0], parts[1:]
+    if isinstance(value, dict):
+        return _values(value[head], rest) if head in value else []
+    if isinstance(value, list):
+        if head.isdigit():
+            index = int(head)
+            return _values(value[index], rest) if index < len(value) else []
+        found = []
+        for item in value:
+            if isinstance(item, dict):
+                found.extend(_values(item, parts))
+        return found
+    return []
+
+def _path_values(doc: Dict[str, Any], path: str) -> List[Any]:
+    return _values(doc, path.split("."))
+
+def _first(doc: Dict[str, Any], path: str) -> Any:
+    found = _path_values(doc, path)
+    return found[0] if found else None
+
+def _candidates(values: List[Any]) -> List[Any]:
+    """Values plus the elements of array values; a condition matches if any of them does"""
+    out = []
+    for value in values:
+        out.append(value)
+        if isinstance(value, list):
+            out.extend(value)
+    return out
+
+def _comparable(a: Any, b: Any) -> bool:
+    if isinstance(a, bool) or isinstance(b, bool):
+        return isinstance(a, bool) and isinstance(b, bool)
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return True
+    return a is not None and type(a) is type(b) and isinstance(a, (str, datetime, ObjectId, bytes))
+
+_COMPARISONS = {"$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt, "$lte": operator.le}
+
+def _compare(a: Any, b: Any, op: str) -> bool:
+    if not _comparable(a, b):
+        return False
+    try:
+        return _COMPARISONS[op](a, b)
+    except TypeError:
+        return False
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    """Order values across types the way MongoDB's BSON comparison does"""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (7, value)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, bytes):
+        return (5, value)
+    if isinstance(value, ObjectId):
+        return (6, value.binary)
+    if isinstance(value, datetime):
+        return (8, value)
+    return (3 if isinstance(value, dict) else 4, bson.encode({"v": value}))
+
+def _sort_docs(docs: List[Dict[str, Any]], spec: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+    # Stable sorts from the least significant key up
+    for field, direction in reversed(spec):
+        docs = sorted(docs, key=lambda doc: _sort_key(_first(doc, field)), reverse=direction < 0)
+    return docs
+
+def _normalize_sort(key_or_list: Any, direction: Optional[int] = None) -> List[Tuple[str, int]]:
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction if direction is not None else 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return [(field, value) for field, value in key_or_list]
+
+# ---------------------------------------------------------------------------
+# Query matching
+# ---------------------------------------------------------------------------
+
+_REGEX_FLAGS = {"i": re.IGNORECASE, "m": re.MULTILINE, "s": re.DOTALL, "x": re.VERBOSE}
+
+def _compile_regex(pattern: Any, options: str = "") -> "re.Pattern":
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    if isinstance(pattern, bson.regex.Regex):
+        return pattern.try_compile()
+    flags = 0
+    for flag in options:
+        flags |= _REGEX_FLAGS.get(flag, 0)
+    return re.compile(pattern, flags)
+
+def _is_operator_dict(cond: Any) -> bool:
+    return isinstance(cond, dict) and bool(cond) and all(key.startswith("$") for key in cond)
+
+def _match_eq(values: List[Any], target: Any) -> bool:
+    if target is None and not values:
+        return True
+    target_key = _key(target)
+    return any(_key(value) == target_key for value in _candidates(values))
+
+def _match_regex(values: List[Any], pattern: "re.Pattern") -> bool:
+    return any(isinstance(value, str) and pattern.search(value) for value in _candidates(values))
+
+def _match_in(values: List[Any], targets: Iterable[Any]) -> bool:
+    for target in targets:
+        if isinstance(target, (re.Pattern, bson.regex.Regex)):
+            if _match_regex(values, _compile_regex(target)):
+                return True
+        elif _match_eq(values, target):
+            return True
+    return False
+
+def _match_op(values: List[Any], op: str, arg: Any, options: str) -> bool:
+    if op == "$eq":
+        return _match_eq(values, arg)
+    if op == "$ne":
+        return not _match_eq(values, arg)
+    if op in _COMPARISONS:
+        return any(_compare(value, arg, op) for value in _candidates(values))
+    if op == "$in":
+        return _match_in(values, arg)
+    if op == "$nin":
+        return not _match_in(values, arg)
+    if op == "$exists":
+        return bool(values) == bool(arg)
+    if op == "$regex":
+        return _match_regex(values, _compile_regex(arg, options))
+    if op == "$size":
+        return any(isinstance(value, list) and len(value) == arg for value in values)
+    if op == "$all":
+        return all(_match_eq(values, target) for target in arg)
+    if op == "$not":
+        return not _match_field(values, arg)
+    if op == "$elemMatch":
+        return any(
+            isinstance(value, list) and any(
+                _matches(item, arg) if isinstance(item, dict) and not _is_operator_dict(arg) else _match_field([item], arg)
+                for item in value
+            )
+            for value in values
+        )
+    raise OperationFailure(f"unknown operator: {op}")
+
+def _match_field(values: List[Any], cond: Any) -> bool:
+    if isinstance(cond, (re.Pattern, bson.regex.Regex)):
+        return _match_regex(values, _compile_regex(cond))
+    if not _is_operator_dict(cond):
+        return _match_eq(values, cond)
+    options = cond.get("$options", "")
+    return all(_match_op(values, op, arg, options) for op, arg in cond.items() if op != "$options")
+
+def _matches(doc: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    for field, cond in (query or {}).items():
+        if field == "$or":
+            if not any(_matches(doc, sub) for sub in cond):
+                return False
+        elif field == "$and":
+            if not all(_matches(doc, sub) for sub in cond):
+                return False
+        elif field == "$nor":
+            if any(_matches(doc, sub) for sub in cond):
+                return False
+        elif field == "$expr":
+            if not _evaluate(cond, doc):
+                return False
+        elif field.startswith("$"):
+            raise OperationFailure(f"unknown top level operator: {field}")
+        elif not _match_field(_path_values(doc, field), cond):
+            return False
+    return True
+
+# ---------------------------------------------------------------------------
+# Aggregation expressions and projections
+# ---------------------------------------------------------------------------
+
+def _numbers(args: List[Any]) -> Optional[List[float]]:
+    return None if any(arg is None for arg in args) else args
+
+def _evaluate(expr: Any, doc: Dict[str, Any]) -> Any:
+    if isinstance(expr, str) and expr.startswith("$"):
+        return _first(doc, expr[1:])
+    if isinstance(expr, list):
+        return [_evaluate(item, doc) for item in expr]
+    if not isinstance(expr, dict):
+        return expr
+    if len(expr) != 1 or not next(iter(expr)).startswith("$"):
+        return {key: _evaluate(value, doc) for key, value in expr.items()}
+
+    op, arg = next(iter(expr.items()))
+    if op == "$literal":
+        return arg
+    if op == "$cond":
+        if isinstance(arg, dict):
+            arg = [arg["if"], arg["then"], arg["else"]]
+        return _evaluate(arg[1], doc) if _evaluate(arg[0], doc) else _evaluate(arg[2], doc)
+
+    args = [_evaluate(item, doc) for item in (arg if isinstance(arg, list) else [arg])]
+    if op == "$and":
+        return all(args)
+    if op == "$or":
+        return any(args)
+    if op == "$ifNull":
+        return next((value for value in args[:-1] if value is not None), args[-1])
+    if op in _COMPARISONS:
+        return _COMPARISONS[op](_sort_key(args[0]), _sort_key(args[1]))
+    if op == "$eq":
+        return _key(args[0]) == _key(args[1])
+    if op == "$ne":
+        return _key(args[0]) != _key(args[1])
+    if op in ("$add", "$multiply"):
+        values = _numbers(args)
+        if values is None:
+            return None
+        result = 0 if op == "$add" else 1
+        for value in values:
+            result = result + value if op == "$add" else result * value
+        return result
+    if op == "$subtract":
+        return None if _numbers(args) is None else args[0] - args[1]
+    if op == "$divide":
+        return None if _numbers(args) is None else args[0] / args[1]
+    if op == "$toLong":
+        value = args[0]
+        if isinstance(value, datetime):
+            # Stored datetimes are naive UTC
+            return calendar.timegm(value.utctimetuple()) * 1000 + value.microsecond // 1000
+        return None if value is None else int(value)
+    if op == "$size":
+        return len(args[0])
+    raise OperationFailure(f"Unsupported expression operator: {op}")
+
+def _set_path(doc: Dict[str, Any], path: str, value: Any) -> None:
+    parts = path.split(".")
+    target = doc
+    for part in parts[:-1]:
+        if isinstance(target, list):
+            index = int(part)
+            while len(target) <= index:
+                target.append(None)
+            if not isinstance(target[index], (dict, list)):
+                target[index] = {}
+            target = target[index]
+        else:
+            if not isinstance(target.get(part), (dict, list)):
+                target[part] = {}
+            target = target[part]
+    last = parts[-1]
+    if isinstance(target, list):
+        index = int(last)
+        while len(target) <= index:
+            target.append(None)
+        target[index] = value
+    else:
+        target[last] = value
+
+def _get_path(doc: Dict[str, Any], path: str) -> Any:
+    target: Any = doc
+    for part in path.split("."):
+        if isinstance(target, dict) and part in target:
+            target = target[part]
+        elif isinstance(target, list) and part.isdigit() and int(part) < len(target):
+            target = target[int(part)]
+        else:
+            return _MISSING
+    return target
+
+def _unset_path(doc: Dict[str, Any], path: str) -> None:
+    parent_path, _, last = path.rpartition(".")
+    parent = _get_path(doc, parent_path) if parent_path else doc
+    if isinstance(parent, dict):
+        parent.pop(last, None)
+    elif isinstance(parent, list) and last.isdigit() and int(last) < len(parent):
+        parent[int(last)] = None
+
+def _project(doc: Dict[str, Any], projection: Any) -> Dict[str, Any]:
+    if not projection:
+        return copy.deepcopy(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    fields = {key: value for key, value in projection.items() if key != "_id"}
+    include_id = projection.get("_id", 1)
+
+    if all(value in (0, False) for value in fields.values()) and (fields or not include_id):
+        projected = copy.deepcopy(doc)
+        for path in fields:
+            _unset_path(projected, path)
+        if not include_id:
+            projected.pop("_id", None)
+        return projected
+
+    projected = {}
+    if include_id and "_id" in doc:
+        projected["_id"] = copy.deepcopy(doc["_id"])
+    for path, spec in fields.items():
+        if spec in (1, True):
+            value = _get_path(doc, path)
+            if value is not _MISSING:
+                _set_path(projected, path, copy.deepcopy(value))
+        else:
+            _set_path(projected, path, _evaluate(spec, doc))
+    return projected
+
+# ---------------------------------------------------------------------------
+# Updates
+# ---------------------------------------------------------------------------
+
+def _apply_update(doc: Dict[str, Any], update: Any, inserting: bool) -> None:
+    if isinstance(update, list):
+        # Update pipeline; each stage sees the document as the previous stage left it
+        for stage in update:
+            (name, arg), = stage.items()
+            if name in ("$set", "$addFields"):
+                values = {path: _evaluate(expr, doc) for path, expr in arg.items()}
+                for path, value in values.items():
+                    _set_path(doc, path, value)
+            elif name == "$unset":
+                for path in [arg] if isinstance(arg, str) else arg:
+                    _unset_path(doc, path)
+            else:
+                raise OperationFailure(f"Unsupported update pipeline stage: {name}")
+        return
+    if not _is_operator_dict(update):
+        doc_id = doc.get("_id", _MISSING)
+        doc.clear()
+        doc.update(copy.deepcopy(update))
+        if doc_id is not _MISSING:
+            doc["_id"] = doc_id
+        return
+
+    for op, fields in update.items():
+        if op == "$setOnInsert" and not inserting:
+            continue
+        for path, value in fields.items():
+            current = _get_path(doc, path)
+            if op in ("$set", "$setOnInsert"):
+                _set_path(doc, path, copy.deepcopy(value))
+            elif op == "$unset":
+                _unset_path(doc, path)
+            elif op == "$inc":
+                _set_path(doc, path, (0 if current is _MISSING else current) + value)
+            elif op in ("$min", "$max"):
+                if current is _MISSING or _COMPARISONS["$lt" if op == "$min" else "$gt"](_sort_key(value), _sort_key(current)):
+                    _set_path(doc, path, copy.deepcopy(value))
+            elif op in ("$push", "$addToSet"):
+                items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                array = [] if current is _MISSING else current
+                if not isinstance(array, list):
+                    raise OperationFailure(f"The field '{path}' must be an array")
+                for item in items:
+                    if op == "$push" or not _match_eq(array, item):
+                        array.append(copy.deepcopy(item))
+                if op == "$push" and isinstance(value, dict) and "$slice" in value:
+                    limit = value["$slice"]
+                    array = array[limit:] if limit < 0 else array[:limit]
+                _set_path(doc, path, array)
+            else:
+                raise OperationFailure(f"Unsupported update operator: {op}")
+
+def _upsert_seed(query: Dict[str, Any]) -> Dict[str, Any]:
+    """The document an upsert starts from: the query's equality conditions"""
+    doc: Dict[str, Any] = {}
+    for field, cond in query.items():
+        if field == "$and":
+            for sub in cond:
+                doc.update(_upsert_seed(sub))
+        elif field.startswith("$"):
+            continue
+        elif not _is_operator_dict(cond):
+            _set_path(doc, field, copy.deepcopy(cond))
+        elif "$eq" in cond:
+            _set_path(doc, field, copy.deepcopy(cond["$eq"]))
+    return doc
+
+# ---------------------------------------------------------------------------
+# Storage
+# ---------------------------------------------------------------------------
+
+class _SQLiteFile:
+    """Write-through persistence: one row per document, BSON encoded"""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={LOCAL_DB_SYNCHRONOUS}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents (namespace TEXT NOT NULL, id BLOB NOT NULL, body BLOB NOT NULL, PRIMARY KEY (namespace, id))"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS collections (namespace TEXT PRIMARY KEY, indexes BLOB)")
+
+    @staticmethod
+    def _id(doc_id: Any) -> bytes:
+        return bson.encode({"_id": doc_id})
+
+    def load(self) -> Iterable[Tuple[str, List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        namespaces = {
+            namespace: bson.decode(indexes)["indexes"] if indexes else []
+            for namespace, indexes in self._conn.execute("SELECT namespace, indexes FROM collections")
+        }
+        for (namespace,) in self._conn.execute("SELECT DISTINCT namespace FROM documents"):
+            namespaces.setdefault(namespace, [])
+        for namespace, indexes in namespaces.items():
+            docs = [bson.decode(body) for (body,) in self._conn.execute("SELECT body FROM documents WHERE namespace = ?", (namespace,))]
+            yield namespace, indexes, docs
+
+    def write(self, namespace: str, upserts: List[Dict[str, Any]], deletes: List[Any]) -> None:
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute("INSERT OR IGNORE INTO collections (namespace) VALUES (?)", (namespace,))
+            if deletes:
+                self._conn.executemany(
+                    "DELETE FROM documents WHERE namespace = ? AND id = ?",
+                    [(namespace, self._id(doc_id)) for doc_id in deletes]
+                )
+            if upserts:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO documents (namespace, id, body) VALUES (?, ?, ?)",
+                    [(namespace, self._id(doc["_id"]), bson.encode(doc)) for doc in upserts]
+                )
+
+    def save_indexes(self, namespace: str, specs: List[Dict[str, Any]]) -> None:
+        self._conn.execute(
+            "INSERT INTO collections (namespace, indexes) VALUES (?, ?) ON CONFLICT(namespace) DO UPDATE SET indexes = excluded.indexes",
+            (namespace, bson.encode({"indexes": specs}))
+        )
+
+    def drop(self, namespace: str) -> None:
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM documents WHERE namespace = ?", (namespace,))
+            self._conn.execute("DELETE FROM collections WHERE namespace = ?", (namespace,))
+
+    def close(self) -> None:
+        self._conn.close()
+
+# ---------------------------------------------------------------------------
+# Collections
+# ---------------------------------------------------------------------------
+
+class _Index:
+    """A declared index: enforces uniqueness and TTL, and serves equality lookups on its leading field"""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+        self.name = spec["name"]
+        self.keys = list(spec["key"].items())
+        self.lead = self.keys[0][0]
+        self.unique = spec.get("unique", False)
+        self.sparse = spec.get("sparse", False)
+        self.partial = spec.get("partialFilterExpression")
+        self.ttl = spec.get("expireAfterSeconds")
+        # Partial and sparse indexes do not cover every document, so they never serve lookups
+        self.serves_lookups = not (self.sparse or self.partial)
+        self.entries: Dict[Any, Dict[Any, None]] = {}
+        self.unique_keys: Dict[Tuple, Any] = {}
+
+    def _covers(self, doc: Dict[str, Any]) -> bool:
+        if self.partial and not _matches(doc, self.partial):
+            return False
+        if self.sparse and not any(_path_values(doc, field) for field, _ in self.keys):
+            return False
+        return True
+
+    def _lead_keys(self, doc: Dict[str, Any]) -> set:
+        return {_key(value) for value in _candidates(_path_values(doc, self.lead))} or {_key(None)}
+
+    def _unique_key(self, doc: Dict[str, Any]) -> Tuple:
+        return tuple(_key(_first(doc, field)) for field, _ in self.keys)
+
+    def conflict(self, doc: Dict[str, Any], doc_key: Any) -> bool:
+        if not self.unique or not self._covers(doc):
+            return False
+        owner = self.unique_keys.get(self._unique_key(doc))
+        return owner is not None and owner != doc_key
+
+    def add(self, doc: Dict[str, Any], doc_key: Any) -> None:
+        for key in self._lead_keys(doc):
+            self.entries.setdefault(key, {})[doc_key] = None
+        if self.unique and self._covers(doc):
+            self.unique_keys[self._unique_key(doc)] = doc_key
+
+    def remove(self, doc: Dict[str, Any], doc_key: Any) -> None:
+        for key in self._lead_keys(doc):
+            bucket = self.entries.get(key)
+            if bucket is not None:
+                bucket.pop(doc_key, None)
+                if not bucket:
+                    del self.entries[key]
+        if self.unique and self._covers(doc):
+            unique_key = self._unique_key(doc)
+            if self.unique_keys.get(unique_key) == doc_key:
+                del self.unique_keys[unique_key]
+
+class LocalCursor:
+    """Motor-style cursor over a snapshot taken on first read"""
+
+    def __init__(self, loader: Callable[[], List[Dict[str, Any]]], transform: Optional[Callable] = None, plan: Optional[Callable[[], Dict[str, Any]]] = None):
+        self._loader = loader
+        self._transform = transform
+        self._plan = plan
+        self._sort: Optional[List[Tuple[str, int]]] = None
+        self._skip = 0
+        self._limit = 0
+        self._buffer: Optional[List[Dict[str, Any]]] = None
+        self._position = 0
+
+    def sort(self, key_or_list: Any, direction: Optional[int] = None) -> "LocalCursor":
+        self._sort = _normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, skip: int) -> "LocalCursor":
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int) -> "LocalCursor":
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size: int) -> "LocalCursor":
+        return self
+
+    def _materialize(self) -> List[Dict[str, Any]]:
+        if self._buffer is None:
+            docs = self._loader()
+            if self._sort:
+                docs = _sort_docs(docs, self._sort)
+            docs = docs[self._skip:]
+            if self._limit:
+                docs = docs[:self._limit]
+            self._buffer = [self._transform(doc) for doc in docs] if self._transform else docs
+        return self._buffer
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        docs = self._materialize()
+        end = len(docs) if length is None else min(len(docs), self._position + length)
+        batch = docs[self._position:end]
+        self._position = end
+        return batch
+
+    def __aiter__(self) -> "LocalCursor":
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        docs = self._materialize()
+        if self._position >= len(docs):
+            raise StopAsyncIteration
+        self._position += 1
+        return docs[self._position - 1]
+
+    async def explain(self) -> Dict[str, Any]:
+        return {"queryPlanner": {"winningPlan": self._plan() if self._plan else {"stage": "PIPELINE"}}}
+
+    def close(self) -> None:
+        self._buffer = []
+
+class LocalCollection:
+    """An in-memory collection with the Motor methods the routers call"""
+
+    def __init__(self, database: "LocalDatabase", name: str):
+        self.database = database
+        self.name = name
+        self.full_name = f"{database.name}.{name}"
+        self.exists = False
+        self._docs: Dict[Any, Dict[str, Any]] = {}
+        self._indexes: Dict[str, _Index] = {}
+        # Changes of the current operation: document key -> (_id, document or None when deleted)
+        self._dirty: Dict[Any, Tuple[Any, Optional[Dict[str, Any]]]] = {}
+        self._last_expiry = 0.0
+
+    def with_options(self, **kwargs) -> "LocalCollection":
+        return self
+
+    # -- internals ---------------------------------------------------------
+
+    def _load(self, specs: List[Dict[str, Any]], docs: List[Dict[str, Any]]) -> None:
+        self.exists = True
+        for doc in docs:
+            self._docs[_key(doc["_id"])] = doc
+        for spec in specs:
+            self._build_index(spec)
+
+    def _build_index(self, spec: Dict[str, Any]) -> None:
+        index = _Index(spec)
+        for doc_key, doc in self._docs.items():
+            if index.conflict(doc, doc_key):
+                raise OperationFailure(f"E11000 duplicate key error building index {index.name} on {self.full_name}", DUPLICATE_KEY)
+            index.add(doc, doc_key)
+        self._indexes[index.name] = index
+
+    def _duplicate(self, index_name: str, doc: Dict[str, Any]) -> DuplicateKeyError:
+        return DuplicateKeyError(
+            f"E11000 duplicate key error collection: {self.full_name} index: {index_name}",
+            DUPLICATE_KEY,
+            {"code": DUPLICATE_KEY, "index": index_name, "keyValue": {"_id": doc.get("_id")}}
+        )
+
+    def _insert(self, doc: Dict[str, Any]) -> Any:
+        if "_id" not in doc:
+            doc["_id"] = ObjectId()
+        doc_key = _key(doc["_id"])
+        if doc_key in self._docs:
+            raise self._duplicate("_id_", doc)
+        stored = copy.deepcopy(doc)
+        for index in self._indexes.values():
+            if index.conflict(stored, doc_key):
+                raise self._duplicate(index.name, stored)
+        for index in self._indexes.values():
+            index.add(stored, doc_key)
+        self._docs[doc_key] = stored
+        self._dirty[doc_key] = (stored["_id"], stored)
+        self.exists = True
+        return doc["_id"]
+
+    def _replace(self, old: Dict[str, Any], new: Dict[str, Any]) -> None:
+        if _key(new.get("_id")) != _key(old["_id"]):
+            raise OperationFailure("Performing an update on the path '_id' would modify the immutable field '_id'", 66)
+        doc_key = _key(old["_id"])
+        for index in self._indexes.values():
+            if index.conflict(new, doc_key):
+                raise self._duplicate(index.name, new)
+        for index in self._indexes.values():
+            index.remove(old, doc_key)
+            index.add(new, doc_key)
+        self._docs[doc_key] = new
+        self._dirty[doc_key] = (new["_id"], new)
+
+    def _delete(self, doc: Dict[str, Any]) -> None:
+        doc_key = _key(doc["_id"])
+        for index in self._indexes.values():
+            index.remove(doc, doc_key)
+        del self._docs[doc_key]
+        self._dirty[doc_key] = (doc["_id"], None)
+
+    def _flush(self) -> None:
+        """Commit this operation's changes to the SQLite file, if any"""
+        if not self._dirty:
+            return
+        storage = self.database.client._storage
+        if storage is not None:
+            upserts = [doc for _, doc in self._dirty.values() if doc is not None]
+            deletes = [doc_id for doc_id, doc in self._dirty.values() if doc is None]
+            storage.write(self.full_name, upserts, deletes)
+        self._dirty = {}
+
+    def _expire(self) -> None:
+        """Apply TTL indexes at most once a second"""
+        now = time.monotonic()
+        if now - self._last_expiry < 1:
+            return
+        self._last_expiry = now
+        for index in self._indexes.values():
+            if index.ttl is None:
+                continue
+            cutoff = datetime.utcnow() - timedelta(seconds=index.ttl)
+            expired = [
+                doc for doc in self._docs.values()
+                if any(isinstance(value, datetime) and value < cutoff for value in _candidates(_path_values(doc, index.lead)))
+            ]
+            for doc in expired:
+                self._delete(doc)
+        self._flush()
+
+    def _plan(self, query: Dict[str, Any]) -> Tuple[Optional[List[Any]], Dict[str, Any]]:
+        """Document keys an index can narrow the query to, or None for a full scan"""
+        def lookup_keys(cond: Any) -> Optional[List[Any]]:
+            if isinstance(cond, dict) and set(cond) == {"$in"}:
+                cond_values = cond["$in"]
+            elif isinstance(cond, (dict, list, re.Pattern)) or cond is None:
+                return None
+            else:
+                cond_values = [cond]
+            if any(isinstance(value, (dict, list, re.Pattern, bson.regex.Regex)) or value is None for value in cond_values):
+                return None
+            return [_key(value) for value in cond_values]
+
+        if "_id" in query:
+            keys = lookup_keys(query["_id"])
+            if keys is not None:
+                return [key for key in keys if key in self._docs], {"stage": "IDHACK"}
+        for index in self._indexes.values():
+            if not index.serves_lookups or index.lead not in query:
+                continue
+            keys = lookup_keys(query[index.lead])
+            if keys is None:
+                continue
+            doc_keys: Dict[Any, None] = {}
+            for key in keys:
+                doc_keys.update(index.entries.get(key, {}))
+            return list(doc_keys), {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": index.name}}
+        return None, {"stage": "COLLSCAN"}
+
+    def _find(self, query: Optional[Dict[str, Any]], sort: Optional[List[Tuple[str, int]]] = None) -> List[Dict[str, Any]]:
+        query = query or {}
+        if not isinstance(query, dict):
+            query = {"_id": query}
+        doc_keys, _ = self._plan(query)
+        docs = self._docs.values() if doc_keys is None else (self._docs[key] for key in doc_keys)
+        matched = [doc for doc in docs if _matches(doc, query)]
+        return _sort_docs(matched, sort) if sort else matched
+
+    def _update(self, query: Dict[str, Any], update: Any, upsert: bool, multi: bool) -> Dict[str, Any]:
+        matched = self._find(query)
+        if not multi:
+            matched = matched[:1]
+        modified = 0
+        for doc in matched:
+            new = copy.deepcopy(doc)
+            _apply_update(new, update, inserting=False)
+            if _key(new) != _key(doc):
+                self._replace(doc, new)
+                modified += 1
+        if not matched and upsert:
+            new = _upsert_seed(query)
+            _apply_update(new, update, inserting=True)
+            self._insert(new)
+            return {"n": 1, "nModified": 0, "upserted": new["_id"]}
+        return {"n": len(matched), "nModified": modified}
+
+    def _run_pipeline(self, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        self._expire()
+        stages = list(pipeline)
+        if stages and "$match" in stages[0]:
+            docs, fresh = self._find(stages.pop(0)["$match"]), False
+        else:
+            docs, fresh = list(self._docs.values()), False
+        for stage in stages:
+            (name, arg), = stage.items()
+            if name == "$match":
+                docs = [doc for doc in docs if _matches(doc, arg)]
+            elif name == "$project":
+                docs, fresh = [_project(doc, arg) for doc in docs], True
+            elif name in ("$addFields", "$set"):
+                projected = []
+                for doc in docs:
+                    doc = doc if fresh else copy.deepcopy(doc)
+                    for path, expr in arg.items():
+                        _set_path(doc, path, _evaluate(expr, doc))
+                    projected.append(doc)
+                docs, fresh = projected, True
+            elif name == "$unionWith":
+                other = arg if isinstance(arg, dict) else {"coll": arg}
+                if not fresh:
+                    docs, fresh = [copy.deepcopy(doc) for doc in docs], True
+                docs = docs + self.database[other["coll"]]._run_pipeline(other.get("pipeline", []))
+            elif name == "$sort":
+                docs = _sort_docs(docs, list(arg.items()))
+            elif name == "$skip":
+                docs = docs[arg:]
+            elif name == "$limit":
+                docs = docs[:arg]
+            elif name == "$sample":
+                docs = random.sample(docs, min(arg["size"], len(docs)))
+            elif name == "$count":
+                docs, fresh = [{arg: len(docs)}], True
+            else:
+                raise OperationFailure(f"Unsupported aggregation stage: {name}")
+        return docs if fresh else [copy.deepcopy(doc) for doc in docs]
+
+    # -- reads -------------------------------------------------------------
+
+    def find(self, filter: Optional[Dict[str, Any]] = None, projection: Any = None, **kwargs) -> LocalCursor:
+        self._expire()
+        query = filter if isinstance(filter, dict) or filter is None else {"_id": filter}
+        cursor = LocalCursor(lambda: self._find(query), lambda doc: _project(doc, projection), lambda: self._plan(query or {})[1])
+        if kwargs.get("sort"):
+            cursor.sort(kwargs["sort"])
+        if kwargs.get("skip"):
+            cursor.skip(kwargs["skip"])
+        if kwargs.get("limit"):
+            cursor.limit(kwargs["limit"])
+        return cursor
+
+    async def find_one(self, filter: Any = None, projection: Any = None, **kwargs) -> Optional[Dict[str, Any]]:
+        docs = await self.find(filter, projection, **kwargs).limit(1).to_list(1)
+        return docs[0] if docs else None
+
+    async def count_documents(self, filter: Dict[str, Any], **kwargs) -> int:
+        self._expire()
+        return len(self._find(filter))
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        return len(self._docs)
+
+    async def distinct(self, key: str, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Any]:
+        seen: Dict[Any, Any] = {}
+        for doc in self._find(filter):
+            for value in _candidates(_path_values(doc, key)):
+                if not isinstance(value, list):
+                    seen.setdefault(_key(value), value)
+        return [copy.deepcopy(value) for value in seen.values()]
+
+    def aggregate(self, pipeline: List[Dict[str, Any]], **kwargs) -> LocalCursor:
+        return LocalCursor(lambda: self._run_pipeline(pipeline))
+
+    # -- writes ------------------------------------------------------------
+
+    async def insert_one(self, document: Dict[str, Any], **kwargs) -> InsertOneResult:
+        self._expire()
+        try:
+            return InsertOneResult(self._insert(document), True)
+        finally:
+            self._flush()
+
+    async def insert_many(self, documents: Iterable[Dict[str, Any]], ordered: bool = True, **kwargs) -> InsertManyResult:
+        self._expire()
+        documents = list(documents)
+        errors = []
+        try:
+            for index, doc in enumerate(documents):
+                try:
+                    self._insert(doc)
+                except DuplicateKeyError as e:
+                    errors.append({"index": index, "code": DUPLICATE_KEY, "errmsg": str(e), "op": doc})
+                    if ordered:
+                        break
+        finally:
+            self._flush()
+        if errors:
+            raise BulkWriteError({
+                "writeErrors": errors, "writeConcernErrors": [], "nInserted": len(documents) - len(errors),
+                "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": []
+            })
+        return InsertManyResult([doc["_id"] for doc in documents], True)
+
+    async def update_one(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False, **kwargs) -> UpdateResult:
+        self._expire()
+        try:
+            return UpdateResult(self._update(filter, update, upsert, multi=False), True)
+        finally:
+            self._flush()
+
+    async def update_many(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False, **kwargs) -> UpdateResult:
+        self._expire()
+        try:
+            return UpdateResult(self._update(filter, update, upsert, multi=True), True)
+        finally:
+            self._flush()
+
+    async def replace_one(self, filter: Dict[str, Any], replacement: Dict[str, Any], upsert: bool = False, **kwargs) -> UpdateResult:
+        if _is_operator_dict(replacement):
+            raise ValueError("replacement can not include $ operators")
+        return await self.update_one(filter, replacement, upsert=upsert)
+
+    async def delete_one(self, filter: Dict[str, Any], **kwargs) -> DeleteResult:
+        self._expire()
+        try:
+            docs = self._find(filter)[:1]
+            for doc in docs:
+                self._delete(doc)
+            return DeleteResult({"n": len(docs)}, True)
+        finally:
+            self._flush()
+
+    async def delete_many(self, filter: Dict[str, Any], **kwargs) -> DeleteResult:
+        self._expire()
+        try:
+            docs = self._find(filter)
+            for doc in docs:
+                self._delete(doc)
+            return DeleteResult({"n": len(docs)}, True)
+        finally:
+            self._flush()
+
+    async def find_one_and_update(
+        self,
+        filter: Dict[str, Any],
+        update: Dict[str, Any],
+        projection: Any = None,
+        sort: Any = None,
+        upsert: bool = False,
+        return_document: bool = ReturnDocument.BEFORE,
+        **kwargs
+    ) -> Optional[Dict[str, Any]]:
+        self._expire()
+        try:
+            docs = self._find(filter, _normalize_sort(sort) if sort else None)[:1]
+            if not docs:
+                if not upsert:
+                    return None
+                raw = self._update(filter, update, upsert=True, multi=False)
+                return _project(self._docs[_key(raw["upserted"])], projection) if return_document else None
+            before = docs[0]
+            after = copy.deepcopy(before)
+            _apply_update(after, update, inserting=False)
+            if _key(after) != _key(before):
+                self._replace(before, after)
+            return _project(after if return_document else before, projection)
+        finally:
+            self._flush()
+
+    async def bulk_write(self, requests: List[Any], ordered: bool = True, **kwargs) -> BulkWriteResult:
+        self._expire()
+        result = {"nInserted": 0, "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": [], "writeErrors": [], "writeConcernErrors": []}
+        try:
+            for index, request in enumerate(requests):
+                try:
+                    if isinstance(request, InsertOne):
+                        self._insert(request._doc)
+                        result["nInserted"] += 1
+                    elif isinstance(request, (UpdateOne, UpdateMany, ReplaceOne)):
+                        raw = self._update(request._filter, request._doc, request._upsert, multi=isinstance(request, UpdateMany))
+                        if "upserted" in raw:
+                            result["nUpserted"] += 1
+                            result["upserted"].append({"index": index, "_id": raw["upserted"]})
+                        else:
+                            result["nMatched"] += raw["n"]
+                            result["nModified"] += raw["nModified"]
+                    elif isinstance(request, (DeleteOne, DeleteMany)):
+                        docs = self._find(request._filter)
+                        if isinstance(request, DeleteOne):
+                            docs = docs[:1]
+                        for doc in docs:
+                            self._delete(doc)
+                        result["nRemoved"] += len(docs)
+                    else:
+                        raise TypeError(f"{request!r} is not a valid request")
+                except DuplicateKeyError as e:
+                    result["writeErrors"].append({"index": index, "code": DUPLICATE_KEY, "errmsg": str(e), "op": request})
+                    if ordered:
+                        break
+        finally:
+            self._flush()
+        if result["writeErrors"]:
+            raise BulkWriteError(result)
+        return BulkWriteResult(result, True)
+
+    # -- indexes -----------------------------------------------------------
+
+    async def create_indexes(self, indexes: List[Any], **kwargs) -> List[str]:
+        names = []
+        for model in indexes:
+            spec = model.document
+            if spec["name"] not in self._indexes:
+                self._build_index(spec)
+            names.append(spec["name"])
+        self.exists = True
+        storage = self.database.client._storage
+        if storage is not None:
+            storage.save_indexes(self.full_name, [index.spec for index in self._indexes.values()])
+        return names
+
+    async def index_information(self) -> Dict[str, Any]:
+        info = {"_id_": {"key": [("_id", 1)]}}
+        for index in self._indexes.values():
+            info[index.name] = {key: value for key, value in index.spec.items() if key != "name"}
+            info[index.name]["key"] = index.keys
+        return info
+
+    async def drop(self) -> None:
+        self._docs = {}
+        self._indexes = {}
+        self._dirty = {}
+        self.exists = False
+        storage = self.database.client._storage
+        if storage is not None:
+            storage.drop(self.full_name)
+
+class LocalDatabase:
+    def __init__(self, client: "LocalClient", name: str):
+        self.client = client
+        self.name = name
+        self._collections: Dict[str, LocalCollection] = {}
+
+    def __getitem__(self, name: str) -> LocalCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = LocalCollection(self, name)
+        return collection
+
+    def __getattr__(self, name: str) -> LocalCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name: str, **kwargs) -> LocalCollection:
+        return self[name]
+
+    def with_options(self, **kwargs) -> "LocalDatabase":
+        return self
+
+    async def command(self, command: Any, *args, **kwargs) -> Dict[str, Any]:
+        name = command if isinstance(command, str) else next(iter(command))
+        if name == "ping":
+            return {"ok": 1.0}
+        raise OperationFailure(f"no such command: '{name}'", 59)
+
+    async def create_collection(self, name: str, **kwargs) -> LocalCollection:
+        collection = self[name]
+        if collection.exists:
+            raise CollectionInvalid(f"collection {name} already exists")
+        collection.exists = True
+        storage = self.client._storage
+        if storage is not None:
+            storage.write(collection.full_name, [], [])
+        return collection
+
+    async def list_collection_names(self, **kwargs) -> List[str]:
+        return [name for name, collection in self._collections.items() if collection.exists]
+
+class LocalClient:
+    """Stands in for AsyncIOMotorClient; every database shares one optional SQLite file"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or None
+        self.closed = False
+        self._databases: Dict[str, LocalDatabase] = {}
+        self._storage = _SQLiteFile(self.path) if self.path else None
+        if self._storage is not None:
+            loaded = 0
+            for namespace, specs, docs in self._storage.load():
+                db_name, _, collection = namespace.partition(".")
+                self[db_name][collection]._load(specs, docs)
+                loaded += len(docs)
+            print(f"✅ [LOCAL_DB] Loaded {loaded} documents from {self.path}")
+
+    def __getitem__(self, name: str) -> LocalDatabase:
+        database = self._databases.get(name)
+        if database is None:
+            database = self._databases[name] = LocalDatabase(self, name)
+        return database
+
+    def get_database(self, name: str, **kwargs) -> LocalDatabase:
+        return self[name]
+
+    @property
+    def admin(self) -> LocalDatabase:
+        return self["admin"]
+
+    def close(self) -> None:
+        if not self.closed and self._storage is not None:
+            self._storage.close()
+        self.closed = True
+
+_clients: Dict[str, LocalClient] = {}
+
+def open_local_client(path: str = "") -> LocalClient:
+    """The process-wide local client for a file ("" for memory only); reconnects reuse it"""
+    client = _clients.get(path)
+    if client is None or client.closed:
+        client = _clients[path] = LocalClient(path)
+    return client
@@ -1,28 +1,80 @@
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 import uvicorn
 from dotenv import load_dotenv
 import os
+import asyncio
 from datetime import datetime
 
-from database import init_db, get_db
-from routers import auth, users, questions, results
+from database import init_db, get_db, close_db, run_connection_supervisor, get_connection_state, get_pool_metrics
+from indexes import ensure_indexes
+from archive import ensure_archive_collection, run_archive_loop, RESULT_ARCHIVE_AFTER_DAYS
+from sketches import score_engine, run_sketch_flush_loop
+from ingest import start_ingest_queue, stop_ingest_queue, get_ingest_queue
+from explanations import start_explanation_queue, stop_explanation_queue, get_explanation_queue
+from utils.passwords import password_hasher
+from utils.user_store import user_cache
+from utils.http_clients import http_clients
+from utils.rate_limit import login_throttle, register_throttle
+from utils.session_store import session_store, run_session_eviction_loop
+from attempts import answer_autosaver
+from utils.invalidation import invalidation_bus, run_invalidation_sync_loop
+from utils.leases import WORKER_ID
+from refresh_tokens import revocation_list, run_revocation_sync_loop
+from routers import auth, users, questions, results, reports, attempts
 from models.schemas import AssessmentConfig
 
 load_dotenv()
 
+# Flipped once startup has finished and back on shutdown; /api/ready reports it to load balancers
+readiness = {"ready": False, "started_at": None}
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     try:
-        await init_db()
-        print("🚀 FastAPI Backend Started")
+        db = await init_db()
+        supervisor_task = asyncio.create_task(run_connection_supervisor())
+        await ensure_archive_collection(db)
+        await ensure_indexes(db)
+        await start_ingest_queue()
+        await start_explanation_queue(db)
+        archive_task = asyncio.create_task(run_archive_loop()) if RESULT_ARCHIVE_AFTER_DAYS > 0 else None
+        await score_engine.load(db)
+        sketch_task = asyncio.create_task(run_sketch_flush_loop())
+        await revocation_list.sync(db)
+        revocation_task = asyncio.create_task(run_revocation_sync_loop())
+        session_task = asyncio.create_task(run_session_eviction_loop())
+        await answer_autosaver.start()
+        invalidation_task = asyncio.create_task(run_invalidation_sync_loop())
+        readiness["ready"] = True
+        readiness["started_at"] = datetime.utcnow().isoformat()
+        print(f"🚀 FastAPI Backend Started (worker {WORKER_ID})")
     except Exception as e:
         print(f"❌ Startup Error")
         raise e
     yield
     # Shutdown
+    readiness["ready"] = False
+    if archive_task:
+        archive_task.cancel()
+    await answer_autosaver.stop()
+    await stop_ingest_queue()
+    await stop_explanation_queue()
+    password_hasher.shutdown()
+    await http_clients.aclose()
+    sketch_task.cancel()
+    revocation_task.cancel()
+    session_task.cancel()
+    invalidation_task.cancel()
+    try:
+        await score_engine.flush(await get_db())
+    except Exception as e:
+        print(f"❌ [SKETCH] Final flush failed: {e}")
+    supervisor_task.cancel()
+    await close_db()
     print("🛑 FastAPI Backend Shutdown")
 
 app = FastAPI(
@@ -55,9 +107,8 @@ app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/db", tags=["Users"])
 app.include_router(questions.router, prefix="/db", tags=["Questions"])
 app.include_router(results.router, prefix="/api", tags=["Results"])
-
-# Session storage for assessment configuration
-assessment_sessions = {}
+app.include_router(reports.router, prefix="/api", tags=["Reports"])
+app.include_router(attempts.router, prefix="/api", tags=["Attempts"])
 
 @app.post("/api/topic")
 async def set_assessment_config(config: AssessmentConfig, user_id: str = Depends(auth.get_current_user_id)):
@@ -66,13 +117,14 @@ async def set_assessment_config(config: AssessmentConfig, user_id: str = Depends
         if not user_id:
             raise HTTPException(status_code=401, detail="User not authenticated")
         
+        # Assessment configuration lives in the shared session store so any worker can serve it back
         session_key = f"assessment_{user_id}"
-        assessment_sessions[session_key] = {
+        await session_store.set(session_key, {
             "userId": user_id,
             "topic": config.topic,
             "qnCount": config.qnCount,
             "difficulty": config.difficulty
-        }
+        })
         
         return {
             "success": True,
@@ -92,7 +144,7 @@ async def get_assessment_config(user_id: str = Depends(auth.get_current_user_id)
             raise HTTPException(status_code=401, detail="User not authenticated")
         
         session_key = f"assessment_{user_id}"
-        config = assessment_sessions.get(session_key)
+        config = await session_store.get(session_key)
         
         if not config:
             raise HTTPException(status_code=404, detail="No assessment configuration found")
@@ -104,6 +156,8 @@ async def get_assessment_config(user_id: str = Depends(auth.get_current_user_id)
             "qnCount": config["qnCount"],
             "difficulty": config["difficulty"]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -114,20 +168,56 @@ async def root():
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint for backend status"""
-    try:
-        # Test database connection
-        db = await get_db()
-        await db.command("ping")
-        db_status = "healthy"
-    except Exception as e:
-        db_status = f"unhealthy: {str(e)}"
+    # Reported from the connection supervisor's last ping; the health check itself does no I/O
+    connection = get_connection_state()
+    db_status = "healthy" if connection["status"] == "up" else f"unhealthy: {connection['status']}"
     
-    return {
+    health = {
         "status": "healthy",
         "message": "Backend is running",
         "database": db_status,
+        "database_connection": connection,
+        "database_pools": get_pool_metrics(),
         "timestamp": datetime.utcnow().isoformat()
     }
+    
+    ingest_queue = get_ingest_queue()
+    if ingest_queue:
+        health["ingest_queue"] = {"depth": ingest_queue.depth(), **ingest_queue.stats}
+    
+    explanation_queue = get_explanation_queue()
+    if explanation_queue:
+        health["explanation_queue"] = {"depth": explanation_queue.depth(), **explanation_queue.stats}
+    
+    health["password_hasher"] = password_hasher.metrics()
+    health["token_revocation"] = revocation_list.metrics()
+    health["user_cache"] = user_cache.stats()
+    health["http_clients"] = http_clients.metrics()
+    health["login_throttle"] = login_throttle.metrics()
+    health["register_throttle"] = register_throttle.metrics()
+    health["sessions"] = session_store.metrics()
+    health["answer_autosave"] = answer_autosaver.metrics()
+    health["cache_invalidation"] = invalidation_bus.metrics()
+    health["worker"] = WORKER_ID
+    
+    return health
+
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness probe: 503 until startup has finished, while the database is unreachable and during shutdown"""
+    connection = get_connection_state()
+    # A degraded connection has missed pings but not enough to reconnect; keep serving through it
+    ready = readiness["ready"] and connection["status"] in ("up", "degraded")
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "started": readiness["ready"],
+            "started_at": readiness["started_at"],
+            "database": connection["status"],
+            "worker": WORKER_ID
+        }
+    )
 
 @app.get("/api/test-db")
 async def test_database():
@@ -152,5 +242,6 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=5001,
-        reload=True
+        # Development server only; production runs several workers through serve.py
+        reload=os.getenv("RELOAD", "true").lower() == "true"
     ) 
\ No newline at end of file
@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+from utils.result_store import normalize_embedded_batch
+from utils.user_store import split_side_fields_batch
+
+load_dotenv()
+
+# Backfills run online: small batches, a document rate cap (0 disables) and the ingest connection pool
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "500"))
+MIGRATION_MAX_DOCS_PER_SECOND = float(os.getenv("MIGRATION_MAX_DOCS_PER_SECOND", "1000"))
+
+# One document per migration: status, version, checkpoint and progress counters
+MIGRATIONS_COLLECTION = "migrations"
+
+class Migration(ABC):
+    """A versioned backfill over the documents of one collection that match ``query``
+
+    The runner walks matching documents in _id order, hands each batch to
+    ``apply`` and checkpoints the last _id, so an interrupted run resumes where
+    it stopped. ``apply`` returns how many documents it rewrote (or would
+    rewrite, under dry run, where it must not write).
+    """
+
+    version = 0
+    name = ""
+    description = ""
+    collection = ""
+    query: Dict[str, Any] = {}
+    projection: Optional[Dict[str, Any]] = None
+
+    @abstractmethod
+    async def apply(self, db, batch: List[Dict[str, Any]], dry_run: bool) -> int:
+        ...
+
+class NormalizeEmbeddedResults(Migration):
+    version = 1
+    name = "normalize_results"
+    description = "Replace question copies embedded in results with question ids and answer indices"
+    collection = "results"
+    query = {"questions": {"$exists": True}, "question_ids": {"$exists": False}}
+
+    async def apply(self, db, batch, dry_run):
+        # Normalizing stores the referenced questions, so a dry run only counts
+        if dry_run:
+            return len(batch)
+        updates = await normalize_embedded_batch(db, batch)
+        await db.results.bulk_write(updates, ordered=False)
+        return len(updates)
+
+class SplitUserSideFields(Migration):
+    version = 2
+    name = "split_user_side_fields"
+    description = "Move embedded face descriptors and settings into user_faces and user_settings"
+    collection = "users"
+    query = {"$or": [{"face_descriptor": {"$exists": True}}, {"settings": {"$exists": True}}]}
+    projection = {"face_descriptor": 1, "settings": 1}
+
+    async def apply(self, db, batch, dry_run):
+        writes = split_side_fields_batch(batch)
+        if not dry_run:
+            for collection, updates in writes.items():
+                if updates:
+                    await db[collection].bulk_write(updates, ordered=False)
+        return len(writes["users"])
+
+# Applied in version order
+MIGRATIONS: List[Migration] = sorted([NormalizeEmbeddedResults(), SplitUserSideFields()], key=lambda m: m.version)
+
+def get_migration(name: str) -> Migration:
+    for migration in MIGRATIONS:
+        if migration.name == name:
+            return migration
+    raise KeyError(f"Unknown migration: {name}")
+
+async def migration_status(db) -> List[Dict[str, Any]]:
+    """Every known migration with its recorded state"""
+    states = {doc["_id"]: doc async for doc in db[MIGRATIONS_COLLECTION].find({})}
+    return [
+        {
+            "version": migration.version,
+            "name": migration.name,
+            "description": migration.description,
+            "status": states.get(migration.name, {}).get("status", "pending"),
+            "processed": states.get(migration.name, {}).get("processed", 0),
+            "modified": states.get(migration.name, {}).get("modified", 0)
+        }
+        for migration in MIGRATIONS
+    ]
+
+async def run_migration(
+    db,
+    migration: Migration,
+    batch_size: int = MIGRATION_BATCH_SIZE,
+    max_docs_per_second: float = MIGRATION_MAX_DOCS_PER_SECOND,
+    dry_run: bool = False,
+    restart: bool = False
+) -> Dict[str, Any]:
+    """Run one migration to completion, resuming from its checkpoint unless ``restart`` is set"""
+    states = db[MIGRATIONS_COLLECTION]
+    state = await states.find_one({"_id": migration.name}) or {}
+    if state.get("status") == "done" and not restart:
+        print(f"⏭️ [MIGRATE] {migration.name} already applied")
+        return state
+
+    checkpoint = None if restart else state.get("checkpoint")
+    remaining = await db[migration.collection].count_documents(
+        migration.query if checkpoint is None else {"$and": [migration.query, {"_id": {"$gt": checkpoint}}]}
+    )
+    mode = "dry run" if dry_run else ("restart" if restart else ("resume" if checkpoint is not None else "run"))
+    print(f"🔄 [MIGRATE] {migration.name} v{migration.version} ({mode}): {remaining} documents to scan")
+
+    if not dry_run:
+        reset = {"checkpoint": None, "processed": 0, "modified": 0} if restart else {}
+        await states.update_one(
+            {"_id": migration.name},
+            {
+                "$set": {"version": migration.version, "status": "running", "updated_at": datetime.utcnow(), "last_error": None, **reset},
+                "$setOnInsert": {"started_at": datetime.utcnow()}
+            },
+            upsert=True
+        )
+
+    processed = modified = 0
+    started = time.monotonic()
+    try:
+        while True:
+            query = migration.query if checkpoint is None else {"$and": [migration.query, {"_id": {"$gt": checkpoint}}]}
+            batch = await db[migration.collection].find(query, migration.projection).sort("_id", 1).limit(batch_size).to_list(None)
+            if not batch:
+                break
+
+            batch_modified = await migration.apply(db, batch, dry_run)
+            processed += len(batch)
+            modified += batch_modified
+            checkpoint = batch[-1]["_id"]
+            if not dry_run:
+                await states.update_one(
+                    {"_id": migration.name},
+                    {"$set": {"checkpoint": checkpoint, "updated_at": datetime.utcnow()}, "$inc": {"processed": len(batch), "modified": batch_modified}}
+                )
+
+            elapsed = time.monotonic() - started
+            rate = processed / elapsed if elapsed > 0 else 0.0
+            eta = (remaining - processed) / rate if rate > 0 else 0.0
+            print(f"🔄 [MIGRATE] {migration.name}: {processed}/{remaining} scanned, {modified} rewritten, {rate:,.0f} docs/s, ETA {max(eta, 0):.0f}s")
+
+            # Hold the average rate under the cap so production traffic keeps its share
+            if max_docs_per_second > 0:
+                ahead = processed / max_docs_per_second - (time.monotonic() - started)
+                if ahead > 0:
+                    await asyncio.sleep(ahead)
+    except Exception as e:
+        if not dry_run:
+            await states.update_one(
+                {"_id": migration.name},
+                {"$set": {"status": "failed", "last_error": str(e), "updated_at": datetime.utcnow()}}
+            )
+        print(f"❌ [MIGRATE] {migration.name} failed after {processed} documents, resumable from checkpoint: {e}")
+        raise
+
+    elapsed = time.monotonic() - started
+    summary = {
+        "name": migration.name,
+        "version": migration.version,
+        "dry_run": dry_run,
+        "processed": processed,
+        "modified": modified,
+        "seconds": round(elapsed, 2),
+        "docs_per_second": round(processed / elapsed, 1) if elapsed > 0 else 0.0
+    }
+    if not dry_run:
+        await states.update_one(
+            {"_id": migration.name},
+            {"$set": {"status": "done", "finished_at": datetime.utcnow(), "updated_at": datetime.utcnow()}}
+        )
+    print(f"✅ [MIGRATE] {migration.name}: {processed} scanned, {modified} {'would be ' if dry_run else ''}rewritten in {summary['seconds']}s ({summary['docs_per_second']:,} docs/s)")
+    return summary
+
+async def run_pending(db, **options) -> List[Dict[str, Any]]:
+    """Run every migration not yet applied, in version order"""
+    return [await run_migration(db, migration, **options) for migration in MIGRATIONS]
+
+if __name__ == "__main__":
+    from database import init_db, get_db, close_db
+
+    parser = argparse.ArgumentParser(prog="python -m migrations", description="Versioned, resumable data migrations")
+    parser.add_argument("command", choices=["status", "run"], nargs="?", default="status")
+    parser.add_argument("names", nargs="*", help="migrations to run (default: all pending)")
+    parser.add_argument("--dry-run", action="store_true", help="scan and count without writing")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start over")
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    parser.add_argument("--rate", type=float, default=MIGRATION_MAX_DOCS_PER_SECOND, help="max documents per second, 0 for no limit")
+    args = parser.parse_args()
+
+    async def _main() -> int:
+        await init_db()
+        try:
+            db = await get_db("ingest")
+            if args.command == "status":
+                for state in await migration_status(db):
+                    print(f"v{state['version']:<4}{state['name']:<28}{state['status']:<10}{state['processed']:>10} scanned{state['modified']:>10} rewritten  {state['description']}")
+                return 0
+            options = {"batch_size": args.batch_size, "max_docs_per_second": args.rate, "dry_run": args.dry_run, "restart": args.restart}
+            if args.names:
+                for name in args.names:
+                    await run_migration(db, get_migration(name), **options)
+            else:
+                await run_pending(db, **options)
+            return 0
+        except KeyError as e:
+            print(f"❌ [MIGRATE] {e.args[0]}")
+            return 2
+        finally:
+            await close_db()
+
+    sys.exit(asyncio.run(_main()))
@@ -1,8 +1,9 @@
 from pydantic import BaseModel, Field, EmailStr, ConfigDict
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
 from datetime import datetime
 from bson import ObjectId
-import bcrypt
+
+from utils.passwords import hash_password_sync, verify_password_sync
 
 class PyObjectId(ObjectId):
     @classmethod
@@ -29,7 +30,8 @@ class UserModel(BaseModel):
     google_id: Optional[str] = None
     name: Optional[str] = None
     profile_picture: Optional[str] = None
-    face_descriptor: Optional[List[float]] = None
+    # The descriptor itself lives in the user_faces collection
+    has_face_descriptor: bool = False
 
     model_config = ConfigDict(
         populate_by_name=True,
@@ -43,21 +45,20 @@ class UserModel(BaseModel):
                 "google_id": "google_oauth_id",
                 "name": "John Doe",
                 "profile_picture": "https://example.com/picture.jpg",
-                "face_descriptor": [0.1, 0.2, 0.3]
+                "has_face_descriptor": True
             }
         }
     )
 
     @classmethod
     def hash_password(cls, password: str) -> str:
-        """Hash password using bcrypt"""
-        salt = bcrypt.gensalt()
-        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+        """Hash password using bcrypt; blocks, so async handlers use utils.passwords instead"""
+        return hash_password_sync(password)
 
     @classmethod
     def verify_password(cls, password: str, hashed: str) -> bool:
-        """Verify password against hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        """Verify password against hash; blocks, so async handlers use utils.passwords instead"""
+        return verify_password_sync(password, hashed)
 
 # Question Model
 class QuestionModel(BaseModel):
@@ -67,6 +68,7 @@ class QuestionModel(BaseModel):
     question: str
     answer: str
     options: List[str]
+    explanation: Optional[str] = None  # AI explanation, shared by every result referencing this question
 
     model_config = ConfigDict(
         populate_by_name=True,
@@ -88,13 +90,12 @@ class ResultModel(BaseModel):
     user_id: PyObjectId
     score: int
     total_questions: int
-    questions: List[Dict[str, Any]]
-    user_answers: List[str]
+    question_ids: List[PyObjectId]  # References into the questions collection
+    answer_indices: List[Union[int, str]]  # Index into each question's options, -1 if unanswered, raw text if not an option
     date: datetime = Field(default_factory=datetime.utcnow)
     topic: str
     difficulty: str
     time_taken: Optional[int] = None  # Time taken in seconds
-    explanations: Optional[List[Dict[str, Any]]] = None  # AI explanations for questions
     correct_answers: Optional[int] = None
     incorrect_answers: Optional[int] = None
     percentage: Optional[float] = None
@@ -107,23 +108,11 @@ class ResultModel(BaseModel):
                 "user_id": "507f1f77bcf86cd799439011",
                 "score": 8,
                 "total_questions": 10,
-                "questions": [
-                    {
-                        "question": "What is JavaScript?",
-                        "options": ["Programming language", "Markup language", "Style sheet", "Database"],
-                        "answer": "Programming language"
-                    }
-                ],
-                "user_answers": ["Programming language"],
+                "question_ids": ["507f191e810c19729de860ea"],
+                "answer_indices": [0],
                 "topic": "JavaScript",
                 "difficulty": "easy",
                 "time_taken": 540,
-                "explanations": [
-                    {
-                        "questionIndex": 0,
-                        "explanation": "JavaScript is a programming language used for web development."
-                    }
-                ],
                 "correct_answers": 8,
                 "incorrect_answers": 2,
                 "percentage": 80.0
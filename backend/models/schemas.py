@@ -47,6 +47,12 @@ class UserResponse(UserBase):
 class FaceLoginRequest(BaseModel):
     face_descriptor: List[float]
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str = Field(..., min_length=1)
+
+class LoginCodeRequest(BaseModel):
+    code: str = Field(..., min_length=1)
+
 # Question schemas
 class QuestionBase(BaseModel):
     topic: str
@@ -81,6 +87,26 @@ class ResultBase(BaseModel):
 class ResultCreate(ResultBase):
     pass
 
+# Largest offline batch accepted in one request
+RESULT_BATCH_MAX_SIZE = 100
+
+class ResultBatchCreate(BaseModel):
+    results: List[ResultCreate] = Field(..., min_length=1, max_length=RESULT_BATCH_MAX_SIZE)
+
+# Server-side attempt schemas; answers map question index to the chosen option text.
+# The server picks an attempt's questions, so the client only says how many it wants.
+class AttemptCreate(BaseModel):
+    topic: str = Field(..., min_length=1)
+    difficulty: str = Field(..., min_length=1)
+    count: int = Field(..., ge=1, le=50)
+    time_limit_seconds: Optional[int] = Field(None, ge=30, le=14400)
+
+class AttemptAnswers(BaseModel):
+    answers: Dict[int, Optional[str]] = Field(..., min_length=1)
+
+class AttemptSubmit(BaseModel):
+    answers: Optional[Dict[int, Optional[str]]] = None
+
 class ResultResponse(ResultBase):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
     date: datetime = Field(default_factory=datetime.utcnow)
@@ -130,6 +156,7 @@ class DetailedResultResponse(BaseModel):
     success: bool
     result: DetailedResult
     question_reviews: List[QuestionReview]
+    explanation_status: Optional[str] = None  # pending, running, done or failed while/after background generation
 
 # Assessment schemas
 class AssessmentConfig(BaseModel):
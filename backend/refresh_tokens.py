@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import os
+import secrets
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from database import get_db
+from utils.auth_utils import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from utils.bloom import BloomFilter
+from utils.user_store import get_user_profile
+
+load_dotenv()
+
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+LOGIN_CODE_EXPIRE_SECONDS = int(os.getenv("LOGIN_CODE_EXPIRE_SECONDS", "60"))
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "30"))
+REVOCATION_FILTER_ERROR_RATE = float(os.getenv("REVOCATION_FILTER_ERROR_RATE", "0.001"))
+
+REFRESH_TOKEN_COLLECTION = "refresh_tokens"
+REVOKED_SESSION_COLLECTION = "revoked_sessions"
+LOGIN_CODE_COLLECTION = "login_codes"
+
+class InvalidRefreshToken(Exception):
+    """Raised for unknown, expired, revoked or reused refresh tokens"""
+
+class InvalidLoginCode(Exception):
+    """Raised for unknown, expired or already redeemed login codes"""
+
+def _digest(token: str) -> str:
+    """Refresh tokens are random 256-bit values, so a plain SHA-256 is enough to store them safely"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+class RevocationList:
+    """Revoked login sessions, checked on every authenticated request without a database read
+
+    All revocations still able to matter (younger than the access-token lifetime)
+    are loaded into a Bloom filter on every sync; revocations made by this process
+    since the last sync are held exactly in ``_recent``. A filter hit is confirmed
+    against revoked_sessions, so false positives cost a lookup, never a logout.
+    Other workers' revocations take effect within REVOCATION_SYNC_SECONDS.
+    """
+
+    def __init__(self):
+        self._bloom = BloomFilter(1024, REVOCATION_FILTER_ERROR_RATE)
+        self._recent: Dict[str, datetime] = {}
+        self.stats = {"checks": 0, "filter_hits": 0, "confirmed": 0, "synced": 0}
+
+    async def is_revoked(self, session_id: str) -> bool:
+        self.stats["checks"] += 1
+        if session_id in self._recent:
+            return True
+        if session_id not in self._bloom:
+            return False
+        self.stats["filter_hits"] += 1
+        db = await get_db()
+        revoked = await db[REVOKED_SESSION_COLLECTION].find_one({"_id": session_id}, {"expires_at": 1})
+        if revoked:
+            self.stats["confirmed"] += 1
+            self._recent[session_id] = revoked["expires_at"]
+        return revoked is not None
+
+    async def revoke(self, db, session_id: str) -> None:
+        """Revoke a session: its refresh tokens stop working and its access tokens are rejected"""
+        expires_at = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        await db[REVOKED_SESSION_COLLECTION].update_one(
+            {"_id": session_id}, {"$set": {"expires_at": expires_at}}, upsert=True
+        )
+        await db[REFRESH_TOKEN_COLLECTION].update_many(
+            {"session_id": session_id, "revoked": False}, {"$set": {"revoked": True}}
+        )
+        self._recent[session_id] = expires_at
+
+    async def sync(self, db) -> None:
+        """Rebuild the filter from every revocation that can still matter"""
+        now = datetime.utcnow()
+        ids = [doc["_id"] async for doc in db[REVOKED_SESSION_COLLECTION].find({"expires_at": {"$gt": now}}, {"_id": 1})]
+        bloom = BloomFilter(max(1024, 2 * len(ids)), REVOCATION_FILTER_ERROR_RATE)
+        for session_id in ids:
+            bloom.add(session_id)
+        self._bloom = bloom
+        # Keep local revocations that raced the query; drop ones now in the filter or expired
+        synced = set(ids)
+        self._recent = {sid: exp for sid, exp in self._recent.items() if sid not in synced and exp > now}
+        self.stats["synced"] = len(ids)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.stats, "recent": len(self._recent), "filter_bits": self._bloom.size}
+
+revocation_list = RevocationList()
+
+async def issue_tokens(db, user_id: str, email: str, session_id: Optional[str] = None) -> Dict[str, str]:
+    """Mint an access token and a new refresh token for a login session"""
+    session_id = session_id or secrets.token_urlsafe(16)
+    refresh_token = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    await db[REFRESH_TOKEN_COLLECTION].insert_one({
+        "_id": _digest(refresh_token),
+        "user_id": user_id,
+        "email": email,
+        "session_id": session_id,
+        "revoked": False,
+        "created_at": now,
+        "expires_at": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    })
+    access_token = create_access_token(data={"sub": user_id, "email": email, "sid": session_id})
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+async def rotate_refresh_token(db, refresh_token: str) -> Dict[str, str]:
+    """Exchange a refresh token for a new token pair, retiring the old refresh token
+
+    Presenting a refresh token that was already rotated means it leaked or was
+    replayed, so the whole session is revoked.
+    """
+    digest = _digest(refresh_token)
+    now = datetime.utcnow()
+    current = await db[REFRESH_TOKEN_COLLECTION].find_one_and_update(
+        {"_id": digest, "revoked": False, "expires_at": {"$gt": now}},
+        {"$set": {"revoked": True, "rotated_at": now}}
+    )
+    if current is None:
+        stale = await db[REFRESH_TOKEN_COLLECTION].find_one({"_id": digest}, {"session_id": 1, "revoked": 1})
+        if stale and stale["revoked"]:
+            print(f"⚠️ [AUTH] Refresh token reuse detected, revoking session {stale['session_id']}")
+            await revocation_list.revoke(db, stale["session_id"])
+        raise InvalidRefreshToken("Invalid refresh token")
+
+    if await revocation_list.is_revoked(current["session_id"]):
+        raise InvalidRefreshToken("Session has been revoked")
+    if not ObjectId.is_valid(current["user_id"]) or await get_user_profile(db, current["user_id"]) is None:
+        await revocation_list.revoke(db, current["session_id"])
+        raise InvalidRefreshToken("User no longer exists")
+    return await issue_tokens(db, current["user_id"], current["email"], current["session_id"])
+
+async def revoke_user_sessions(db, user_id: str) -> int:
+    """Revoke every session holding a live refresh token of a user, e.g. when the account is deleted"""
+    session_ids = await db[REFRESH_TOKEN_COLLECTION].distinct(
+        "session_id", {"user_id": user_id, "revoked": False, "expires_at": {"$gt": datetime.utcnow()}}
+    )
+    for session_id in session_ids:
+        await revocation_list.revoke(db, session_id)
+    return len(session_ids)
+
+async def issue_login_code(db, user_id: str, email: str) -> str:
+    """One-time code handed to the browser after a redirect login instead of the tokens themselves
+
+    Redirect URLs end up in history, logs and Referer headers, so the token pair
+    is only minted when the frontend redeems the code with a POST.
+    """
+    code = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    await db[LOGIN_CODE_COLLECTION].insert_one({
+        "_id": _digest(code),
+        "user_id": user_id,
+        "email": email,
+        "redeemed": False,
+        "expires_at": now + timedelta(seconds=LOGIN_CODE_EXPIRE_SECONDS)
+    })
+    return code
+
+async def redeem_login_code(db, code: str) -> Dict[str, str]:
+    """Exchange a login code for a token pair; each code works once"""
+    login = await db[LOGIN_CODE_COLLECTION].find_one_and_update(
+        {"_id": _digest(code), "redeemed": False, "expires_at": {"$gt": datetime.utcnow()}},
+        {"$set": {"redeemed": True}}
+    )
+    if login is None:
+        raise InvalidLoginCode("Invalid login code")
+    tokens = await issue_tokens(db, login["user_id"], login["email"])
+    return {**tokens, "user_id": login["user_id"]}
+
+async def session_for_refresh_token(db, refresh_token: str) -> Optional[str]:
+    doc = await db[REFRESH_TOKEN_COLLECTION].find_one({"_id": _digest(refresh_token)}, {"session_id": 1})
+    return doc["session_id"] if doc else None
+
+async def run_revocation_sync_loop() -> None:
+    """Periodically pick up sessions revoked by other workers"""
+    while True:
+        await asyncio.sleep(REVOCATION_SYNC_SECONDS)
+        try:
+            await revocation_list.sync(await get_db())
+        except Exception as e:
+            print(f"❌ [AUTH] Revocation sync failed: {e}")
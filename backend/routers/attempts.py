@@ -0,0 +1,292 @@
+from fastapi import APIRouter, HTTPException, Depends
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument, DESCENDING
+from pymongo.errors import DuplicateKeyError
+
+from database import get_db
+from models.schemas import AttemptCreate, AttemptAnswers, AttemptSubmit, ResultCreate
+from routers.auth import get_current_user_id
+from routers.results import build_result_doc, format_saved_result, queue_explanations, DUPLICATE_KEY
+from routers.questions import generate_questions
+from ingest import get_ingest_queue, IngestQueueFull, IngestWriteError
+from sketches import score_engine
+from attempts import (
+    answer_autosaver, attempt_cache, attempt_header, get_attempt_header, invalidate_attempt, grade_answers,
+    answer_index, accepts_answers, remaining_seconds, merge_answers, question_options, graded_questions,
+    ATTEMPTS_COLLECTION, ATTEMPT_ACTIVE, ATTEMPT_GRADING, ATTEMPT_SUBMITTED, ATTEMPT_SECONDS_PER_QUESTION
+)
+from utils.result_store import normalize_result_questions, UNANSWERED
+
+router = APIRouter()
+
+# The answer key never leaves the server
+PUBLIC_PROJECTION = {"answer_key": 0}
+
+# A claim older than this was left by a worker that died mid-submission and may be taken over
+GRADING_CLAIM_SECONDS = 60
+
+def format_attempt(attempt: Dict[str, Any], answers: List[int]) -> Dict[str, Any]:
+    """Client view of an attempt: questions without answers, chosen options and the remaining time"""
+    questions = attempt["questions"]
+    view = {
+        "id": str(attempt["_id"]),
+        "topic": attempt["topic"],
+        "difficulty": attempt["difficulty"],
+        "status": attempt["status"],
+        "questions": questions,
+        "answers": [
+            questions[i]["options"][answer] if answer != UNANSWERED else None
+            for i, answer in enumerate(answers)
+        ],
+        "time_limit_seconds": attempt["time_limit_seconds"],
+        "started_at": attempt["started_at"].isoformat(),
+        "deadline": attempt["deadline"].isoformat(),
+        "remaining_seconds": round(remaining_seconds(attempt["deadline"]), 1)
+    }
+    if attempt.get("result"):
+        view["result"] = attempt["result"]
+    return view
+
+def _object_id(attempt_id: str) -> ObjectId:
+    try:
+        return ObjectId(attempt_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid attempt ID format")
+
+async def _owned_header(db, attempt_id: str, user_id: str) -> Dict[str, Any]:
+    """Cached attempt header, 404 unless it exists and belongs to the user"""
+    _object_id(attempt_id)
+    header = await get_attempt_header(db, attempt_id)
+    if header is None or header["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail="Attempt not found")
+    return header
+
+def _answer_indices(header: Dict[str, Any], answers: Dict[int, Optional[str]]) -> Dict[int, int]:
+    """Map submitted option texts to option indices, 400 on unknown questions or options"""
+    options = header["options"]
+    indices = {}
+    for index, answer in answers.items():
+        if not 0 <= index < len(options):
+            raise HTTPException(status_code=400, detail=f"Question index {index} is out of range")
+        try:
+            indices[index] = answer_index(options[index], answer)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Answer for question {index} is not one of its options")
+    return indices
+
+async def _draw_questions(db, topic: str, difficulty: str, count: int) -> List[Dict[str, Any]]:
+    """Questions for a new attempt, chosen here so the answer key never comes from the client
+
+    Fresh questions come from Gemini; when it is unavailable the attempt is drawn
+    from the questions already stored for the topic and difficulty.
+    """
+    try:
+        questions = await generate_questions(topic, difficulty, count)
+    except Exception as e:
+        print(f"⚠️ [ATTEMPT] Generating questions failed, drawing from the question bank: {e}")
+        questions = await db.questions.aggregate([
+            {"$match": {"topic": topic, "difficulty": difficulty}},
+            {"$sample": {"size": count}}
+        ]).to_list(None)
+    # A question whose answer is not one of its options cannot be graded
+    return [q for q in questions if q.get("answer") in q.get("options", [])][:count]
+
+@router.post("/attempts")
+async def start_attempt(attempt_data: AttemptCreate, user_id: str = Depends(get_current_user_id)):
+    """Start a timed attempt on server-chosen questions; the answer key is kept server-side for grading"""
+    try:
+        db = await get_db()
+        topic = attempt_data.topic.strip()
+        difficulty = attempt_data.difficulty.strip().lower()
+
+        questions, answer_key = question_options(await _draw_questions(db, topic, difficulty, attempt_data.count))
+        if not questions:
+            raise HTTPException(status_code=503, detail="No questions are available for this topic. Please try again.")
+
+        now = datetime.utcnow()
+        time_limit = attempt_data.time_limit_seconds or ATTEMPT_SECONDS_PER_QUESTION * len(questions)
+        attempt = {
+            "user_id": ObjectId(user_id),
+            "topic": topic,
+            "difficulty": difficulty,
+            "status": ATTEMPT_ACTIVE,
+            "questions": questions,
+            "answer_key": answer_key,
+            "answers": [UNANSWERED] * len(questions),
+            "time_limit_seconds": time_limit,
+            "started_at": now,
+            "deadline": now + timedelta(seconds=time_limit),
+            "updated_at": now
+        }
+        result = await db[ATTEMPTS_COLLECTION].insert_one(attempt)
+        attempt["_id"] = result.inserted_id
+        attempt_cache.set(str(result.inserted_id), attempt_header(attempt))
+
+        print(f"📝 [ATTEMPT] User {user_id} started attempt {result.inserted_id}: {len(questions)} {attempt['difficulty']} questions on {attempt['topic']}, {time_limit}s")
+        return {"success": True, "attempt": format_attempt(attempt, attempt["answers"])}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ [ATTEMPT] Failed to start attempt for user {user_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to start assessment. Please try again.")
+
+@router.get("/attempts/active")
+async def get_active_attempt(user_id: str = Depends(get_current_user_id)):
+    """The user's most recent unfinished attempt, so a reloaded or crashed browser can resume it"""
+    try:
+        db = await get_db()
+        attempts = await db[ATTEMPTS_COLLECTION].find(
+            {"user_id": ObjectId(user_id), "status": ATTEMPT_ACTIVE}, PUBLIC_PROJECTION
+        ).sort("started_at", DESCENDING).limit(1).to_list(1)
+        if not attempts:
+            return {"success": True, "attempt": None}
+        attempt = attempts[0]
+        answers = merge_answers(attempt["answers"], answer_autosaver.pending_answers(str(attempt["_id"])))
+        return {"success": True, "attempt": format_attempt(attempt, answers)}
+    except Exception as e:
+        print(f"❌ [ATTEMPT] Failed to load active attempt for user {user_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load assessment")
+
+@router.get("/attempts/{attempt_id}")
+async def get_attempt(attempt_id: str, user_id: str = Depends(get_current_user_id)):
+    """An attempt with its saved answers and remaining time"""
+    try:
+        db = await get_db()
+        attempt = await db[ATTEMPTS_COLLECTION].find_one({"_id": _object_id(attempt_id)}, PUBLIC_PROJECTION)
+        if not attempt or str(attempt["user_id"]) != user_id:
+            raise HTTPException(status_code=404, detail="Attempt not found")
+        answers = merge_answers(attempt["answers"], answer_autosaver.pending_answers(attempt_id))
+        return {"success": True, "attempt": format_attempt(attempt, answers)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ [ATTEMPT] Failed to load attempt {attempt_id} for user {user_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load assessment")
+
+@router.put("/attempts/{attempt_id}/answers")
+async def save_answers(attempt_id: str, answer_data: AttemptAnswers, user_id: str = Depends(get_current_user_id)):
+    """Save answers as they are chosen; written in debounced batches, or at once with several workers"""
+    db = await get_db()
+    header = await _owned_header(db, attempt_id, user_id)
+    if not accepts_answers(header):
+        raise HTTPException(status_code=409, detail="Attempt is closed; answers can no longer be changed")
+
+    try:
+        await answer_autosaver.save(attempt_id, _answer_indices(header, answer_data.answers))
+    except Exception as e:
+        print(f"❌ [AUTOSAVE] Saving answers of attempt {attempt_id} failed: {e}")
+        raise HTTPException(status_code=503, detail="Could not save answers. Please try again.", headers={"Retry-After": "2"})
+    return {
+        "success": True,
+        "saved": len(answer_data.answers),
+        "remaining_seconds": round(remaining_seconds(header["deadline"]), 1)
+    }
+
+@router.post("/attempts/{attempt_id}/submit")
+async def submit_attempt(
+    attempt_id: str,
+    submit_data: Optional[AttemptSubmit] = None,
+    user_id: str = Depends(get_current_user_id)
+):
+    """Grade an attempt from its stored answer key and save the result; repeat submissions replay it"""
+    db = await get_db()
+    header = await _owned_header(db, attempt_id, user_id)
+    attempts = db[ATTEMPTS_COLLECTION]
+    now = datetime.utcnow()
+
+    # Final answers sent with the submission count only while the timer (plus grace) allows.
+    # Clients send their full answer map, which also covers saves buffered by another worker.
+    try:
+        if submit_data and submit_data.answers and accepts_answers(header, now):
+            await answer_autosaver.save(attempt_id, _answer_indices(header, submit_data.answers))
+        await answer_autosaver.flush(attempt_id)
+    except Exception:
+        raise HTTPException(status_code=503, detail="Could not save answers. Please try again.", headers={"Retry-After": "2"})
+
+    # Claim the attempt so concurrent submissions grade it once
+    attempt = await attempts.find_one_and_update(
+        {
+            "_id": ObjectId(attempt_id),
+            "$or": [
+                {"status": ATTEMPT_ACTIVE},
+                {"status": ATTEMPT_GRADING, "updated_at": {"$lt": now - timedelta(seconds=GRADING_CLAIM_SECONDS)}}
+            ]
+        },
+        {"$set": {"status": ATTEMPT_GRADING, "updated_at": now}},
+        return_document=ReturnDocument.AFTER
+    )
+    if attempt is None:
+        existing = await attempts.find_one({"_id": ObjectId(attempt_id)}, {"status": 1, "result": 1, "questions": 1, "answer_key": 1})
+        if existing and existing["status"] == ATTEMPT_SUBMITTED:
+            print(f"🔁 [ATTEMPT] Replaying submission of attempt {attempt_id} for user {user_id}")
+            return {"success": True, "message": "Result saved successfully", "result": existing["result"], "questions": graded_questions(existing)}
+        raise HTTPException(status_code=409, detail="Attempt is already being submitted")
+
+    answers = attempt["answers"]
+    questions = graded_questions(attempt)
+    score = grade_answers(attempt["answer_key"], answers)
+    finished = min(now, attempt["deadline"])
+    try:
+        # Only graded attempts reach the shared question bank; abandoned ones never do
+        question_ids, _ = await normalize_result_questions(db, attempt["topic"], attempt["difficulty"], questions, [])
+    except Exception as e:
+        await attempts.update_one({"_id": attempt["_id"]}, {"$set": {"status": ATTEMPT_ACTIVE}})
+        print(f"❌ [ATTEMPT] Storing the questions of attempt {attempt_id} failed: {e}")
+        raise HTTPException(status_code=500, detail="Failed to save result to database. Please try again.")
+    result_data = ResultCreate(
+        user_id=user_id,
+        score=score,
+        total_questions=len(questions),
+        questions=questions,
+        user_answers=[questions[i]["options"][a] if a != UNANSWERED else "" for i, a in enumerate(answers)],
+        topic=attempt["topic"],
+        difficulty=attempt["difficulty"],
+        time_taken=int((finished - attempt["started_at"]).total_seconds())
+    )
+    result_doc = build_result_doc(result_data, attempt["user_id"], question_ids, answers)
+    result_doc["attempt_id"] = attempt["_id"]
+    # A taken-over claim whose result was already written hits the unique index instead of saving twice
+    result_doc["idempotency_key"] = f"attempt:{attempt_id}"
+
+    try:
+        ingest_queue = get_ingest_queue()
+        if ingest_queue:
+            result_doc["_id"] = ObjectId()
+            await ingest_queue.submit(result_doc)
+        else:
+            result = await db.results.insert_one(result_doc)
+            result_doc["_id"] = result.inserted_id
+    except (DuplicateKeyError, IngestWriteError) as e:
+        original = None
+        if isinstance(e, DuplicateKeyError) or e.code == DUPLICATE_KEY:
+            original = await db.results.find_one({"user_id": attempt["user_id"], "idempotency_key": result_doc["idempotency_key"]})
+        if original is None:
+            await attempts.update_one({"_id": attempt["_id"]}, {"$set": {"status": ATTEMPT_ACTIVE}})
+            print(f"❌ [ATTEMPT] Saving the result of attempt {attempt_id} failed: {e}")
+            raise HTTPException(status_code=500, detail="Failed to save result to database. Please try again.")
+        result_doc = original
+    except Exception as e:
+        # Release the claim so the submission can be retried
+        await attempts.update_one({"_id": attempt["_id"]}, {"$set": {"status": ATTEMPT_ACTIVE}})
+        print(f"❌ [ATTEMPT] Saving the result of attempt {attempt_id} failed: {e}")
+        if isinstance(e, IngestQueueFull):
+            raise HTTPException(status_code=503, detail="Server is busy saving results. Please try again.", headers={"Retry-After": "2"})
+        raise HTTPException(status_code=500, detail="Failed to save result to database. Please try again.")
+
+    saved = format_saved_result(result_doc)
+    await attempts.update_one(
+        {"_id": attempt["_id"]},
+        {"$set": {"status": ATTEMPT_SUBMITTED, "result_id": result_doc["_id"], "result": saved, "submitted_at": now, "updated_at": now}}
+    )
+    invalidate_attempt(attempt_id)
+    score_engine.record(result_doc)
+    print(f"📊 [ATTEMPT] User {user_id} scored {score}/{len(questions)} on attempt {attempt_id}")
+
+    # The key is only revealed once the attempt is graded
+    response = {"success": True, "message": "Result saved successfully", "result": saved, "questions": questions}
+    if await queue_explanations(db, [result_doc["_id"]]):
+        response["explanation_status"] = "pending"
+    return response
@@ -1,20 +1,31 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.responses import RedirectResponse
-import httpx
 import os
+import math
 from typing import Optional
 import numpy as np
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 
 from database import get_db
-from models.schemas import UserCreate, UserLogin, UserResponse, FaceLoginRequest
-from models.models import UserModel
-from utils.auth_utils import create_access_token, verify_token, euclidean_distance
+from models.schemas import UserCreate, UserLogin, UserResponse, FaceLoginRequest, RefreshTokenRequest, LoginCodeRequest
+from utils.auth_utils import verify_token, euclidean_distance
+from utils.passwords import hash_password, verify_password, needs_rehash, PasswordHasherBusy
+from utils.user_store import (
+    get_user_profile, email_exists, find_credentials, find_by_email, create_user, update_user,
+    set_password, set_face_descriptor, list_face_descriptors
+)
+from utils.http_clients import http_clients
+from utils.rate_limit import login_throttle, register_throttle, client_ip, LoginThrottle, LoginThrottled
+from refresh_tokens import (
+    issue_tokens, rotate_refresh_token, session_for_refresh_token, revocation_list, InvalidRefreshToken,
+    issue_login_code, redeem_login_code, InvalidLoginCode
+)
 
 router = APIRouter()
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 # JWT settings
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
@@ -26,21 +37,22 @@ GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 # Use environment variable for redirect URI or default to localhost
 GOOGLE_REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI", "http://localhost:5001/auth/google/callback")
-
-# In-memory session storage (in production, use Redis or database)
-sessions = {}
+# OpenID discovery document; point at a local mock server to exercise the flow offline
+GOOGLE_DISCOVERY_URL = os.getenv("GOOGLE_DISCOVERY_URL", "https://accounts.google.com/.well-known/openid-configuration")
 
 async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Optional[str]:
     """Get current user ID from JWT token"""
     try:
-        print(f"🔍 Verifying token...")
         payload = verify_token(credentials.credentials)
         user_id = payload.get("sub")
         if user_id is None:
             print("❌ No user_id in token payload")
             raise HTTPException(status_code=401, detail="Invalid token")
-        print(f"✅ Token verified for user: {user_id}")
+        if payload.get("sid") and await revocation_list.is_revoked(payload["sid"]):
+            raise HTTPException(status_code=401, detail="Session has been revoked")
         return str(user_id)  # Ensure it's a string
+    except HTTPException:
+        raise
     except JWTError as e:
         print(f"❌ JWT verification failed")
         raise HTTPException(status_code=401, detail="Invalid token")
@@ -48,19 +60,41 @@ async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depend
         print(f"❌ Unexpected error in token verification")
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def get_current_admin_id(user_id: str = Depends(get_current_user_id)) -> str:
+    """Get current user ID, requiring the user to be an admin"""
+    db = await get_db()
+    user = await get_user_profile(db, user_id)
+    if not user or not user.get("is_admin", False):
+        print(f"❌ Admin access denied for user: {user_id}")
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user_id
+
+async def enforce_login_throttle(request: Request, email: Optional[str] = None, throttle: LoginThrottle = login_throttle) -> None:
+    """Reject excess login (or, with register_throttle, registration) attempts before any user lookup or password hashing"""
+    ip = client_ip(request.client.host if request.client else None, request.headers.get("x-forwarded-for"))
+    try:
+        await throttle.check(ip, email, await get_db() if throttle.shared else None)
+    except LoginThrottled as e:
+        print(f"❌ [LOGIN] Throttled attempt from {ip}")
+        raise HTTPException(
+            status_code=429,
+            detail="Too many login attempts. Please try again later.",
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+
 @router.post("/register")
-async def register_user(user_data: UserCreate):
+async def register_user(user_data: UserCreate, request: Request):
     """Register a new user"""
+    await enforce_login_throttle(request, user_data.email, register_throttle)
     try:
         db = await get_db()
         
         # Check if user already exists
-        existing_user = await db.users.find_one({"email": user_data.email})
-        if existing_user:
+        if await email_exists(db, user_data.email):
             raise HTTPException(status_code=400, detail="User already exists")
         
         # Hash password
-        hashed_password = UserModel.hash_password(user_data.password)
+        hashed_password = await hash_password(user_data.password)
         
         # Create user document
         user_doc = {
@@ -70,61 +104,66 @@ async def register_user(user_data: UserCreate):
             "is_admin": False,
             "google_id": user_data.google_id,
             "name": user_data.name,
-            "profile_picture": user_data.profile_picture,
-            "face_descriptor": None
+            "profile_picture": user_data.profile_picture
         }
         
-        result = await db.users.insert_one(user_doc)
-        user_doc["_id"] = result.inserted_id
+        user_id = await create_user(db, user_doc)
         
-        # Create access token
-        access_token = create_access_token(
-            data={"sub": str(result.inserted_id), "email": user_data.email}
-        )
+        # Create access and refresh tokens
+        tokens = await issue_tokens(db, str(user_id), user_data.email)
         
         return {
             "success": True,
             "message": "User registered successfully",
-            "access_token": access_token,
+            "access_token": tokens["access_token"],
+            "refresh_token": tokens["refresh_token"],
             "user": {
-                "id": str(result.inserted_id),
+                "id": str(user_id),
                 "email": user_data.email,
                 "username": user_data.username,
                 "name": user_data.name,
                 "profile_picture": user_data.profile_picture
             }
         }
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server is busy, please try again", headers={"Retry-After": "1"})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/login")
-async def login_user(user_data: UserLogin):
+async def login_user(user_data: UserLogin, request: Request):
     """Login with email and password"""
+    await enforce_login_throttle(request, user_data.email)
     try:
         db = await get_db()
         
         # Find user by email
-        user = await db.users.find_one({"email": user_data.email})
+        user = await find_credentials(db, user_data.email)
         if not user:
             print(f"❌ [LOGIN] Failed login attempt for email: {user_data.email}")
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
         # Verify password
-        if not UserModel.verify_password(user_data.password, user["password"]):
+        if not await verify_password(user_data.password, user["password"]):
             print(f"❌ [LOGIN] Invalid password for user: {user_data.email}")
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
-        # Create access token
-        access_token = create_access_token(
-            data={"sub": str(user["_id"]), "email": user["email"]}
-        )
+        # Upgrade hashes made with an older cost factor
+        if needs_rehash(user["password"]):
+            await set_password(db, user["_id"], await hash_password(user_data.password))
+        
+        # Create access and refresh tokens
+        tokens = await issue_tokens(db, str(user["_id"]), user["email"])
         
         print(f"✅ [LOGIN] User logged in successfully: {user_data.email}")
         
         return {
             "success": True,
             "message": "Login successful",
-            "access_token": access_token,
+            "access_token": tokens["access_token"],
+            "refresh_token": tokens["refresh_token"],
             "user": {
                 "id": str(user["_id"]),
                 "email": user["email"],
@@ -133,13 +172,19 @@ async def login_user(user_data: UserLogin):
                 "profile_picture": user.get("profile_picture")
             }
         }
+    except PasswordHasherBusy:
+        print(f"❌ [LOGIN] Password hasher saturated, rejecting login for: {user_data.email}")
+        raise HTTPException(status_code=503, detail="Server is busy, please try again", headers={"Retry-After": "1"})
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ [LOGIN] Error during login: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/face")
-async def face_login(face_data: FaceLoginRequest):
+async def face_login(face_data: FaceLoginRequest, request: Request):
     """Login using face recognition"""
+    await enforce_login_throttle(request)
     try:
         print(f"👤 Face login attempt received")
         
@@ -150,13 +195,11 @@ async def face_login(face_data: FaceLoginRequest):
         
         db = await get_db()
         
-        # Get all users with valid face descriptors (not null)
-        users_with_faces = await db.users.find({
-            "face_descriptor": {"$exists": True, "$ne": None}
-        }).to_list(None)
-        print(f"👤 Checking {len(users_with_faces)} registered faces")
+        # Only the descriptors are scanned; the matched user's profile is read afterwards
+        faces = await list_face_descriptors(db)
+        print(f"👤 Checking {len(faces)} registered faces")
         
-        if not users_with_faces:
+        if not faces:
             print("❌ No registered faces found")
             raise HTTPException(
                 status_code=401, 
@@ -168,28 +211,30 @@ async def face_login(face_data: FaceLoginRequest):
         best_distance = float('inf')
         threshold = 0.8  # Increased threshold for better face recognition accuracy
         
-        for user in users_with_faces:
-            if user.get("face_descriptor") and user["face_descriptor"] is not None:
-                distance = euclidean_distance(face_data.face_descriptor, user["face_descriptor"])
-                
-                if distance < best_distance:
-                    best_distance = distance
-                    best_match = user
+        for user_id, descriptor in faces:
+            distance = euclidean_distance(face_data.face_descriptor, descriptor)
+            
+            if distance < best_distance:
+                best_distance = distance
+                best_match = user_id
         
         if not best_match or best_distance >= threshold:
             print(f"❌ Face recognition failed (distance: {best_distance:.3f})")
             raise HTTPException(status_code=401, detail="Face recognition failed")
         
-        # Create access token
-        access_token = create_access_token(
-            data={"sub": str(best_match["_id"]), "email": best_match["email"]}
-        )
+        best_match = await get_user_profile(db, str(best_match))
+        if not best_match:
+            raise HTTPException(status_code=401, detail="Face recognition failed")
+        
+        # Create access and refresh tokens
+        tokens = await issue_tokens(db, str(best_match["_id"]), best_match["email"])
         
         print(f"✅ Face login successful for user: {best_match['email']}")
         return {
             "success": True,
             "message": "Face login successful",
-            "access_token": access_token,
+            "access_token": tokens["access_token"],
+            "refresh_token": tokens["refresh_token"],
             "user": {
                 "id": str(best_match["_id"]),
                 "email": best_match["email"],
@@ -209,14 +254,12 @@ async def get_face_status(user_id: str = Depends(get_current_user_id)):
         print(f"🔍 Face status check for user: {user_id}")
         
         db = await get_db()
-        from bson import ObjectId
-        
-        user = await db.users.find_one({"_id": ObjectId(user_id)})
+        user = await get_user_profile(db, user_id)
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        has_face = user.get("face_descriptor") is not None and len(user.get("face_descriptor", [])) == 128
+        has_face = user.get("has_face_descriptor", False)
         
         print(f"🔍 User has registered face: {has_face}")
         
@@ -241,14 +284,8 @@ async def register_face(face_data: FaceLoginRequest, user_id: str = Depends(get_
         
         db = await get_db()
         
-        # Update user with face descriptor
-        from bson import ObjectId
-        result = await db.users.update_one(
-            {"_id": ObjectId(user_id)},
-            {"$set": {"face_descriptor": face_data.face_descriptor}}
-        )
-        
-        if result.modified_count == 0:
+        # Store the descriptor in its side collection
+        if not await set_face_descriptor(db, user_id, face_data.face_descriptor):
             print("❌ User not found for face registration")
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -261,6 +298,28 @@ async def register_face(face_data: FaceLoginRequest, user_id: str = Depends(get_
         print(f"❌ Face registration failed for user {user_id}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def google_configuration() -> dict:
+    """Google's OpenID configuration, cached for its max-age"""
+    return await http_clients.get_json_document("google", GOOGLE_DISCOVERY_URL)
+
+async def google_id_token_claims(config: dict, tokens: dict) -> Optional[dict]:
+    """Verify the id_token against Google's cached JWKS, saving the userinfo round trip"""
+    if "id_token" not in tokens:
+        return None
+    try:
+        jwks = await http_clients.get_json_document("google", config["jwks_uri"])
+        return jwt.decode(
+            tokens["id_token"],
+            jwks,
+            algorithms=["RS256"],
+            audience=GOOGLE_CLIENT_ID,
+            issuer=config.get("issuer"),
+            access_token=tokens.get("access_token")
+        )
+    except (JWTError, KeyError) as e:
+        print(f"⚠️ [GOOGLE_OAUTH] id_token not usable, falling back to userinfo: {e}")
+        return None
+
 @router.get("/google")
 async def google_oauth():
     """Initiate Google OAuth flow"""
@@ -273,7 +332,11 @@ async def google_oauth():
             detail="Google OAuth not configured. Please set GOOGLE_CLIENT_ID and GOOGLE_CLIENT_SECRET in your environment variables."
         )
     
-    auth_url = f"https://accounts.google.com/o/oauth2/v2/auth"
+    try:
+        auth_url = (await google_configuration())["authorization_endpoint"]
+    except Exception as e:
+        print(f"⚠️ Google discovery unavailable, using default authorization endpoint: {e}")
+        auth_url = "https://accounts.google.com/o/oauth2/v2/auth"
     params = {
         "client_id": GOOGLE_CLIENT_ID,
         "redirect_uri": GOOGLE_REDIRECT_URI,
@@ -301,8 +364,9 @@ async def google_oauth_callback(code: str):
             )
         
         print(f"🔐 Exchanging authorization code for tokens")
-        # Exchange code for tokens
-        token_url = "https://oauth2.googleapis.com/token"
+        # Exchange code for tokens over the shared keep-alive pool
+        config = await google_configuration()
+        client = http_clients.get("google")
         token_data = {
             "client_id": GOOGLE_CLIENT_ID,
             "client_secret": GOOGLE_CLIENT_SECRET,
@@ -311,33 +375,30 @@ async def google_oauth_callback(code: str):
             "redirect_uri": GOOGLE_REDIRECT_URI
         }
         
-        async with httpx.AsyncClient() as client:
-            token_response = await client.post(token_url, data=token_data)
-            if not token_response.is_success:
-                print(f"❌ Token exchange failed")
-                raise HTTPException(status_code=400, detail="Token exchange failed")
-            token_response.raise_for_status()
-            tokens = token_response.json()
-        
-        print(f"🔐 Fetching user profile from Google")
-        # Get user info
-        user_info_url = "https://www.googleapis.com/oauth2/v2/userinfo"
-        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
-        
-        async with httpx.AsyncClient() as client:
-            user_response = await client.get(user_info_url, headers=headers)
+        token_response = await client.post(config["token_endpoint"], data=token_data)
+        if not token_response.is_success:
+            print(f"❌ Token exchange failed")
+            raise HTTPException(status_code=400, detail="Token exchange failed")
+        tokens = token_response.json()
+        
+        user_info = await google_id_token_claims(config, tokens)
+        if user_info is None:
+            print(f"🔐 Fetching user profile from Google")
+            headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+            user_response = await client.get(config["userinfo_endpoint"], headers=headers)
             if not user_response.is_success:
                 print(f"❌ Failed to fetch user info")
                 raise HTTPException(status_code=400, detail="Failed to fetch user info")
-            user_response.raise_for_status()
             user_info = user_response.json()
+        # OpenID claims carry the Google account id as sub
+        google_id = user_info.get("sub") or user_info.get("id")
         
         user_email = user_info.get('email', 'Unknown')
         print(f"🔐 Google OAuth successful for user: {user_email}")
         
         # Create or update user
         db = await get_db()
-        user = await db.users.find_one({"email": user_info["email"]})
+        user = await find_by_email(db, user_info["email"])
         
         if not user:
             print(f"👤 Creating new user via Google OAuth: {user_email}")
@@ -346,35 +407,27 @@ async def google_oauth_callback(code: str):
                 "email": user_info["email"],
                 "name": user_info.get("name"),
                 "profile_picture": user_info.get("picture"),
-                "google_id": user_info["id"],
+                "google_id": google_id,
                 "is_admin": False
             }
-            result = await db.users.insert_one(user_doc)
-            user_id = result.inserted_id
+            user_id = await create_user(db, user_doc)
         else:
             print(f"👤 Updating existing user via Google OAuth: {user_email}")
             # Update existing user
-            await db.users.update_one(
-                {"_id": user["_id"]},
-                {
-                    "$set": {
-                        "name": user_info.get("name"),
-                        "profile_picture": user_info.get("picture"),
-                        "google_id": user_info["id"]
-                    }
-                }
-            )
+            await update_user(db, user["_id"], {
+                "name": user_info.get("name"),
+                "profile_picture": user_info.get("picture"),
+                "google_id": google_id
+            })
             user_id = user["_id"]
         
-        # Create access token
-        access_token = create_access_token(
-            data={"sub": str(user_id), "email": user_info["email"]}
-        )
+        # Tokens never go into the redirect URL; the frontend redeems this one-time code for them
+        login_code = await issue_login_code(db, str(user_id), user_info["email"])
         
         print(f"🔐 [GOOGLE_OAUTH] Login successful for {user_email}, redirecting to frontend")
-        # Redirect to frontend with token - use environment variable or default
+        # Redirect to frontend with the login code - use environment variable or default
         frontend_base_url = os.getenv("FRONTEND_URL", "http://localhost:5173")
-        frontend_url = f"{frontend_base_url}/login?token={access_token}"
+        frontend_url = f"{frontend_base_url}/login?code={login_code}"
         return RedirectResponse(url=frontend_url)
         
     except Exception as e:
@@ -384,9 +437,71 @@ async def google_oauth_callback(code: str):
         error_url = f"{frontend_base_url}/login?error=Google+login+failed"
         return RedirectResponse(url=error_url)
 
+@router.post("/google/exchange")
+async def google_exchange(code_data: LoginCodeRequest):
+    """Redeem the one-time code from the Google callback redirect for a token pair"""
+    try:
+        db = await get_db()
+        tokens = await redeem_login_code(db, code_data.code)
+        user = await get_user_profile(db, tokens.pop("user_id"))
+        if not user:
+            raise InvalidLoginCode("User not found")
+        return {
+            "success": True,
+            "message": "Google login successful",
+            **tokens,
+            "user": {
+                "id": str(user["_id"]),
+                "email": user["email"],
+                "username": user.get("username"),
+                "name": user.get("name"),
+                "profile_picture": user.get("profile_picture")
+            }
+        }
+    except InvalidLoginCode as e:
+        print(f"❌ [GOOGLE_OAUTH] Code exchange rejected: {e}")
+        raise HTTPException(status_code=401, detail="Invalid or expired login code")
+    except Exception as e:
+        print(f"❌ [GOOGLE_OAUTH] Error exchanging login code: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/refresh")
+async def refresh_tokens(refresh_data: RefreshTokenRequest):
+    """Exchange a refresh token for a new access token and a rotated refresh token"""
+    try:
+        db = await get_db()
+        tokens = await rotate_refresh_token(db, refresh_data.refresh_token)
+        return {"success": True, **tokens}
+    except InvalidRefreshToken as e:
+        print(f"❌ [AUTH] Refresh rejected: {e}")
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    except Exception as e:
+        print(f"❌ [AUTH] Error refreshing tokens: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/logout")
-async def logout():
-    """Logout user"""
+async def logout(
+    refresh_data: Optional[RefreshTokenRequest] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+):
+    """Logout user, revoking the session of the presented access or refresh token"""
+    try:
+        db = await get_db()
+        session_id = None
+        if credentials:
+            try:
+                session_id = verify_token(credentials.credentials).get("sid")
+            except ValueError:
+                pass
+        if not session_id and refresh_data:
+            session_id = await session_for_refresh_token(db, refresh_data.refresh_token)
+        if session_id:
+            await revocation_list.revoke(db, session_id)
+            print(f"🔐 [AUTH] Session {session_id} revoked on logout")
+    except Exception as e:
+        print(f"❌ [AUTH] Error revoking session on logout: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
     return {
         "success": True,
         "message": "Logged out successfully"
@@ -406,8 +521,7 @@ async def auth_status(user_id: Optional[str] = Depends(get_current_user_id)):
     
     try:
         db = await get_db()
-        from bson import ObjectId
-        user = await db.users.find_one({"_id": ObjectId(user_id)})
+        user = await get_user_profile(db, user_id)
         
         if not user:
             print(f"❌ User not found in database: {user_id}")
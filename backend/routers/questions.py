@@ -3,6 +3,7 @@ from typing import List, Optional
 import google.generativeai as genai
 import os
 import json
+import asyncio
 from dotenv import load_dotenv
 
 from database import get_db
@@ -57,6 +58,129 @@ async def add_questions_to_db(topic: str, difficulty: str, questions: List[dict]
         print(f"Error adding questions to database: {e}")
         return False
 
+def build_question_prompt(topic: str, difficulty: str, count: int) -> str:
+    """Gemini prompt asking for multiple-choice questions as JSON"""
+    return f"""Generate {count} multiple-choice questions on {topic} with {difficulty} difficulty. 
+        Provide the questions in JSON format with the following structure:
+        [
+            {{
+                "question": "Your question here?",
+                "options": ["Option A", "Option B", "Option C", "Option D"],
+                "correctAnswer": "Correct option"
+            }}
+        ]
+        
+        Make sure:
+        1. Questions are relevant to the topic
+        2. Difficulty matches the requested level
+        3. All options are plausible
+        4. Only one correct answer per question
+        5. Return valid JSON format"""
+
+def parse_questions(text: str) -> List[dict]:
+    """Parse Gemini's JSON reply into question/options/answer dicts; raises JSONDecodeError on bad JSON"""
+    # Clean the response text
+    response_text = text.strip()
+    if response_text.startswith("```json"):
+        response_text = response_text[7:]
+    if response_text.endswith("```"):
+        response_text = response_text[:-3]
+    
+    questions = json.loads(response_text)
+    
+    if not isinstance(questions, list):
+        raise ValueError("Response is not a list")
+    
+    return [
+        {"question": q["question"], "options": q["options"], "answer": q["correctAnswer"]}
+        for q in questions
+    ]
+
+async def generate_questions(topic: str, difficulty: str, count: int) -> List[dict]:
+    """Generate questions with Gemini off the event loop and store them; raises when Gemini is unavailable"""
+    if not model:
+        raise RuntimeError("Gemini API key not configured")
+    response = await asyncio.to_thread(model.generate_content, build_question_prompt(topic, difficulty, count))
+    if not response or not response.text:
+        raise RuntimeError("No response from Gemini API")
+    questions = parse_questions(response.text)
+    print(f"🤖 Generated {len(questions)} questions from Gemini AI")
+    
+    # Store questions in database
+    await add_questions_to_db(topic, difficulty, [
+        {"question": q["question"], "options": q["options"], "correctAnswer": q["answer"]} for q in questions
+    ])
+    return questions
+
+def build_explanation_prompt(topic: str, difficulty: str, questions: List[dict]) -> str:
+    """Gemini prompt asking for one explanation per question"""
+    questions_text = ""
+    for i, q in enumerate(questions):
+        questions_text += f"""
+Question {i+1}: {q['question']}
+Options: {', '.join(q['options'])}
+Correct Answer: {q['answer']}
+"""
+    
+    return f"""For the following {topic} questions at {difficulty} difficulty level, provide clear and educational explanations for why each correct answer is right. 
+
+{questions_text}
+
+Please provide explanations in JSON format:
+[
+    {{
+        "questionIndex": 0,
+        "explanation": "Clear explanation of why this answer is correct, including relevant concepts and reasoning"
+    }},
+    ...
+]
+
+Make the explanations:
+- Educational and informative
+- Easy to understand for the {difficulty} level
+- Include relevant background knowledge
+- Explain why other options might be wrong if helpful
+- Keep each explanation 2-3 sentences maximum
+"""
+
+def parse_explanations(text: str) -> List[dict]:
+    """Parse Gemini's JSON reply into questionIndex/explanation pairs; raises JSONDecodeError on bad JSON"""
+    # Clean the response text
+    response_text = text.strip()
+    if response_text.startswith("```json"):
+        response_text = response_text[7:]
+    if response_text.endswith("```"):
+        response_text = response_text[:-3]
+    response_text = response_text.strip()
+    
+    explanations_data = json.loads(response_text)
+    
+    if not isinstance(explanations_data, list):
+        raise ValueError("Response is not a list")
+    
+    # Validate explanations structure
+    formatted_explanations = []
+    for i, exp in enumerate(explanations_data):
+        if not isinstance(exp, dict) or "explanation" not in exp:
+            print(f"Invalid explanation format at index {i}")
+            continue
+        
+        formatted_explanations.append({
+            "questionIndex": exp.get("questionIndex", i),
+            "explanation": exp["explanation"]
+        })
+    
+    return formatted_explanations
+
+async def request_explanations(topic: str, difficulty: str, questions: List[dict]) -> List[dict]:
+    """Ask Gemini for explanations off the event loop; raises when Gemini is unavailable"""
+    if not model:
+        raise RuntimeError("Gemini API key not configured")
+    response = await asyncio.to_thread(model.generate_content, build_explanation_prompt(topic, difficulty, questions))
+    if not response or not response.text:
+        raise RuntimeError("No response from Gemini API")
+    return parse_explanations(response.text)
+
 @router.get("/questions")
 async def fetch_questions_from_gemini(
     topic: str = Query(..., description="Topic for questions"),
@@ -77,55 +201,9 @@ async def fetch_questions_from_gemini(
         
         print(f"🤖 Generating questions via Gemini AI for user {user_id}")
         
-        # Create prompt for Gemini
-        prompt = f"""Generate {count} multiple-choice questions on {topic} with {difficulty} difficulty. 
-        Provide the questions in JSON format with the following structure:
-        [
-            {{
-                "question": "Your question here?",
-                "options": ["Option A", "Option B", "Option C", "Option D"],
-                "correctAnswer": "Correct option"
-            }}
-        ]
-        
-        Make sure:
-        1. Questions are relevant to the topic
-        2. Difficulty matches the requested level
-        3. All options are plausible
-        4. Only one correct answer per question
-        5. Return valid JSON format"""
-        
-        # Generate questions using Gemini
-        response = model.generate_content(prompt)
-        
         # Parse the response
         try:
-            # Clean the response text
-            response_text = response.text.strip()
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-            
-            questions = json.loads(response_text)
-            
-            if not isinstance(questions, list):
-                raise ValueError("Response is not a list")
-            
-            print(f"🤖 Generated {len(questions)} questions from Gemini AI")
-            
-            # Store questions in database
-            await add_questions_to_db(topic, difficulty, questions)
-            
-            # Format questions for frontend
-            formatted_questions = []
-            for q in questions:
-                formatted_questions.append({
-                    "question": q["question"],
-                    "options": q["options"],
-                    "answer": q["correctAnswer"]
-                })
-            
+            formatted_questions = await generate_questions(topic, difficulty, count)
             print(f"✅ Successfully generated and stored {len(formatted_questions)} questions for user {user_id}")
             return formatted_questions
             
@@ -246,7 +324,8 @@ async def generate_explanations(
             for i, q in enumerate(questions):
                 fallback_explanations.append({
                     "questionIndex": i,
-                    "explanation": f"This is the correct answer for question {i+1}. The AI explanation service is currently unavailable. Please refer to your study materials for detailed explanations."
+                    "explanation": f"This is the correct answer for question {i+1}. The AI explanation service is currently unavailable. Please refer to your study materials for detailed explanations.",
+                    "fallback": True
                 })
             
             return {
@@ -256,34 +335,7 @@ async def generate_explanations(
             }
         
         # Create prompt for explanations
-        questions_text = ""
-        for i, q in enumerate(questions):
-            questions_text += f"""
-Question {i+1}: {q['question']}
-Options: {', '.join(q['options'])}
-Correct Answer: {q['answer']}
-"""
-        
-        prompt = f"""For the following {topic} questions at {difficulty} difficulty level, provide clear and educational explanations for why each correct answer is right. 
-
-{questions_text}
-
-Please provide explanations in JSON format:
-[
-    {{
-        "questionIndex": 0,
-        "explanation": "Clear explanation of why this answer is correct, including relevant concepts and reasoning"
-    }},
-    ...
-]
-
-Make the explanations:
-- Educational and informative
-- Easy to understand for the {difficulty} level
-- Include relevant background knowledge
-- Explain why other options might be wrong if helpful
-- Keep each explanation 2-3 sentences maximum
-"""
+        prompt = build_explanation_prompt(topic, difficulty, questions)
         
         # Generate explanations using Gemini with timeout handling
         try:
@@ -309,7 +361,8 @@ Make the explanations:
                 for i, q in enumerate(questions):
                     fallback_explanations.append({
                         "questionIndex": i,
-                        "explanation": f"This is the correct answer for question {i+1}. The AI explanation service is temporarily unavailable. Please refer to your study materials for detailed explanations."
+                        "explanation": f"This is the correct answer for question {i+1}. The AI explanation service is temporarily unavailable. Please refer to your study materials for detailed explanations.",
+                        "fallback": True
                     })
                 
                 return {
@@ -320,30 +373,7 @@ Make the explanations:
         
         # Parse JSON response
         try:
-            # Clean the response text
-            response_text = response.text.strip()
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-            response_text = response_text.strip()
-            
-            explanations_data = json.loads(response_text)
-            
-            if not isinstance(explanations_data, list):
-                raise ValueError("Response is not a list")
-            
-            # Validate explanations structure
-            formatted_explanations = []
-            for i, exp in enumerate(explanations_data):
-                if not isinstance(exp, dict) or "explanation" not in exp:
-                    print(f"Invalid explanation format at index {i}")
-                    continue
-                
-                formatted_explanations.append({
-                    "questionIndex": exp.get("questionIndex", i),
-                    "explanation": exp["explanation"]
-                })
+            formatted_explanations = parse_explanations(response.text)
             
             print(f"✅ Successfully generated {len(formatted_explanations)} explanations")
             return {
@@ -361,7 +391,8 @@ Make the explanations:
             for i, q in enumerate(questions):
                 fallback_explanations.append({
                     "questionIndex": i,
-                    "explanation": f"This is the correct answer for question {i+1}. The AI explanation service returned an invalid response. Please refer to your study materials for detailed explanations."
+                    "explanation": f"This is the correct answer for question {i+1}. The AI explanation service returned an invalid response. Please refer to your study materials for detailed explanations.",
+                    "fallback": True
                 })
             
             return {
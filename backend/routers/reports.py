@@ -0,0 +1,49 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import Optional
+from datetime import datetime
+
+from database import get_db
+from routers.auth import get_current_admin_id
+from utils.analytics import build_institution_report
+
+router = APIRouter()
+
+@router.get("/reports/institution")
+async def get_institution_report(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    pass_mark: float = Query(60.0, ge=0, le=100),
+    period: str = Query("week", pattern="^(day|week)$"),
+    include_archived: bool = True,
+    admin_id: str = Depends(get_current_admin_id)
+):
+    """Get an institution-wide report across all students' results"""
+    try:
+        print(f"📊 [REPORT] Admin {admin_id} requesting institution report")
+        
+        db = await get_db("analytics")
+        started = datetime.utcnow()
+        report = await build_institution_report(
+            db,
+            start=start,
+            end=end,
+            pass_mark=pass_mark,
+            period=period,
+            include_archived=include_archived
+        )
+        elapsed = (datetime.utcnow() - started).total_seconds()
+        
+        print(f"✅ [REPORT] Built report over {report['total_attempts']} results in {elapsed:.2f}s")
+        
+        return {
+            "success": True,
+            "generated_at": datetime.utcnow().isoformat(),
+            "report": report
+        }
+        
+    except Exception as e:
+        print(f"❌ [REPORT] Error building institution report: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to build report: {str(e)}"
+        )
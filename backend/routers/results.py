@@ -1,12 +1,25 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Header, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
+import hashlib
+import json
+import re
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 from database import get_db
-from models.schemas import ResultCreate, ResultResponse, DetailedResult, TestHistoryItem, QuestionReview, DetailedResultResponse
+from models.schemas import RESULT_BATCH_MAX_SIZE, ResultCreate, ResultBatchCreate, ResultResponse, DetailedResult, TestHistoryItem, QuestionReview, DetailedResultResponse
 from models.models import ResultModel
 from routers.auth import get_current_user_id
+from ingest import get_ingest_queue, IngestQueueFull, IngestWriteError
+from archive import find_result, load_rollups, merge_stats, ARCHIVE_COLLECTION
+from sketches import score_engine
+from explanations import get_explanation_queue, get_job_status, wait_for_job, ACTIVE_STATES
+from utils.result_export import EXPORT_COLUMNS, iter_user_results, stream_csv, stream_parquet, pq
+from utils.user_store import get_user_profile
+from utils.result_store import normalize_result_questions, normalize_results_questions, hydrate_result, result_view_cache, idempotency_cache
 
 router = APIRouter()
 
@@ -54,8 +67,79 @@ async def test_database_connection():
             "timestamp": datetime.utcnow().isoformat()
         }
 
+def build_result_doc(result_data: ResultCreate, user_object_id: ObjectId, question_ids: list, answer_indices: list) -> dict:
+    """Build a normalized result document with derived metrics"""
+    correct_answers = result_data.score
+    incorrect_answers = result_data.total_questions - result_data.score
+    percentage = (correct_answers / result_data.total_questions) * 100 if result_data.total_questions > 0 else 0
+    
+    return {
+        "user_id": user_object_id,  # Use validated ObjectId
+        "score": result_data.score,
+        "total_questions": result_data.total_questions,
+        "question_ids": question_ids,
+        "answer_indices": answer_indices,
+        "topic": result_data.topic,
+        "difficulty": result_data.difficulty,
+        "time_taken": result_data.time_taken,
+        "correct_answers": correct_answers,
+        "incorrect_answers": incorrect_answers,
+        "percentage": percentage,
+        "date": datetime.utcnow()
+    }
+
+def format_saved_result(result_doc: dict) -> dict:
+    """Summary of a saved result returned to the submitting client"""
+    return {
+        "id": str(result_doc["_id"]),
+        "score": result_doc["score"],
+        "total_questions": result_doc["total_questions"],
+        "topic": result_doc["topic"],
+        "difficulty": result_doc["difficulty"],
+        "percentage": result_doc["percentage"],
+        "time_taken": result_doc["time_taken"],
+        "date": result_doc["date"].isoformat()
+    }
+
+DUPLICATE_KEY = 11000
+
+# Stored idempotency keys are capped; batch items store "<key>:<index>", so the batch header
+# leaves room for the longest index suffix and both limits move together
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+BATCH_IDEMPOTENCY_KEY_MAX_LENGTH = IDEMPOTENCY_KEY_MAX_LENGTH - len(f":{RESULT_BATCH_MAX_SIZE - 1}")
+
+async def queue_explanations(db, result_ids: List[ObjectId]) -> bool:
+    """Hand results submitted without explanations to the background generator"""
+    explanation_queue = get_explanation_queue()
+    if not explanation_queue:
+        return False
+    for result_id in result_ids:
+        try:
+            await explanation_queue.enqueue(db, result_id)
+        except Exception as e:
+            print(f"⚠️ Could not queue explanations for result {result_id}: {e}")
+            return False
+    return True
+
+async def _replayed_result(db, user_object_id: ObjectId, idempotency_key: str) -> Optional[dict]:
+    """Response originally returned for a submission with this Idempotency-Key"""
+    original = await db.results.find_one({"user_id": user_object_id, "idempotency_key": idempotency_key})
+    if not original:
+        return None
+    response = {
+        "success": True,
+        "message": "Result saved successfully",
+        "result": format_saved_result(original)
+    }
+    idempotency_cache.set((str(user_object_id), idempotency_key), response)
+    return response
+
 @router.post("/results")
-async def create_result(result_data: ResultCreate, user_id: str = Depends(get_current_user_id)):
+async def create_result(
+    result_data: ResultCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=IDEMPOTENCY_KEY_MAX_LENGTH),
+    user_id: str = Depends(get_current_user_id)
+):
     """Create a new assessment result"""
     try:
         print(f"📝 User {user_id} submitting assessment result for topic: {result_data.topic}")
@@ -88,35 +172,76 @@ async def create_result(result_data: ResultCreate, user_id: str = Depends(get_cu
                 detail="Invalid user ID format"
             )
         
-        # Calculate additional metrics
-        correct_answers = result_data.score
-        incorrect_answers = result_data.total_questions - result_data.score
-        percentage = (correct_answers / result_data.total_questions) * 100 if result_data.total_questions > 0 else 0
+        # A retried submission returns the original response without a second write
+        if idempotency_key:
+            replay = idempotency_cache.get((str(user_object_id), idempotency_key))
+            if replay:
+                print(f"🔁 Replaying idempotent submission for user {user_id}")
+                return replay
         
-        print(f"📊 User {user_id} scored {correct_answers}/{result_data.total_questions} ({percentage:.1f}%) on {result_data.difficulty} {result_data.topic}")
-        
-        # Create result document with enhanced data
-        result_doc = {
-            "user_id": user_object_id,  # Use validated ObjectId
-            "score": result_data.score,
-            "total_questions": result_data.total_questions,
-            "questions": result_data.questions,
-            "user_answers": result_data.user_answers,
+        submission = {
             "topic": result_data.topic,
             "difficulty": result_data.difficulty,
-            "time_taken": result_data.time_taken,
-            "explanations": result_data.explanations,
-            "correct_answers": correct_answers,
-            "incorrect_answers": incorrect_answers,
-            "percentage": percentage,
-            "date": datetime.utcnow()
+            "questions": result_data.questions,
+            "user_answers": result_data.user_answers,
+            "explanations": result_data.explanations
         }
+        ingest_queue = get_ingest_queue()
+        if ingest_queue:
+            # The queue resolves questions for its whole batch when it flushes
+            question_ids, answer_indices = [], []
+        else:
+            # Reference stored questions by id instead of embedding copies
+            try:
+                question_ids, answer_indices = await normalize_result_questions(
+                    db,
+                    result_data.topic,
+                    result_data.difficulty,
+                    result_data.questions,
+                    result_data.user_answers,
+                    result_data.explanations
+                )
+            except Exception as e:
+                print(f"❌ Question normalization failed for user {user_id}")
+                raise HTTPException(
+                    status_code=500,
+                    detail="Failed to save result to database. Please try again."
+                )
+        
+        result_doc = build_result_doc(result_data, user_object_id, question_ids, answer_indices)
+        if idempotency_key:
+            # Unique per user; a concurrent or later retry hits the index instead of writing twice
+            result_doc["idempotency_key"] = idempotency_key
+        print(f"📊 User {user_id} scored {result_doc['correct_answers']}/{result_doc['total_questions']} ({result_doc['percentage']:.1f}%) on {result_data.difficulty} {result_data.topic}")
         
         # Insert into database with timeout handling
         try:
-            result = await db.results.insert_one(result_doc)
-            result_doc["_id"] = result.inserted_id
+            if ingest_queue:
+                # Group-commit through the write-behind queue; returns once the batch is acknowledged
+                result_doc["_id"] = ObjectId()
+                await ingest_queue.submit(result_doc, submission)
+            else:
+                result = await db.results.insert_one(result_doc)
+                result_doc["_id"] = result.inserted_id
             print(f"✅ Assessment result saved successfully for user {user_id}")
+        except (DuplicateKeyError, IngestWriteError) as e:
+            duplicate = isinstance(e, DuplicateKeyError) or e.code == DUPLICATE_KEY
+            replay = await _replayed_result(db, user_object_id, idempotency_key) if duplicate and idempotency_key else None
+            if not replay:
+                print(f"❌ Database insertion failed for user {user_id}")
+                raise HTTPException(
+                    status_code=500,
+                    detail="Failed to save result to database. Please try again."
+                )
+            print(f"🔁 Replaying idempotent submission for user {user_id}")
+            return replay
+        except IngestQueueFull:
+            print(f"❌ Result queue full, rejecting submission for user {user_id}")
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy saving results. Please try again.",
+                headers={"Retry-After": "2"}
+            )
         except Exception as e:
             print(f"❌ Database insertion failed for user {user_id}")
             raise HTTPException(
@@ -124,21 +249,22 @@ async def create_result(result_data: ResultCreate, user_id: str = Depends(get_cu
                 detail="Failed to save result to database. Please try again."
             )
         
-        return {
+        score_engine.record(result_doc)
+        
+        response = {
             "success": True,
             "message": "Result saved successfully",
-            "result": {
-                "id": str(result.inserted_id),
-                "score": result_data.score,
-                "total_questions": result_data.total_questions,
-                "topic": result_data.topic,
-                "difficulty": result_data.difficulty,
-                "percentage": percentage,
-                "time_taken": result_data.time_taken,
-                "date": result_doc["date"].isoformat()
-            }
+            "result": format_saved_result(result_doc)
         }
         
+        # Explanations are generated in the background; poll /results/{id}/detailed for them
+        if not result_data.explanations and await queue_explanations(db, [result_doc["_id"]]):
+            response["explanation_status"] = "pending"
+        if idempotency_key:
+            idempotency_cache.set((str(user_object_id), idempotency_key), response)
+        
+        return response
+        
     except HTTPException:
         # Re-raise HTTP exceptions as-is
         raise
@@ -149,8 +275,130 @@ async def create_result(result_data: ResultCreate, user_id: str = Depends(get_cu
             detail=f"An unexpected error occurred: {str(e)}"
         )
 
+@router.post("/results/batch")
+async def create_results_batch(
+    batch: ResultBatchCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=BATCH_IDEMPOTENCY_KEY_MAX_LENGTH),
+    user_id: str = Depends(get_current_user_id)
+):
+    """Create many assessment results queued by offline clients in one write"""
+    try:
+        print(f"📝 User {user_id} submitting {len(batch.results)} queued assessment results")
+        
+        try:
+            db = await get_db()
+        except Exception as e:
+            print(f"❌ Database connection failed")
+            raise HTTPException(
+                status_code=503,
+                detail="Database connection failed. Please try again."
+            )
+        
+        # Validate every item up front; invalid items are reported, not written
+        statuses = [None] * len(batch.results)
+        valid = []
+        for i, result_data in enumerate(batch.results):
+            if not result_data.user_id or result_data.score is None or not result_data.questions:
+                statuses[i] = {"index": i, "success": False, "error": "Missing required fields for result creation"}
+                continue
+            if not ObjectId.is_valid(result_data.user_id):
+                statuses[i] = {"index": i, "success": False, "error": "Invalid user ID format"}
+                continue
+            valid.append((i, result_data))
+        
+        if valid:
+            try:
+                normalized = await normalize_results_questions(db, [
+                    {
+                        "topic": result_data.topic,
+                        "difficulty": result_data.difficulty,
+                        "questions": result_data.questions,
+                        "user_answers": result_data.user_answers,
+                        "explanations": result_data.explanations
+                    }
+                    for _, result_data in valid
+                ])
+            except Exception as e:
+                print(f"❌ Question normalization failed for user {user_id}")
+                raise HTTPException(
+                    status_code=500,
+                    detail="Failed to save results to database. Please try again."
+                )
+            
+            result_docs = [
+                build_result_doc(result_data, ObjectId(result_data.user_id), question_ids, answer_indices)
+                for (_, result_data), (question_ids, answer_indices) in zip(valid, normalized)
+            ]
+            if idempotency_key:
+                # Each item gets its own key so a replayed batch only writes what is missing
+                for (i, _), result_doc in zip(valid, result_docs):
+                    result_doc["idempotency_key"] = f"{idempotency_key}:{i}"
+            
+            # One unordered write through the bulk-ingest pool; a failing document does not block the rest
+            failed = {}
+            try:
+                ingest_db = await get_db("ingest")
+                await ingest_db.results.insert_many(result_docs, ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get("writeErrors", []):
+                    failed[error["index"]] = error
+            except Exception as e:
+                print(f"❌ Batch insertion failed for user {user_id}")
+                raise HTTPException(
+                    status_code=500,
+                    detail="Failed to save results to database. Please try again."
+                )
+            
+            # Items rejected as duplicates were saved by an earlier attempt; report the originals
+            originals = {}
+            replayed = [result_docs[p] for p, error in failed.items() if idempotency_key and error.get("code") == DUPLICATE_KEY]
+            if replayed:
+                found = await db.results.find({
+                    "user_id": {"$in": list({doc["user_id"] for doc in replayed})},
+                    "idempotency_key": {"$in": [doc["idempotency_key"] for doc in replayed]}
+                }).to_list(None)
+                originals = {(doc["user_id"], doc["idempotency_key"]): doc for doc in found}
+            
+            for position, ((i, _), result_doc) in enumerate(zip(valid, result_docs)):
+                original = originals.get((result_doc["user_id"], result_doc.get("idempotency_key")))
+                if original:
+                    statuses[i] = {"index": i, "success": True, "replayed": True, "result": format_saved_result(original)}
+                elif position in failed:
+                    statuses[i] = {"index": i, "success": False, "error": failed[position].get("errmsg", "Write failed")}
+                else:
+                    score_engine.record(result_doc)
+                    statuses[i] = {"index": i, "success": True, "result": format_saved_result(result_doc)}
+            
+            await queue_explanations(db, [
+                result_doc["_id"]
+                for position, ((i, result_data), result_doc) in enumerate(zip(valid, result_docs))
+                if position not in failed and not result_data.explanations
+            ])
+        
+        saved = sum(1 for status in statuses if status["success"])
+        print(f"✅ Saved {saved}/{len(statuses)} queued results for user {user_id}")
+        
+        return {
+            "success": saved == len(statuses),
+            "message": f"Saved {saved} of {len(statuses)} results",
+            "results": statuses
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Unexpected error for user {user_id}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"An unexpected error occurred: {str(e)}"
+        )
+
 @router.get("/results/user/{user_id}")
-async def get_user_results(user_id: str, current_user_id: str = Depends(get_current_user_id)):
+async def get_user_results(
+    user_id: str,
+    include_archived: bool = False,
+    current_user_id: str = Depends(get_current_user_id)
+):
     """Get all results for a specific user with enhanced data"""
     try:
         print(f"📋 User {current_user_id} requesting results")
@@ -165,6 +413,9 @@ async def get_user_results(user_id: str, current_user_id: str = Depends(get_curr
         # Get results sorted by date (newest first)
         query = {"user_id": ObjectId(user_id)}
         results = await db.results.find(query).sort("date", -1).to_list(None)
+        if include_archived:
+            archived = await db[ARCHIVE_COLLECTION].find(query).sort("date", -1).to_list(None)
+            results = sorted(results + archived, key=lambda x: x["date"], reverse=True)
         print(f"📋 Found {len(results)} assessment results for user {user_id}")
         
         # Format results for response with enhanced data
@@ -197,16 +448,149 @@ async def get_user_results(user_id: str, current_user_id: str = Depends(get_curr
             detail=f"Failed to fetch results: {str(e)}"
         )
 
+@router.get("/results/user/{user_id}/export")
+async def export_user_results(
+    user_id: str,
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    columns: Optional[str] = Query(None, description="Comma-separated columns, defaults to all"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Stream a user's full assessment history as CSV or Parquet"""
+    print(f"📤 [EXPORT] User {current_user_id} exporting results for {user_id} as {format}")
+    
+    db = await get_db()
+    
+    # Students export their own history; admins (teachers) may export anyone's
+    if user_id != current_user_id:
+        current_user = await get_user_profile(db, current_user_id)
+        if not current_user or not current_user.get("is_admin", False):
+            print(f"❌ [EXPORT] Access denied: user {current_user_id} trying to export results for {user_id}")
+            raise HTTPException(status_code=403, detail="Access denied")
+    
+    if not ObjectId.is_valid(user_id):
+        raise HTTPException(status_code=400, detail="Invalid user ID format")
+    
+    selected = [c.strip() for c in columns.split(",") if c.strip()] if columns else EXPORT_COLUMNS
+    unknown = [c for c in selected if c not in EXPORT_COLUMNS]
+    if unknown or not selected:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown columns: {', '.join(unknown)}. Available: {', '.join(EXPORT_COLUMNS)}"
+        )
+    
+    # Full-history scans run on the analytics pool so they never hold OLTP sockets
+    analytics_db = await get_db("analytics")
+    rows = iter_user_results(analytics_db, ObjectId(user_id), selected, start=start, end=end)
+    
+    if format == "parquet":
+        if pq is None:
+            print("❌ [EXPORT] pyarrow not installed")
+            raise HTTPException(status_code=501, detail="Parquet export requires pyarrow to be installed")
+        body = stream_parquet(rows, selected)
+        media_type = "application/vnd.apache.parquet"
+    else:
+        body = stream_csv(rows, selected)
+        media_type = "text/csv"
+    
+    filename = f"results_{user_id}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/results/percentile/{topic}/{difficulty}")
+async def get_percentile(
+    topic: str,
+    difficulty: str,
+    percentage: float = Query(..., ge=0, le=100),
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Get the percentile rank of a score for a topic and difficulty"""
+    try:
+        print(f"📊 [SKETCH] User {current_user_id} requesting percentile for {percentage:.1f}% on {difficulty} {topic}")
+        
+        return {
+            "success": True,
+            "topic": topic,
+            "difficulty": difficulty,
+            "percentage": percentage,
+            **score_engine.percentile(topic, difficulty, percentage)
+        }
+        
+    except Exception as e:
+        print(f"❌ [SKETCH] Error computing percentile for user {current_user_id}: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to compute percentile: {str(e)}"
+        )
+
+@router.get("/results/leaderboard/{topic}/{difficulty}")
+async def get_leaderboard(
+    topic: str,
+    difficulty: str,
+    limit: int = Query(10, ge=1, le=100),
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Get the top attempts for a topic and difficulty"""
+    try:
+        print(f"🏆 [SKETCH] User {current_user_id} requesting leaderboard for {difficulty} {topic}")
+        
+        return {
+            "success": True,
+            "topic": topic,
+            "difficulty": difficulty,
+            **score_engine.leaderboard(topic, difficulty, limit, current_user_id)
+        }
+        
+    except Exception as e:
+        print(f"❌ [SKETCH] Error fetching leaderboard for user {current_user_id}: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch leaderboard: {str(e)}"
+        )
+
+def _cache_view(view: str, result_id: str, user_id: str, payload) -> dict:
+    """Serialize a result view once and cache the bytes with a strong ETag"""
+    body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode("utf-8")
+    entry = {
+        "user_id": user_id,
+        "etag": '"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+        "body": body
+    }
+    result_view_cache.set((view, result_id), entry)
+    return entry
+
+def _view_response(entry: dict, if_none_match: Optional[str]) -> Response:
+    """Return cached bytes, or 304 when the client already holds this ETag"""
+    headers = {"ETag": entry["etag"], "Cache-Control": "private, no-cache"}
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" in tags or entry["etag"] in tags:
+            return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
+
 @router.get("/results/{result_id}")
-async def get_result(result_id: str, current_user_id: str = Depends(get_current_user_id)):
+async def get_result(
+    result_id: str,
+    if_none_match: Optional[str] = Header(None),
+    current_user_id: str = Depends(get_current_user_id)
+):
     """Get a specific result by ID with detailed information"""
     try:
         print(f"📋 [RESULT] User {current_user_id} requesting specific result {result_id}")
         
+        # Results never change once stored, so a cached view needs no database read
+        cached = result_view_cache.get(("result", result_id))
+        if cached and cached["user_id"] == current_user_id:
+            return _view_response(cached, if_none_match)
+        
         db = await get_db()
         
-        # Get result
-        result = await db.results.find_one({"_id": ObjectId(result_id)})
+        # Get result, transparently falling back to the archive
+        result = await find_result(db, ObjectId(result_id))
         
         if not result:
             print(f"❌ [RESULT] Result {result_id} not found")
@@ -217,12 +601,14 @@ async def get_result(result_id: str, current_user_id: str = Depends(get_current_
             print(f"❌ [RESULT] Access denied: user {current_user_id} trying to access result {result_id} owned by {result['user_id']}")
             raise HTTPException(status_code=403, detail="Access denied")
         
+        result = await hydrate_result(db, result)
+        
         # Calculate percentage if not stored
         percentage = result.get("percentage", (result["score"] / result["total_questions"]) * 100)
         
         print(f"✅ [RESULT] Returning detailed result {result_id} to user {current_user_id}")
         
-        return {
+        payload = {
             "success": True,
             "result": {
                 "id": str(result["_id"]),
@@ -242,6 +628,8 @@ async def get_result(result_id: str, current_user_id: str = Depends(get_current_
             }
         }
         
+        return _view_response(_cache_view("result", result_id, current_user_id, payload), if_none_match)
+        
     except Exception as e:
         print(f"❌ [RESULT] Error fetching result {result_id} for user {current_user_id}: {e}")
         raise HTTPException(
@@ -250,15 +638,25 @@ async def get_result(result_id: str, current_user_id: str = Depends(get_current_
         )
 
 @router.get("/results/{result_id}/detailed")
-async def get_detailed_result(result_id: str, current_user_id: str = Depends(get_current_user_id)):
+async def get_detailed_result(
+    result_id: str,
+    wait: float = Query(0, ge=0, le=30, description="Seconds to wait for pending explanations"),
+    if_none_match: Optional[str] = Header(None),
+    current_user_id: str = Depends(get_current_user_id)
+):
     """Get detailed result with question reviews and explanations"""
     try:
         print(f"📋 [RESULT] User {current_user_id} requesting detailed result {result_id}")
         
+        # Serve the cached bytes (or a 304) without touching Mongo or rebuilding models
+        cached = result_view_cache.get(("detailed", result_id))
+        if cached and cached["user_id"] == current_user_id:
+            return _view_response(cached, if_none_match)
+        
         db = await get_db()
         
-        # Get result
-        result = await db.results.find_one({"_id": ObjectId(result_id)})
+        # Get result, transparently falling back to the archive
+        result = await find_result(db, ObjectId(result_id))
         
         if not result:
             print(f"❌ [RESULT] Detailed result {result_id} not found")
@@ -269,6 +667,14 @@ async def get_detailed_result(result_id: str, current_user_id: str = Depends(get
             print(f"❌ [RESULT] Access denied: user {current_user_id} trying to access detailed result {result_id}")
             raise HTTPException(status_code=403, detail="Access denied")
         
+        # Long-poll for background explanations when the client asks to wait
+        explanation_status = await get_job_status(db, result["_id"])
+        if explanation_status in ACTIVE_STATES and wait > 0:
+            explanation_status = await wait_for_job(db, result["_id"], wait)
+            result = await find_result(db, result["_id"])
+        
+        result = await hydrate_result(db, result)
+        
         # Calculate metrics
         percentage = result.get("percentage", (result["score"] / result["total_questions"]) * 100)
         correct_answers = result.get("correct_answers", result["score"])
@@ -317,12 +723,18 @@ async def get_detailed_result(result_id: str, current_user_id: str = Depends(get
         
         print(f"✅ [RESULT] Returning detailed result {result_id} with {len(question_reviews)} question reviews to user {current_user_id}")
         
-        return DetailedResultResponse(
+        response = DetailedResultResponse(
             success=True,
             result=detailed_result,
-            question_reviews=question_reviews
+            question_reviews=question_reviews,
+            explanation_status=explanation_status
         )
         
+        # Views with explanations still in flight are not cached; the job invalidates the rest when it finishes
+        if explanation_status in ACTIVE_STATES:
+            return response
+        return _view_response(_cache_view("detailed", result_id, current_user_id, response), if_none_match)
+        
     except Exception as e:
         print(f"❌ [RESULT] Error fetching detailed result {result_id} for user {current_user_id}: {e}")
         raise HTTPException(
@@ -346,9 +758,11 @@ async def get_user_analytics(user_id: str, current_user_id: str = Depends(get_cu
         # Get all results for user
         query = {"user_id": ObjectId(user_id)}
         results = await db.results.find(query).to_list(None)
-        print(f"📊 Found {len(results)} assessment results for user {user_id}")
+        # Archived results only contribute through their rollups
+        rollups = await load_rollups(db, ObjectId(user_id))
+        print(f"📊 Found {len(results)} assessment results and {len(rollups)} archived rollups for user {user_id}")
         
-        if not results:
+        if not results and not rollups:
             print(f"📊 No results found for user {user_id}, returning empty analytics")
             return {
                 "success": True,
@@ -362,15 +776,15 @@ async def get_user_analytics(user_id: str, current_user_id: str = Depends(get_cu
             }
         
         # Calculate analytics
-        total_assessments = len(results)
-        total_score = sum(r["score"] for r in results)
+        total_assessments = len(results) + sum(r["count"] for r in rollups)
+        total_score = sum(r["score"] for r in results) + sum(r["total_score"] for r in rollups)
         average_score = total_score / total_assessments if total_assessments > 0 else 0
-        total_questions = sum(r["total_questions"] for r in results)
+        total_questions = sum(r["total_questions"] for r in results) + sum(r["total_questions"] for r in rollups)
         
         print(f"📊 User {user_id} analytics - {total_assessments} assessments, avg score: {average_score:.1f}, total questions: {total_questions}")
         
         # Get unique topics
-        topics = list(set(r["topic"] for r in results))
+        topics = list(set(r["topic"] for r in results) | set(r["topic"] for r in rollups))
         
         # Get recent performance (last 5 assessments)
         recent_results = sorted(results, key=lambda x: x["date"], reverse=True)[:5]
@@ -385,20 +799,8 @@ async def get_user_analytics(user_id: str, current_user_id: str = Depends(get_cu
             for r in recent_results
         ]
         
-        # Get topic statistics
-        topic_stats = {}
-        for result in results:
-            topic = result["topic"]
-            if topic not in topic_stats:
-                topic_stats[topic] = {"count": 0, "total_score": 0, "total_questions": 0}
-            topic_stats[topic]["count"] += 1
-            topic_stats[topic]["total_score"] += result["score"]
-            topic_stats[topic]["total_questions"] += result["total_questions"]
-        
-        # Calculate average scores for topics
-        for topic in topic_stats:
-            stats = topic_stats[topic]
-            stats["average_score"] = stats["total_score"] / stats["count"] if stats["count"] > 0 else 0
+        # Get topic statistics, archived rollups included so they agree with the totals
+        topic_stats = merge_stats(results, rollups, "topic")
         
         print(f"📊 Calculated analytics for {len(topics)} topics for user {user_id}")
         
@@ -462,11 +864,20 @@ async def get_results_by_topic(
                 "date": result["date"].isoformat()
             })
         
+        # The listing only holds hot results; the summary folds in archived rollups for the same topics
+        pattern = re.compile(topic, re.IGNORECASE)
+        rollups = [
+            r for r in await load_rollups(db, ObjectId(current_user_id))
+            if pattern.search(r["topic"]) and (not difficulty or r["difficulty"] == difficulty)
+        ]
+        topic_stats = merge_stats(results, rollups, "topic")
+        
         print(f"✅ [RESULTS] Returning {len(formatted_results)} topic results to user {current_user_id}")
         
         return {
             "success": True,
-            "results": formatted_results
+            "results": formatted_results,
+            "topic_stats": topic_stats
         }
         
     except Exception as e:
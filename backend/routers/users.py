@@ -1,30 +1,39 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from typing import Optional
 from bson import ObjectId
 
 from database import get_db
 from models.schemas import UserCreate, UserResponse, UserSettings, SettingsResponse
-from models.models import UserModel
-from routers.auth import get_current_user_id, create_access_token
+from routers.auth import get_current_user_id, enforce_login_throttle
+from utils.rate_limit import register_throttle
+from refresh_tokens import issue_tokens, revoke_user_sessions
+from archive import load_rollups, merge_stats, ARCHIVE_COLLECTION, ROLLUP_COLLECTION
+from utils.result_store import invalidate_result_views
+from utils.user_store import (
+    get_user_profile, email_exists, find_credentials, get_password_hash, create_user, update_user,
+    set_password, delete_user as delete_user_data, list_face_descriptors, list_identities,
+    get_settings, save_settings
+)
+from utils.passwords import hash_password, verify_password, needs_rehash, PasswordHasherBusy
 
 router = APIRouter()
 
 @router.post("/users/register")
-async def register_user(user_data: UserCreate):
+async def register_user(user_data: UserCreate, request: Request):
     """Register a new user"""
+    await enforce_login_throttle(request, user_data.email, register_throttle)
     try:
         print(f"👤 [USER] New user registration attempt for email: {user_data.email}")
         
         db = await get_db()
         
         # Check if user already exists
-        existing_user = await db.users.find_one({"email": user_data.email})
-        if existing_user:
+        if await email_exists(db, user_data.email):
             print(f"❌ [USER] Registration failed - user already exists: {user_data.email}")
             raise HTTPException(status_code=400, detail="User already exists")
         
         # Hash password
-        hashed_password = UserModel.hash_password(user_data.password)
+        hashed_password = await hash_password(user_data.password)
         
         # Create user document
         user_doc = {
@@ -34,66 +43,71 @@ async def register_user(user_data: UserCreate):
             "is_admin": False,
             "google_id": user_data.google_id,
             "name": user_data.name,
-            "profile_picture": user_data.profile_picture,
-            "face_descriptor": None
+            "profile_picture": user_data.profile_picture
         }
         
-        result = await db.users.insert_one(user_doc)
-        user_doc["_id"] = result.inserted_id
+        user_id = await create_user(db, user_doc)
         
-        # Create access token
-        access_token = create_access_token(
-            data={"sub": str(result.inserted_id), "email": user_data.email}
-        )
+        # Create access and refresh tokens
+        tokens = await issue_tokens(db, str(user_id), user_data.email)
         
-        print(f"✅ [USER] User registered successfully: {user_data.email} (ID: {result.inserted_id})")
+        print(f"✅ [USER] User registered successfully: {user_data.email} (ID: {user_id})")
         
         return {
             "success": True,
             "message": "User registered successfully",
-            "access_token": access_token,
+            "access_token": tokens["access_token"],
+            "refresh_token": tokens["refresh_token"],
             "user": {
-                "id": str(result.inserted_id),
+                "id": str(user_id),
                 "email": user_data.email,
                 "username": user_data.username,
                 "name": user_data.name,
                 "profile_picture": user_data.profile_picture
             }
         }
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server is busy, please try again", headers={"Retry-After": "1"})
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ [USER] Registration error for {user_data.email}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/users/login")
-async def login_user(user_data: dict):
+async def login_user(user_data: dict, request: Request):
     """Login with email and password"""
+    await enforce_login_throttle(request, user_data.get("email"))
     try:
         print(f"🔐 [USER] Login attempt for email: {user_data['email']}")
         
         db = await get_db()
         
         # Find user by email
-        user = await db.users.find_one({"email": user_data["email"]})
+        user = await find_credentials(db, user_data["email"])
         if not user:
             print(f"❌ [USER] Login failed - user not found: {user_data['email']}")
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
         # Verify password
-        if not UserModel.verify_password(user_data["password"], user["password"]):
+        if not await verify_password(user_data["password"], user["password"]):
             print(f"❌ [USER] Login failed - invalid password for: {user_data['email']}")
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
-        # Create access token
-        access_token = create_access_token(
-            data={"sub": str(user["_id"]), "email": user["email"]}
-        )
+        # Upgrade hashes made with an older cost factor
+        if needs_rehash(user["password"]):
+            await set_password(db, user["_id"], await hash_password(user_data["password"]))
+        
+        # Create access and refresh tokens
+        tokens = await issue_tokens(db, str(user["_id"]), user["email"])
         
         print(f"✅ [USER] Login successful for user: {user_data['email']}")
         
         return {
             "success": True,
             "message": "Login successful",
-            "access_token": access_token,
+            "access_token": tokens["access_token"],
+            "refresh_token": tokens["refresh_token"],
             "user": {
                 "id": str(user["_id"]),
                 "email": user["email"],
@@ -103,6 +117,11 @@ async def login_user(user_data: dict):
                 "is_admin": user.get("is_admin", False)
             }
         }
+    except PasswordHasherBusy:
+        print(f"❌ [USER] Password hasher saturated, rejecting login for: {user_data['email']}")
+        raise HTTPException(status_code=503, detail="Server is busy, please try again", headers={"Retry-After": "1"})
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ [USER] Login error for {user_data['email']}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -119,7 +138,7 @@ async def get_user(user_id: str, current_user_id: str = Depends(get_current_user
             raise HTTPException(status_code=403, detail="Access denied")
         
         db = await get_db()
-        user = await db.users.find_one({"_id": ObjectId(user_id)})
+        user = await get_user_profile(db, user_id)
         
         if not user:
             print(f"❌ [USER] Profile not found for user {user_id}")
@@ -136,7 +155,7 @@ async def get_user(user_id: str, current_user_id: str = Depends(get_current_user
                 "name": user.get("name"),
                 "profile_picture": user.get("profile_picture"),
                 "is_admin": user.get("is_admin", False),
-                "has_face_descriptor": bool(user.get("face_descriptor"))
+                "has_face_descriptor": user.get("has_face_descriptor", False)
             }
         }
         
@@ -162,7 +181,7 @@ async def update_user(
         db = await get_db()
         
         # Validate user exists
-        user = await db.users.find_one({"_id": ObjectId(user_id)})
+        user = await get_user_profile(db, user_id)
         if not user:
             print(f"❌ [USER] Profile not found for user {user_id}")
             raise HTTPException(status_code=404, detail="User not found")
@@ -180,12 +199,7 @@ async def update_user(
             raise HTTPException(status_code=400, detail="No valid fields to update")
         
         # Update user
-        result = await db.users.update_one(
-            {"_id": ObjectId(user_id)},
-            {"$set": update_data}
-        )
-        
-        if result.modified_count == 0:
+        if await update_user(db, user_id, update_data) == 0:
             print(f"❌ [USER] No changes made for user {user_id}")
             raise HTTPException(status_code=400, detail="No changes made")
         
@@ -214,14 +228,21 @@ async def delete_user(user_id: str, current_user_id: str = Depends(get_current_u
         db = await get_db()
         
         # Validate user exists
-        user = await db.users.find_one({"_id": ObjectId(user_id)})
+        user = await get_user_profile(db, user_id)
         if not user:
             print(f"❌ [USER] Account not found for user {user_id}")
             raise HTTPException(status_code=404, detail="User not found")
         
+        # Sign out every session first so no refresh token outlives the account
+        revoked = await revoke_user_sessions(db, user_id)
+        print(f"🔐 [USER] Revoked {revoked} sessions of user {user_id}")
+        
         # Delete user and all associated data
-        await db.users.delete_one({"_id": ObjectId(user_id)})
+        await delete_user_data(db, user_id)
         await db.results.delete_many({"user_id": ObjectId(user_id)})
+        await db[ARCHIVE_COLLECTION].delete_many({"user_id": ObjectId(user_id)})
+        await db[ROLLUP_COLLECTION].delete_many({"user_id": ObjectId(user_id)})
+        invalidate_result_views(user_id=user_id)
         
         print(f"✅ [USER] Account deleted successfully for user {user_id}")
         
@@ -249,30 +270,21 @@ async def get_user_stats(user_id: str, current_user_id: str = Depends(get_curren
         
         # Get user's results
         results = await db.results.find({"user_id": ObjectId(user_id)}).to_list(None)
+        # Archived results only contribute through their rollups
+        rollups = await load_rollups(db, ObjectId(user_id))
         
         # Calculate stats
-        total_assessments = len(results)
-        total_questions = sum(r["total_questions"] for r in results)
-        total_score = sum(r["score"] for r in results)
+        total_assessments = len(results) + sum(r["count"] for r in rollups)
+        total_questions = sum(r["total_questions"] for r in results) + sum(r["total_questions"] for r in rollups)
+        total_score = sum(r["score"] for r in results) + sum(r["total_score"] for r in rollups)
         average_score = total_score / total_assessments if total_assessments > 0 else 0
         
         # Get unique topics
-        topics = list(set(r["topic"] for r in results))
-        
-        # Get difficulty distribution
-        difficulty_stats = {}
-        for result in results:
-            diff = result["difficulty"]
-            if diff not in difficulty_stats:
-                difficulty_stats[diff] = {"count": 0, "total_score": 0}
-            difficulty_stats[diff]["count"] += 1
-            difficulty_stats[diff]["total_score"] += result["score"]
-        
-        # Calculate average scores by difficulty
-        for diff in difficulty_stats:
-            count = difficulty_stats[diff]["count"]
-            total = difficulty_stats[diff]["total_score"]
-            difficulty_stats[diff]["average_score"] = total / count if count > 0 else 0
+        topics = list(set(r["topic"] for r in results) | set(r["topic"] for r in rollups))
+        
+        # Get topic and difficulty distribution, archived rollups included
+        topic_stats = merge_stats(results, rollups, "topic")
+        difficulty_stats = merge_stats(results, rollups, "difficulty")
         
         print(f"📊 [USER] Returning stats for user {user_id} - {total_assessments} assessments, avg score: {average_score:.1f}")
         
@@ -284,6 +296,7 @@ async def get_user_stats(user_id: str, current_user_id: str = Depends(get_curren
                 "average_score": round(average_score, 2),
                 "topics_covered": len(topics),
                 "topics": topics,
+                "topic_stats": topic_stats,
                 "difficulty_stats": difficulty_stats
             }
         }
@@ -301,19 +314,20 @@ async def get_all_users(current_user_id: str = Depends(get_current_user_id)):
         db = await get_db()
         
         # Get all users with face descriptors
-        users = await db.users.find(
-            {"face_descriptor": {"$exists": True, "$ne": None}},
-            {"_id": 1, "name": 1, "email": 1, "face_descriptor": 1}
-        ).to_list(None)
+        faces = await list_face_descriptors(db)
+        identities = await list_identities(db, [user_id for user_id, _ in faces])
         
         # Format response
         formatted_users = []
-        for user in users:
+        for user_id, descriptor in faces:
+            user = identities.get(user_id)
+            if not user:
+                continue
             formatted_users.append({
-                "id": str(user["_id"]),
+                "id": str(user_id),
                 "name": user.get("name"),
                 "email": user.get("email"),
-                "face_descriptor": user.get("face_descriptor")
+                "face_descriptor": descriptor
             })
         
         print(f"👥 [USER] Returning {len(formatted_users)} users with face descriptors to user {current_user_id}")
@@ -347,9 +361,9 @@ async def change_password(
         
         db = await get_db()
         
-        # Validate user exists
-        user = await db.users.find_one({"_id": ObjectId(user_id)})
-        if not user:
+        # Validate user exists; only the hash is needed
+        password_hash = await get_password_hash(db, user_id)
+        if password_hash is None:
             print(f"❌ [USER] User not found for password change: {user_id}")
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -359,20 +373,15 @@ async def change_password(
             raise HTTPException(status_code=400, detail="Missing password fields")
         
         # Verify current password
-        if not UserModel.verify_password(password_data["current_password"], user["password"]):
+        if not await verify_password(password_data["current_password"], password_hash):
             print(f"❌ [USER] Current password incorrect for user {user_id}")
             raise HTTPException(status_code=401, detail="Current password is incorrect")
         
         # Hash new password
-        new_hashed_password = UserModel.hash_password(password_data["new_password"])
+        new_hashed_password = await hash_password(password_data["new_password"])
         
         # Update password
-        result = await db.users.update_one(
-            {"_id": ObjectId(user_id)},
-            {"$set": {"password": new_hashed_password}}
-        )
-        
-        if result.modified_count == 0:
+        if await set_password(db, user_id, new_hashed_password) == 0:
             print(f"❌ [USER] Failed to update password for user {user_id}")
             raise HTTPException(status_code=400, detail="Failed to update password")
         
@@ -383,6 +392,10 @@ async def change_password(
             "message": "Password changed successfully"
         }
         
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server is busy, please try again", headers={"Retry-After": "1"})
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ [USER] Error changing password for user {user_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -404,20 +417,13 @@ async def save_user_settings(
         db = await get_db()
         
         # Validate user exists
-        user = await db.users.find_one({"_id": ObjectId(current_user_id)})
+        user = await get_user_profile(db, current_user_id)
         if not user:
             print(f"❌ [SETTINGS] User not found for settings save: {current_user_id}")
             raise HTTPException(status_code=404, detail="User not found")
         
-        # Save settings to database
-        result = await db.users.update_one(
-            {"_id": ObjectId(current_user_id)},
-            {"$set": {"settings": settings.dict()}}
-        )
-        
-        if result.modified_count == 0:
-            print(f"❌ [SETTINGS] Failed to save settings for user {current_user_id}")
-            raise HTTPException(status_code=400, detail="Failed to save settings")
+        # Save settings to their side collection
+        await save_settings(db, current_user_id, settings.dict())
         
         print(f"✅ [SETTINGS] Settings saved successfully for user {current_user_id}")
         
@@ -445,13 +451,13 @@ async def get_user_settings(
             raise HTTPException(status_code=403, detail="Access denied")
         
         db = await get_db()
-        user = await db.users.find_one({"_id": ObjectId(user_id)})
+        user = await get_user_profile(db, user_id)
         
         if not user:
             print(f"❌ [SETTINGS] User not found for settings retrieval: {user_id}")
             raise HTTPException(status_code=404, detail="User not found")
         
-        settings = user.get("settings", {})
+        settings = await get_settings(db, user_id)
         
         print(f"✅ [SETTINGS] Returning settings for user {user_id}")
         
@@ -0,0 +1,103 @@
+"""Production launcher: several uvicorn workers under gunicorn
+
+Run from backend/: python serve.py [--workers N] [--host HOST] [--port PORT]
+
+Each worker is a separate process with its own caches, so with more than one
+worker the per-process stores are switched to their shared backends unless
+configured explicitly. Falls back to uvicorn's own process manager where
+gunicorn is not installed (e.g. on Windows).
+"""
+import argparse
+import os
+import sys
+from dotenv import load_dotenv
+
+# gunicorn is optional (it does not run on Windows); uvicorn's own process manager is the fallback
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
+load_dotenv()
+
+# Default worker count: the CPUs this process may run on (not the host's count, which
+# overstates what a container or cgroup allows), capped because every worker holds its own
+# caches and MongoDB pools
+WEB_CONCURRENCY_MAX = int(os.getenv("WEB_CONCURRENCY_MAX", "4"))
+
+def default_workers() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # sched_getaffinity is Linux-only
+        cpus = os.cpu_count() or 1
+    return max(1, min(cpus, WEB_CONCURRENCY_MAX))
+
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0")) or default_workers()
+WORKER_TIMEOUT_SECONDS = int(os.getenv("WORKER_TIMEOUT_SECONDS", "60"))
+WORKER_GRACEFUL_TIMEOUT_SECONDS = int(os.getenv("WORKER_GRACEFUL_TIMEOUT_SECONDS", "30"))
+WORKER_MAX_REQUESTS = int(os.getenv("WORKER_MAX_REQUESTS", "0"))
+
+# Stores that are per process by default and the backend every worker can share
+SHARED_STATE_DEFAULTS = {
+    "SESSION_STORE_BACKEND": "mongo",
+    "LOGIN_LIMITER_BACKEND": "mongo",
+    "CACHE_INVALIDATION_BACKEND": "mongo",
+    "ATTEMPT_AUTOSAVE_BACKEND": "direct",
+}
+
+def configure_shared_state(workers: int) -> None:
+    """Point per-process stores at shared backends before any worker imports the app"""
+    if workers <= 1:
+        return
+    if os.getenv("DB_BACKEND", "mongo").lower() == "local":
+        sys.exit("❌ DB_BACKEND=local keeps the database inside one process; run a single worker or use MongoDB")
+    for name, value in SHARED_STATE_DEFAULTS.items():
+        os.environ.setdefault(name, value)
+        if os.environ[name].lower() in ("memory", "none"):
+            print(f"⚠️ [SERVE] {name}={os.environ[name]} keeps state per worker")
+
+def run_gunicorn(host: str, port: int, workers: int) -> None:
+    class Server(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("worker_class", "uvicorn.workers.UvicornWorker")
+            self.cfg.set("timeout", WORKER_TIMEOUT_SECONDS)
+            self.cfg.set("graceful_timeout", WORKER_GRACEFUL_TIMEOUT_SECONDS)
+            self.cfg.set("keepalive", 5)
+            if WORKER_MAX_REQUESTS > 0:
+                # Recycle workers gradually; the jitter keeps them from restarting together
+                self.cfg.set("max_requests", WORKER_MAX_REQUESTS)
+                self.cfg.set("max_requests_jitter", max(1, WORKER_MAX_REQUESTS // 10))
+
+        def load(self):
+            from main import app
+            return app
+
+    Server().run()
+
+def run_uvicorn(host: str, port: int, workers: int) -> None:
+    import uvicorn
+    uvicorn.run(
+        "main:app",
+        host=host,
+        port=port,
+        workers=workers,
+        timeout_graceful_shutdown=WORKER_GRACEFUL_TIMEOUT_SECONDS
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python serve.py", description="Run the API with several worker processes")
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "5001")))
+    args = parser.parse_args()
+
+    configure_shared_state(args.workers)
+    if BaseApplication is None:
+        print(f"🚀 [SERVE] Starting {args.workers} uvicorn workers on {args.host}:{args.port}")
+        run_uvicorn(args.host, args.port, args.workers)
+    else:
+        print(f"🚀 [SERVE] Starting {args.workers} gunicorn/uvicorn workers on {args.host}:{args.port}")
+        run_gunicorn(args.host, args.port, args.workers)
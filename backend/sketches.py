@@ -0,0 +1,335 @@
+import asyncio
+import os
+import sys
+from bisect import bisect_left, insort
+from typing import Any, Dict, List, Optional, Tuple
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+
+from database import get_db
+from archive import ARCHIVE_COLLECTION
+
+load_dotenv()
+
+# Percentages 0-100 fall into fixed buckets of 0.1 percentage points
+SKETCH_BUCKETS = 1000
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", "100"))
+SKETCH_FLUSH_SECONDS = float(os.getenv("SKETCH_FLUSH_SECONDS", "30"))
+
+SKETCH_COLLECTION = "score_sketches"
+LEADERBOARD_COLLECTION = "leaderboard_entries"
+
+def _bucket(percentage: float) -> int:
+    return max(0, min(int(percentage * SKETCH_BUCKETS / 100), SKETCH_BUCKETS - 1))
+
+def sketch_key(topic: str, difficulty: str) -> Tuple[str, str]:
+    """Topics and difficulties are compared case-insensitively"""
+    return topic.strip().lower(), difficulty.strip().lower()
+
+class ScoreHistogram:
+    """Mergeable fixed-bucket histogram of percentages backed by a Fenwick tree
+
+    Recording a score and computing a percentile rank are both O(log B). Counts
+    added since the last flush are kept in ``pending`` so several workers can
+    merge into one persisted histogram with $inc.
+    """
+
+    def __init__(self):
+        self.counts = [0] * SKETCH_BUCKETS
+        self.tree = [0] * (SKETCH_BUCKETS + 1)
+        self.total = 0
+        self.pending: Dict[int, int] = {}
+
+    def load(self, counts: Dict[str, int]) -> None:
+        """Replace counts with merged totals from storage, keeping unflushed additions"""
+        self.counts = [0] * SKETCH_BUCKETS
+        for bucket, count in counts.items():
+            self.counts[int(bucket)] = count
+        for bucket, count in self.pending.items():
+            self.counts[bucket] += count
+        self.total = sum(self.counts)
+
+        # Linear-time Fenwick build
+        self.tree = [0] * (SKETCH_BUCKETS + 1)
+        for i in range(1, SKETCH_BUCKETS + 1):
+            self.tree[i] += self.counts[i - 1]
+            parent = i + (i & -i)
+            if parent <= SKETCH_BUCKETS:
+                self.tree[parent] += self.tree[i]
+
+    def add(self, percentage: float) -> None:
+        bucket = _bucket(percentage)
+        self.counts[bucket] += 1
+        self.pending[bucket] = self.pending.get(bucket, 0) + 1
+        self.total += 1
+        i = bucket + 1
+        while i <= SKETCH_BUCKETS:
+            self.tree[i] += 1
+            i += i & -i
+
+    def _count_below(self, bucket: int) -> int:
+        total = 0
+        i = bucket
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def percentile_rank(self, percentage: float) -> Optional[float]:
+        """Share of recorded scores below this one, counting ties as half"""
+        if self.total == 0:
+            return None
+        bucket = _bucket(percentage)
+        below = self._count_below(bucket)
+        return 100 * (below + self.counts[bucket] / 2) / self.total
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Lower edge of the bucket holding the q-th quantile, via Fenwick binary lifting"""
+        if self.total == 0:
+            return None
+        target = max(1, int(q * self.total + 0.5))
+        position = 0
+        step = 1 << SKETCH_BUCKETS.bit_length()
+        while step:
+            nxt = position + step
+            if nxt <= SKETCH_BUCKETS and self.tree[nxt] < target:
+                position = nxt
+                target -= self.tree[nxt]
+            step >>= 1
+        return position * 100 / SKETCH_BUCKETS
+
+    def take_pending(self) -> Dict[int, int]:
+        pending, self.pending = self.pending, {}
+        return pending
+
+class Leaderboard:
+    """Top-N best attempts with at most one entry per user, best first"""
+
+    def __init__(self, size: int = LEADERBOARD_SIZE):
+        self.size = size
+        self._order: List[Tuple[Tuple, str]] = []
+        self._entries: Dict[str, Tuple[Tuple, Dict[str, Any]]] = {}
+        self.dirty: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def _sort_key(entry: Dict[str, Any]) -> Tuple:
+        time_taken = entry.get("time_taken")
+        return (-entry["percentage"], time_taken if time_taken is not None else float("inf"), entry["date"])
+
+    def offer(self, entry: Dict[str, Any], dirty: bool = True) -> bool:
+        """Insert or improve a user's entry; returns whether the board changed"""
+        user_id = entry["user_id"]
+        key = self._sort_key(entry)
+        existing = self._entries.get(user_id)
+        if existing and existing[0] <= key:
+            return False
+        if not existing and len(self._order) >= self.size and (key, user_id) >= self._order[-1]:
+            return False
+
+        if existing:
+            del self._order[bisect_left(self._order, (existing[0], user_id))]
+        insort(self._order, (key, user_id))
+        self._entries[user_id] = (key, entry)
+        if dirty:
+            self.dirty[user_id] = entry
+
+        if len(self._order) > self.size:
+            _, dropped = self._order.pop()
+            del self._entries[dropped]
+        return True
+
+    def top(self, limit: int) -> List[Dict[str, Any]]:
+        return [
+            {"rank": i + 1, **self._entries[user_id][1]}
+            for i, (_, user_id) in enumerate(self._order[:limit])
+        ]
+
+    def rank(self, user_id: str) -> Optional[int]:
+        existing = self._entries.get(user_id)
+        if not existing:
+            return None
+        return bisect_left(self._order, (existing[0], user_id)) + 1
+
+    def take_dirty(self) -> Dict[str, Dict[str, Any]]:
+        dirty, self.dirty = self.dirty, {}
+        return dirty
+
+class ScoreSketchEngine:
+    """Per (topic, difficulty) percentile sketches and leaderboards, answered without touching results"""
+
+    def __init__(self):
+        self._histograms: Dict[Tuple[str, str], ScoreHistogram] = {}
+        self._leaderboards: Dict[Tuple[str, str], Leaderboard] = {}
+        self._lock = asyncio.Lock()
+
+    def _histogram(self, key: Tuple[str, str]) -> ScoreHistogram:
+        if key not in self._histograms:
+            self._histograms[key] = ScoreHistogram()
+        return self._histograms[key]
+
+    def _leaderboard(self, key: Tuple[str, str]) -> Leaderboard:
+        if key not in self._leaderboards:
+            self._leaderboards[key] = Leaderboard()
+        return self._leaderboards[key]
+
+    def record(self, result_doc: Dict[str, Any]) -> None:
+        """Fold a saved result into its topic and difficulty sketch"""
+        key = sketch_key(result_doc["topic"], result_doc["difficulty"])
+        self._histogram(key).add(result_doc["percentage"])
+        self._leaderboard(key).offer({
+            "user_id": str(result_doc["user_id"]),
+            "percentage": result_doc["percentage"],
+            "time_taken": result_doc.get("time_taken"),
+            "date": result_doc["date"]
+        })
+
+    def percentile(self, topic: str, difficulty: str, percentage: float) -> Dict[str, Any]:
+        histogram = self._histograms.get(sketch_key(topic, difficulty))
+        if histogram is None or histogram.total == 0:
+            return {"percentile": None, "total_attempts": 0, "quantiles": {}}
+        return {
+            "percentile": round(histogram.percentile_rank(percentage), 2),
+            "total_attempts": histogram.total,
+            "quantiles": {f"p{int(q * 100)}": histogram.quantile(q) for q in (0.25, 0.5, 0.75, 0.9)}
+        }
+
+    def leaderboard(self, topic: str, difficulty: str, limit: int, user_id: Optional[str] = None) -> Dict[str, Any]:
+        board = self._leaderboards.get(sketch_key(topic, difficulty))
+        if board is None:
+            return {"entries": [], "your_rank": None}
+        return {
+            "entries": [{**entry, "date": entry["date"].isoformat()} for entry in board.top(limit)],
+            "your_rank": board.rank(user_id) if user_id else None
+        }
+
+    async def load(self, db) -> None:
+        """Reload merged histograms and leaderboards persisted by every worker"""
+        async with self._lock:
+            async for doc in db[SKETCH_COLLECTION].find({}):
+                key = (doc["topic"], doc["difficulty"])
+                self._histogram(key).load(doc.get("counts", {}))
+                entries = await db[LEADERBOARD_COLLECTION].find(
+                    {"topic": key[0], "difficulty": key[1]}
+                ).sort([("percentage", -1), ("time_taken", 1)]).limit(LEADERBOARD_SIZE).to_list(None)
+                board = self._leaderboard(key)
+                for entry in entries:
+                    board.offer({
+                        "user_id": entry["user_id"],
+                        "percentage": entry["percentage"],
+                        "time_taken": entry.get("time_taken"),
+                        "date": entry["date"]
+                    }, dirty=False)
+
+    async def flush(self, db) -> None:
+        """Persist additions since the last flush as mergeable increments"""
+        async with self._lock:
+            taken_pending = []
+            taken_dirty = []
+            sketch_updates = []
+            for (topic, difficulty), histogram in self._histograms.items():
+                pending = histogram.take_pending()
+                if pending:
+                    taken_pending.append((histogram, pending))
+                    sketch_updates.append(UpdateOne(
+                        {"topic": topic, "difficulty": difficulty},
+                        {"$inc": {f"counts.{bucket}": count for bucket, count in pending.items()}},
+                        upsert=True
+                    ))
+
+            leaderboard_updates = []
+            for (topic, difficulty), board in self._leaderboards.items():
+                dirty = board.take_dirty()
+                if dirty:
+                    taken_dirty.append((board, dirty))
+                for user_id, entry in dirty.items():
+                    # Keep the stored entry only if it is still this user's best, ranked like _sort_key:
+                    # higher percentage, then the faster attempt, then the earlier one
+                    time_taken = entry["time_taken"] if entry.get("time_taken") is not None else float("inf")
+                    stored_time = {"$ifNull": ["$time_taken", float("inf")]}
+                    improved = {"$or": [
+                        {"$gt": [entry["percentage"], {"$ifNull": ["$percentage", -1]}]},
+                        {"$and": [
+                            {"$eq": [entry["percentage"], "$percentage"]},
+                            {"$or": [
+                                {"$lt": [time_taken, stored_time]},
+                                {"$and": [{"$eq": [time_taken, stored_time]}, {"$lt": [entry["date"], "$date"]}]}
+                            ]}
+                        ]}
+                    ]}
+                    leaderboard_updates.append(UpdateOne(
+                        {"topic": topic, "difficulty": difficulty, "user_id": user_id},
+                        [{"$set": {
+                            "percentage": {"$cond": [improved, entry["percentage"], "$percentage"]},
+                            "time_taken": {"$cond": [improved, entry["time_taken"], "$time_taken"]},
+                            "date": {"$cond": [improved, entry["date"], "$date"]}
+                        }}],
+                        upsert=True
+                    ))
+
+        # On failure put everything back so the next flush retries it
+        error = None
+        if sketch_updates:
+            try:
+                await db[SKETCH_COLLECTION].bulk_write(sketch_updates, ordered=False)
+            except Exception as e:
+                error = e
+                for histogram, pending in taken_pending:
+                    for bucket, count in pending.items():
+                        histogram.pending[bucket] = histogram.pending.get(bucket, 0) + count
+        if leaderboard_updates:
+            try:
+                await db[LEADERBOARD_COLLECTION].bulk_write(leaderboard_updates, ordered=False)
+            except Exception as e:
+                error = error or e
+                for board, dirty in taken_dirty:
+                    for user_id, entry in dirty.items():
+                        board.dirty.setdefault(user_id, entry)
+        if error:
+            raise error
+
+    async def rebuild(self, db) -> int:
+        """Recompute every sketch from stored results, hot and archived"""
+        self._histograms = {}
+        self._leaderboards = {}
+        projection = {"user_id": 1, "topic": 1, "difficulty": 1, "percentage": 1, "score": 1, "total_questions": 1, "time_taken": 1, "date": 1}
+        recorded = 0
+        for collection in ("results", ARCHIVE_COLLECTION):
+            async for doc in db[collection].find({}, projection):
+                if "percentage" not in doc:
+                    doc["percentage"] = (doc["score"] / doc["total_questions"]) * 100 if doc["total_questions"] else 0
+                self.record(doc)
+                recorded += 1
+
+        await db[SKETCH_COLLECTION].delete_many({})
+        await db[LEADERBOARD_COLLECTION].delete_many({})
+        await self.flush(db)
+        return recorded
+
+score_engine = ScoreSketchEngine()
+
+async def run_sketch_flush_loop() -> None:
+    """Periodically persist local additions and pick up other workers' contributions"""
+    while True:
+        await asyncio.sleep(SKETCH_FLUSH_SECONDS)
+        try:
+            db = await get_db()
+            await score_engine.flush(db)
+            await score_engine.load(db)
+        except Exception as e:
+            print(f"❌ [SKETCH] Flush failed: {e}")
+
+if __name__ == "__main__":
+    from database import init_db, close_db
+
+    async def _main():
+        if "--rebuild" not in sys.argv:
+            print("Usage: python sketches.py --rebuild")
+            return
+        db = await init_db()
+        try:
+            recorded = await score_engine.rebuild(db)
+            print(f"✅ [SKETCH] Rebuilt sketches from {recorded} results")
+        finally:
+            await close_db()
+
+    asyncio.run(_main())
@@ -0,0 +1,55 @@
+"""Shared fixtures: the app on the embedded database (DB_BACKEND=local), driven in-process"""
+import asyncio
+import os
+import uuid
+
+# Must be set before the app's modules read their configuration
+os.environ["DB_BACKEND"] = "local"
+os.environ["LOCAL_DB_PATH"] = ""
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import httpx
+import pytest
+
+from database import get_db
+from main import app
+
+@pytest.fixture(scope="session")
+def app_client():
+    """One app lifespan for the session, as in a worker process; yields its loop and an in-process client"""
+    loop = asyncio.new_event_loop()
+    lifespan = app.router.lifespan_context(app)
+    loop.run_until_complete(lifespan.__aenter__())
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    yield loop, client
+    loop.run_until_complete(client.aclose())
+    loop.run_until_complete(lifespan.__aexit__(None, None, None))
+    loop.close()
+
+@pytest.fixture
+def run_app(app_client):
+    """Run ``scenario(client)`` against the running app and return its result"""
+    loop, client = app_client
+    return lambda scenario: loop.run_until_complete(scenario(client))
+
+@pytest.fixture
+def run_db(app_client):
+    """Run ``scenario(db)`` against the app's embedded database"""
+    loop, _ = app_client
+
+    def run(scenario):
+        async def main():
+            return await scenario(await get_db())
+        return loop.run_until_complete(main())
+    return run
+
+@pytest.fixture
+def register():
+    """Register a fresh user; returns (user_id, auth headers, response body)"""
+    async def register(client, password: str = "pw123456"):
+        email = f"user-{uuid.uuid4().hex[:12]}@example.com"
+        response = await client.post("/auth/register", json={"email": email, "password": password})
+        assert response.status_code == 200, response.text
+        body = response.json()
+        return body["user"]["id"], {"Authorization": f"Bearer {body['access_token']}"}, {**body, "email": email}
+    return register
@@ -0,0 +1,67 @@
+import uuid
+
+from bson import ObjectId
+
+from database import get_db
+
+def _bank(topic):
+    return [
+        {"topic": topic, "difficulty": "easy", "question": f"Attempt question {i}?", "options": ["right", "wrong"], "answer": "right"}
+        for i in range(3)
+    ]
+
+async def _start(client, headers, topic, **extra):
+    return await client.post("/api/attempts", headers=headers, json={"topic": topic, "difficulty": "easy", "count": 3, **extra})
+
+def test_submit_grades_from_the_stored_key_and_resubmit_replays(run_app, register):
+    topic = f"Attempts {uuid.uuid4().hex[:8]}"
+
+    async def scenario(client):
+        await (await get_db()).questions.insert_many(_bank(topic))
+        user_id, headers, _ = await register(client)
+        started = await _start(client, headers, topic)
+        attempt = started.json()["attempt"]
+        saved = await client.put(f"/api/attempts/{attempt['id']}/answers", headers=headers, json={"answers": {"0": "right"}})
+        submitted = await client.post(f"/api/attempts/{attempt['id']}/submit", headers=headers, json={"answers": {"0": "right", "1": "wrong", "2": "right"}})
+        resubmitted = await client.post(f"/api/attempts/{attempt['id']}/submit", headers=headers, json={"answers": {"1": "right"}})
+        count = await (await get_db()).results.count_documents({"user_id": ObjectId(user_id)})
+        return started, saved, submitted, resubmitted, count
+
+    started, saved, submitted, resubmitted, count = run_app(scenario)
+    assert started.status_code == 200
+    # The answer key stays on the server until the attempt is graded
+    assert all("answer" not in question for question in started.json()["attempt"]["questions"])
+    assert saved.status_code == 200
+    assert submitted.status_code == 200
+    assert submitted.json()["result"]["score"] == 2
+    assert [question["answer"] for question in submitted.json()["questions"]] == ["right"] * 3
+    # A repeated submission returns the first result and cannot change the answers
+    assert resubmitted.status_code == 200
+    assert resubmitted.json()["result"] == submitted.json()["result"]
+    assert count == 1
+
+def test_client_supplied_questions_and_key_are_ignored(run_app, register):
+    topic = f"Attempts {uuid.uuid4().hex[:8]}"
+    forged = [{"question": f"Attempt question {i}?", "options": ["right", "wrong"], "answer": "wrong"} for i in range(3)]
+
+    async def scenario(client):
+        await (await get_db()).questions.insert_many(_bank(topic))
+        _, headers, _ = await register(client)
+        started = await _start(client, headers, topic, questions=forged)
+        attempt_id = started.json()["attempt"]["id"]
+        submitted = await client.post(f"/api/attempts/{attempt_id}/submit", headers=headers, json={"answers": {"0": "wrong", "1": "wrong", "2": "wrong"}})
+        stored = await (await get_db()).attempts.find_one({"_id": ObjectId(attempt_id)})
+        return started, submitted, stored
+
+    started, submitted, stored = run_app(scenario)
+    assert started.status_code == 200
+    # Graded against the stored questions, not the key the client sent
+    assert stored["answer_key"] == [0, 0, 0]
+    assert submitted.json()["result"]["score"] == 0
+
+def test_start_fails_when_no_questions_are_available(run_app, register):
+    async def scenario(client):
+        _, headers, _ = await register(client)
+        return await _start(client, headers, f"Empty {uuid.uuid4().hex[:8]}")
+
+    assert run_app(scenario).status_code == 503
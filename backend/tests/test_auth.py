@@ -0,0 +1,65 @@
+from bson import ObjectId
+
+from database import get_db
+from utils.user_store import invalidate_user
+
+def test_refresh_rotates_and_reuse_revokes_the_session(run_app, register):
+    async def scenario(client):
+        _, _, body = await register(client)
+        first = await client.post("/auth/refresh", json={"refresh_token": body["refresh_token"]})
+        rotated = first.json()
+        rotated_headers = {"Authorization": f"Bearer {rotated['access_token']}"}
+        before = await client.get("/auth/status", headers=rotated_headers)
+        reused = await client.post("/auth/refresh", json={"refresh_token": body["refresh_token"]})
+        # Reusing a rotated token revokes the session, including the tokens issued after it
+        after_reuse = await client.post("/auth/refresh", json={"refresh_token": rotated["refresh_token"]})
+        after = await client.get("/auth/status", headers=rotated_headers)
+        return body, first, rotated, before, reused, after_reuse, after
+
+    body, first, rotated, before, reused, after_reuse, after = run_app(scenario)
+    assert first.status_code == 200
+    assert rotated["refresh_token"] != body["refresh_token"]
+    assert before.status_code == 200
+    assert reused.status_code == 401
+    assert after_reuse.status_code == 401
+    assert after.status_code == 401
+
+def test_login_throttle_blocks_repeated_failures_for_an_email(run_app, register):
+    async def scenario(client):
+        _, _, body = await register(client)
+        credentials = {"email": body["email"], "password": "wrong-password"}
+        failures = [(await client.post("/auth/login", json=credentials)).status_code for _ in range(5)]
+        blocked = await client.post("/auth/login", json={"email": body["email"], "password": "pw123456"})
+        return failures, blocked
+
+    failures, blocked = run_app(scenario)
+    assert failures == [401] * 5
+    assert blocked.status_code == 429
+    assert "Retry-After" in blocked.headers
+
+def test_deleting_an_account_revokes_its_sessions(run_app, register):
+    async def scenario(client):
+        user_id, headers, body = await register(client)
+        second = (await client.post("/auth/login", json={"email": body["email"], "password": "pw123456"})).json()
+        deleted = await client.delete(f"/db/users/{user_id}", headers=headers)
+        refreshed = [
+            await client.post("/auth/refresh", json={"refresh_token": token})
+            for token in (body["refresh_token"], second["refresh_token"])
+        ]
+        status = await client.get("/auth/status", headers={"Authorization": f"Bearer {second['access_token']}"})
+        return deleted, refreshed, status
+
+    deleted, refreshed, status = run_app(scenario)
+    assert deleted.status_code == 200
+    assert [response.status_code for response in refreshed] == [401, 401]
+    assert status.status_code == 401
+
+def test_refresh_fails_once_the_user_is_gone(run_app, register):
+    async def scenario(client):
+        user_id, _, body = await register(client)
+        # Removed without going through account deletion, so the session was never revoked
+        await (await get_db()).users.delete_one({"_id": ObjectId(user_id)})
+        invalidate_user(user_id)
+        return await client.post("/auth/refresh", json={"refresh_token": body["refresh_token"]})
+
+    assert run_app(scenario).status_code == 401
@@ -0,0 +1,13 @@
+from utils.auth_utils import create_access_token, verify_token
+
+def test_verified_claims_are_not_shared_between_callers():
+    token = create_access_token({"sub": "user-1", "email": "claims@example.com", "sid": "session-1"})
+    first = verify_token(token)
+    first.pop("sub")
+    first["email"] = "changed@example.com"
+    cached = verify_token(token)
+    cached.pop("sid")
+    again = verify_token(token)
+    assert again["sub"] == "user-1"
+    assert again["email"] == "claims@example.com"
+    assert again["sid"] == "session-1"
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from explanations import ExplanationJobQueue, EXPLANATION_JOBS_COLLECTION, JOB_PENDING, JOB_RUNNING
+
+def test_jobs_that_overflow_the_queue_are_picked_up_by_the_rescan(run_db):
+    queue = ExplanationJobQueue(workers=0, max_size=1)
+    first, second = ObjectId(), ObjectId()
+
+    async def scenario(db):
+        await queue.enqueue(db, first)
+        await queue.enqueue(db, second)
+        overflowed = queue.stats["overflow"]
+        # A worker takes and claims the first job, which frees a slot for the deferred one
+        taken = await queue._queue.get()
+        queue._queued.discard(taken)
+        await db[EXPLANATION_JOBS_COLLECTION].update_one({"_id": taken}, {"$set": {"status": JOB_RUNNING, "updated_at": datetime.utcnow()}})
+        requeued = await queue._recover(db)
+        job = await db[EXPLANATION_JOBS_COLLECTION].find_one({"_id": second})
+        return overflowed, taken, requeued, job
+
+    overflowed, taken, requeued, job = run_db(scenario)
+    assert overflowed == 1
+    assert taken == first
+    assert job["status"] == JOB_PENDING
+    assert requeued == 1
+    assert second in queue._queued
@@ -0,0 +1,107 @@
+import time
+from collections import Counter
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+import routers.auth as auth
+from utils.http_clients import http_clients
+
+CLIENT_ID = "test-client.apps.googleusercontent.com"
+ISSUER = "https://accounts.google.com"
+
+def _signing_key():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    public = jwk.construct(pem, "RS256").public_key().to_dict()
+    return pem, {**public, "kid": "test-key", "use": "sig"}
+
+class MockGoogle:
+    """OpenID discovery, JWKS, token and userinfo endpoints; counts requests per path"""
+
+    def __init__(self, discovery_max_age: int, jwks_max_age: int):
+        self.pem, self.public_jwk = _signing_key()
+        self.discovery_max_age = discovery_max_age
+        self.jwks_max_age = jwks_max_age
+        self.requests = Counter()
+
+    def _id_token(self, email: str) -> str:
+        now = int(time.time())
+        claims = {"iss": ISSUER, "aud": CLIENT_ID, "sub": f"google-{email}", "email": email, "name": "Mock User", "iat": now, "exp": now + 300}
+        return jwt.encode(claims, self.pem, algorithm="RS256", headers={"kid": "test-key"})
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        self.requests[path] += 1
+        if path == "/.well-known/openid-configuration":
+            return httpx.Response(200, headers={"Cache-Control": f"public, max-age={self.discovery_max_age}"}, json={
+                "issuer": ISSUER,
+                "authorization_endpoint": "https://accounts.google.com/o/oauth2/v2/auth",
+                "token_endpoint": "https://oauth2.googleapis.com/token",
+                "userinfo_endpoint": "https://openidconnect.googleapis.com/v1/userinfo",
+                "jwks_uri": "https://www.googleapis.com/oauth2/v3/certs"
+            })
+        if path == "/oauth2/v3/certs":
+            return httpx.Response(200, headers={"Cache-Control": f"public, max-age={self.jwks_max_age}"}, json={"keys": [self.public_jwk]})
+        if path == "/token":
+            email = parse_qs(request.content.decode())["code"][0]
+            return httpx.Response(200, json={"access_token": "mock-access-token", "id_token": self._id_token(email), "token_type": "Bearer"})
+        return httpx.Response(404)
+
+def _use_mock_google(monkeypatch, google: MockGoogle):
+    monkeypatch.setattr(auth, "GOOGLE_CLIENT_ID", CLIENT_ID)
+    monkeypatch.setattr(auth, "GOOGLE_CLIENT_SECRET", "test-secret")
+    monkeypatch.setattr(auth, "GOOGLE_DISCOVERY_URL", f"{ISSUER}/.well-known/openid-configuration")
+
+async def _login(client, email: str) -> str:
+    """Run the callback as Google's redirect would; returns the one-time code from the frontend redirect"""
+    response = await client.get("/auth/google/callback", params={"code": email})
+    assert response.status_code == 307
+    query = parse_qs(urlparse(response.headers["location"]).query)
+    assert "error" not in query, response.headers["location"]
+    return query["code"][0]
+
+def test_google_login_caches_documents_for_their_max_age(run_app, monkeypatch):
+    # Discovery stays fresh for the whole test; the JWKS is stale as soon as it is served
+    google = MockGoogle(discovery_max_age=3600, jwks_max_age=0)
+    _use_mock_google(monkeypatch, google)
+
+    async def scenario(client):
+        await http_clients.aclose()
+        http_clients.get("google", transport=httpx.MockTransport(google.handler))
+        try:
+            for i in range(3):
+                await _login(client, f"google-cache-{i}@example.com")
+        finally:
+            await http_clients.aclose()
+
+    run_app(scenario)
+    assert google.requests["/.well-known/openid-configuration"] == 1
+    assert google.requests["/oauth2/v3/certs"] == 3
+    assert google.requests["/token"] == 3
+    # The id_token was verified against the JWKS, so userinfo was never needed
+    assert google.requests["/v1/userinfo"] == 0
+
+def test_google_login_code_is_redeemed_once(run_app, monkeypatch):
+    google = MockGoogle(discovery_max_age=3600, jwks_max_age=3600)
+    _use_mock_google(monkeypatch, google)
+
+    async def scenario(client):
+        await http_clients.aclose()
+        http_clients.get("google", transport=httpx.MockTransport(google.handler))
+        try:
+            code = await _login(client, "google-exchange@example.com")
+        finally:
+            await http_clients.aclose()
+        first = await client.post("/auth/google/exchange", json={"code": code})
+        second = await client.post("/auth/google/exchange", json={"code": code})
+        return first, second
+
+    first, second = run_app(scenario)
+    assert first.status_code == 200
+    assert first.json()["user"]["email"] == "google-exchange@example.com"
+    assert first.json()["access_token"] and first.json()["refresh_token"]
+    assert second.status_code == 401
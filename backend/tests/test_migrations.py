@@ -0,0 +1,53 @@
+import uuid
+
+import pytest
+
+from migrations import Migration, run_migration, MIGRATIONS_COLLECTION
+
+class MarkDocuments(Migration):
+    """Sets a flag on every document; fails once after ``fail_after`` documents"""
+
+    version = 99
+    # Matches every document, so only the checkpoint keeps a resumed run from revisiting them
+    query: dict = {}
+
+    def __init__(self, collection: str, fail_after: int = 0):
+        self.name = f"mark_{collection}"
+        self.collection = collection
+        self.fail_after = fail_after
+        self.seen = []
+
+    async def apply(self, db, batch, dry_run):
+        if self.fail_after and len(self.seen) >= self.fail_after:
+            self.fail_after = 0
+            raise RuntimeError("interrupted")
+        self.seen.extend(doc["_id"] for doc in batch)
+        if not dry_run:
+            await db[self.collection].update_many({"_id": {"$in": [doc["_id"] for doc in batch]}}, {"$set": {"marked": True}})
+        return len(batch)
+
+def test_interrupted_migration_resumes_from_its_checkpoint(run_db):
+    collection = f"migration_test_{uuid.uuid4().hex[:8]}"
+    migration = MarkDocuments(collection, fail_after=4)
+
+    async def scenario(db):
+        await db[collection].insert_many([{"n": i} for i in range(10)])
+        with pytest.raises(RuntimeError):
+            await run_migration(db, migration, batch_size=2, max_docs_per_second=0)
+        failed = await db[MIGRATIONS_COLLECTION].find_one({"_id": migration.name})
+        summary = await run_migration(db, migration, batch_size=2, max_docs_per_second=0)
+        done = await db[MIGRATIONS_COLLECTION].find_one({"_id": migration.name})
+        rerun = await run_migration(db, migration, batch_size=2, max_docs_per_second=0)
+        unmarked = await db[collection].count_documents({"marked": {"$exists": False}})
+        return failed, summary, done, rerun, unmarked
+
+    failed, summary, done, rerun, unmarked = run_db(scenario)
+    assert failed["status"] == "failed"
+    assert failed["processed"] == 4
+    # The second run starts after the checkpoint and never revisits a document
+    assert summary["processed"] == 6
+    assert len(migration.seen) == len(set(migration.seen)) == 10
+    assert done["status"] == "done"
+    assert done["processed"] == 10
+    assert rerun["status"] == "done"
+    assert unmarked == 0
@@ -0,0 +1,56 @@
+import uuid
+
+from utils.result_store import UNANSWERED, normalize_results_questions, hydrate_result
+
+def _question(text, options, answer):
+    return {"question": text, "options": options, "answer": answer}
+
+def test_round_trip_keeps_questions_and_answers(run_db):
+    topic = f"Topic {uuid.uuid4().hex}"
+    questions = [
+        _question("Capital of France?", ["Paris", "Rome"], "Paris"),
+        _question("2 + 2?", ["3", "4"], "4"),
+        _question("Largest planet?", ["Mars", "Jupiter"], "Jupiter"),
+    ]
+    # An option, a free-text answer that is not an option, and no answer
+    user_answers = ["Paris", "five", ""]
+
+    async def scenario(db):
+        [(question_ids, answer_indices)] = await normalize_results_questions(db, [
+            {"topic": topic, "difficulty": "easy", "questions": questions, "user_answers": user_answers}
+        ])
+        hydrated = await hydrate_result(db, {"question_ids": question_ids, "answer_indices": answer_indices})
+        return answer_indices, hydrated
+
+    answer_indices, hydrated = run_db(scenario)
+    assert answer_indices == [0, "five", UNANSWERED]
+    assert hydrated["questions"] == questions
+    assert hydrated["user_answers"] == user_answers
+
+def test_duplicate_question_text_with_other_options_is_stored_separately(run_db):
+    topic = f"Topic {uuid.uuid4().hex}"
+    first = _question("Pick one?", ["a", "b"], "a")
+    second = _question("Pick one?", ["c", "d"], "d")
+
+    async def scenario(db):
+        normalized = await normalize_results_questions(db, [
+            {"topic": topic, "difficulty": "easy", "questions": [first, second], "user_answers": ["b", "d"]},
+            {"topic": topic, "difficulty": "easy", "questions": [second], "user_answers": ["c"]},
+        ])
+        hydrated = [
+            await hydrate_result(db, {"question_ids": question_ids, "answer_indices": answer_indices})
+            for question_ids, answer_indices in normalized
+        ]
+        stored = await db.questions.count_documents({"topic": topic})
+        return normalized, hydrated, stored
+
+    normalized, hydrated, stored = run_db(scenario)
+    (first_ids, _), (second_ids, _) = normalized
+    assert first_ids[0] != first_ids[1]
+    # The same question in another result references the stored copy
+    assert second_ids == [first_ids[1]]
+    assert stored == 2
+    assert hydrated[0]["questions"] == [first, second]
+    assert hydrated[0]["user_answers"] == ["b", "d"]
+    assert hydrated[1]["questions"] == [second]
+    assert hydrated[1]["user_answers"] == ["c"]
@@ -0,0 +1,98 @@
+from bson import ObjectId
+
+from utils.result_store import idempotency_cache
+from database import get_db
+from archive import ROLLUP_COLLECTION
+from models.schemas import RESULT_BATCH_MAX_SIZE
+from routers.results import IDEMPOTENCY_KEY_MAX_LENGTH, BATCH_IDEMPOTENCY_KEY_MAX_LENGTH
+
+def _result(user_id, score=1):
+    return {
+        "user_id": user_id,
+        "score": score,
+        "total_questions": 2,
+        "questions": [
+            {"question": "Colour of the sky?", "options": ["blue", "green"], "answer": "blue"},
+            {"question": "Colour of grass?", "options": ["blue", "green"], "answer": "green"},
+        ],
+        "user_answers": ["blue", "blue"],
+        "topic": "Colours",
+        "difficulty": "easy",
+        "time_taken": 30,
+        "explanations": [{"questionIndex": 1, "explanation": "Grass is green."}],
+    }
+
+def test_idempotent_submission_is_written_once(run_app, register):
+    async def scenario(client):
+        user_id, headers, _ = await register(client)
+        headers = {**headers, "Idempotency-Key": "submit-1"}
+        first = await client.post("/api/results", headers=headers, json=_result(user_id))
+        cached = await client.post("/api/results", headers=headers, json=_result(user_id))
+        # Without the response cache the retry collides on the unique key and replays the stored result
+        idempotency_cache.clear()
+        stored = await client.post("/api/results", headers=headers, json=_result(user_id))
+        count = await (await get_db()).results.count_documents({"user_id": ObjectId(user_id)})
+        return first, cached, stored, count
+
+    first, cached, stored, count = run_app(scenario)
+    assert first.status_code == cached.status_code == stored.status_code == 200
+    result_id = first.json()["result"]["id"]
+    assert cached.json()["result"]["id"] == result_id
+    assert stored.json()["result"]["id"] == result_id
+    assert count == 1
+
+def test_batch_reports_failed_items_and_saves_the_rest(run_app, register):
+    async def scenario(client):
+        user_id, headers, _ = await register(client)
+        headers = {**headers, "Idempotency-Key": "offline-batch"}
+        batch = {"results": [_result(user_id), _result("not-an-object-id"), _result(user_id, score=2)]}
+        first = await client.post("/api/results/batch", headers=headers, json=batch)
+        replay = await client.post("/api/results/batch", headers=headers, json=batch)
+        count = await (await get_db()).results.count_documents({"user_id": ObjectId(user_id)})
+        return first.json(), replay.json(), count
+
+    first, replay, count = run_app(scenario)
+    assert first["success"] is False
+    assert [status["success"] for status in first["results"]] == [True, False, True]
+    assert first["results"][1]["error"] == "Invalid user ID format"
+    # Retrying the batch writes nothing new and returns the saved items
+    assert [status.get("replayed", False) for status in replay["results"]] == [True, False, True]
+    assert replay["results"][0]["result"]["id"] == first["results"][0]["result"]["id"]
+    assert replay["results"][2]["result"]["id"] == first["results"][2]["result"]["id"]
+    assert count == 2
+
+def test_topic_stats_include_archived_rollups(run_app, register):
+    async def scenario(client):
+        user_id, headers, _ = await register(client)
+        await client.post("/api/results", headers=headers, json=_result(user_id))
+        await (await get_db())[ROLLUP_COLLECTION].insert_many([
+            {"user_id": ObjectId(user_id), "topic": "Colours", "difficulty": "easy", "count": 3, "total_score": 6, "total_questions": 6, "total_time_taken": 90},
+            {"user_id": ObjectId(user_id), "topic": "Shapes", "difficulty": "hard", "count": 2, "total_score": 1, "total_questions": 4, "total_time_taken": 60},
+        ])
+        analytics = await client.get(f"/api/results/analytics/{user_id}", headers=headers)
+        stats = await client.get(f"/db/users/{user_id}/stats", headers=headers)
+        by_topic = await client.get("/api/results/topic/Colours", headers=headers)
+        return analytics.json()["analytics"], stats.json()["stats"], by_topic.json()
+
+    analytics, stats, by_topic = run_app(scenario)
+    for summary in (analytics, stats):
+        # Per-topic numbers add up to the totals once results are archived
+        assert sum(s["count"] for s in summary["topic_stats"].values()) == summary["total_assessments"] == 6
+        assert sum(s["total_questions"] for s in summary["topic_stats"].values()) == summary["total_questions"] == 12
+        assert summary["topic_stats"]["Colours"]["count"] == 4
+    assert len(by_topic["results"]) == 1
+    assert by_topic["topic_stats"] == {"Colours": {"count": 4, "total_score": 7, "total_questions": 8, "average_score": 1.75}}
+
+def test_batch_idempotency_key_leaves_room_for_item_suffix(run_app, register):
+    async def scenario(client):
+        user_id, headers, _ = await register(client)
+        batch = {"results": [_result(user_id)]}
+        longest = await client.post("/api/results/batch", headers={**headers, "Idempotency-Key": "k" * BATCH_IDEMPOTENCY_KEY_MAX_LENGTH}, json=batch)
+        too_long = await client.post("/api/results/batch", headers={**headers, "Idempotency-Key": "k" * (BATCH_IDEMPOTENCY_KEY_MAX_LENGTH + 1)}, json=batch)
+        return longest, too_long
+
+    longest, too_long = run_app(scenario)
+    assert longest.status_code == 200
+    assert too_long.status_code == 422
+    # The last item's stored key still fits the single-result limit
+    assert len("k" * BATCH_IDEMPOTENCY_KEY_MAX_LENGTH + f":{RESULT_BATCH_MAX_SIZE - 1}") == IDEMPOTENCY_KEY_MAX_LENGTH
@@ -0,0 +1,22 @@
+from utils.user_store import get_user_profile, list_face_descriptors, side_fields_migrated
+
+def test_legacy_embedded_face_descriptor_is_reported_before_migration(run_db):
+    descriptor = [0.25] * 128
+
+    async def scenario(db):
+        # A user written before the side collections existed: no has_face_descriptor flag
+        legacy = await db.users.insert_one({"email": "legacy-face@example.com", "name": "Legacy", "face_descriptor": descriptor})
+        plain = await db.users.insert_one({"email": "legacy-plain@example.com", "name": "Plain"})
+        return (
+            await side_fields_migrated(db),
+            await get_user_profile(db, str(legacy.inserted_id)),
+            await get_user_profile(db, str(plain.inserted_id)),
+            dict(await list_face_descriptors(db)).get(legacy.inserted_id)
+        )
+
+    migrated, legacy, plain, listed = run_db(scenario)
+    assert migrated is False
+    assert legacy["has_face_descriptor"] is True
+    assert "face_descriptor" not in legacy
+    assert plain["has_face_descriptor"] is False
+    assert listed == descriptor
@@ -0,0 +1,214 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+from archive import ARCHIVE_COLLECTION
+
+REPORT_CHUNK_SIZE = 50000
+
+# Time-taken distribution bucket edges in seconds; the last bucket is open-ended
+TIME_BUCKET_EDGES = np.array([0, 60, 120, 300, 600, 900, 1200, 1800, 2700, 3600, 5400, 7200], dtype=np.int64)
+
+_EPOCH = datetime(1970, 1, 1)
+
+class _Categories:
+    """Maps categorical values to dense integer codes"""
+
+    def __init__(self):
+        self.codes: Dict[Any, int] = {}
+        self.values: List[Any] = []
+
+    def code(self, value: Any) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+def _grow(array: np.ndarray, size: int) -> np.ndarray:
+    return array if len(array) >= size else np.pad(array, (0, size - len(array)))
+
+class ColumnarReport:
+    """Institution-wide result report built from columnar chunks
+
+    Each chunk of result summaries is turned into NumPy columns (a categorical
+    code per topic/difficulty pair, percentage, time taken, period) and folded
+    into running aggregates with bincount, so memory is bounded by the chunk
+    size and the number of groups rather than the number of results.
+    """
+
+    def __init__(self, pass_mark: float = 60.0, period: str = "week"):
+        self.pass_mark = pass_mark
+        self.period = period
+        self.groups = _Categories()
+        self.attempts = np.zeros(0, dtype=np.int64)
+        self.percentage_sum = np.zeros(0, dtype=np.float64)
+        self.passes = np.zeros(0, dtype=np.int64)
+        self.time_sum = np.zeros(0, dtype=np.float64)
+        self.time_count = np.zeros(0, dtype=np.int64)
+        self.time_histogram = np.zeros(len(TIME_BUCKET_EDGES), dtype=np.int64)
+        self.trend: Dict[int, np.ndarray] = {}
+
+    def add_rows(self, rows: List[Dict[str, Any]]) -> None:
+        """Convert a chunk of projected result rows into columns and fold it in"""
+        if not rows:
+            return
+        n = len(rows)
+        group = np.fromiter((self.groups.code((r["topic"], r["difficulty"])) for r in rows), dtype=np.int64, count=n)
+        percentage = np.fromiter((r["percentage"] for r in rows), dtype=np.float64, count=n)
+        time_taken = np.fromiter((r["time_taken"] for r in rows), dtype=np.int64, count=n)
+        date_ms = np.fromiter((r["date_ms"] for r in rows), dtype=np.int64, count=n)
+        self.add_columns(group, percentage, time_taken, date_ms)
+
+    def add_columns(self, group: np.ndarray, percentage: np.ndarray, time_taken: np.ndarray, date_ms: np.ndarray) -> None:
+        size = len(self.groups.values)
+        self.attempts = _grow(self.attempts, size)
+        self.percentage_sum = _grow(self.percentage_sum, size)
+        self.passes = _grow(self.passes, size)
+        self.time_sum = _grow(self.time_sum, size)
+        self.time_count = _grow(self.time_count, size)
+
+        passed = percentage >= self.pass_mark
+        self.attempts += np.bincount(group, minlength=size)
+        self.percentage_sum += np.bincount(group, weights=percentage, minlength=size)
+        self.passes += np.bincount(group, weights=passed, minlength=size).astype(np.int64)
+
+        timed = time_taken >= 0
+        self.time_sum += np.bincount(group[timed], weights=time_taken[timed], minlength=size)
+        self.time_count += np.bincount(group[timed], minlength=size)
+        bucket = np.searchsorted(TIME_BUCKET_EDGES, time_taken[timed], side="right") - 1
+        self.time_histogram += np.bincount(bucket, minlength=len(TIME_BUCKET_EDGES))
+
+        # Trend periods: days since epoch, or Monday-aligned weeks
+        day = date_ms // 86_400_000
+        periods = (day + 3) // 7 if self.period == "week" else day
+        unique, inverse = np.unique(periods, return_inverse=True)
+        counts = np.bincount(inverse)
+        sums = np.bincount(inverse, weights=percentage)
+        pass_counts = np.bincount(inverse, weights=passed)
+        for p, c, s, k in zip(unique.tolist(), counts, sums, pass_counts):
+            totals = self.trend.get(p)
+            if totals is None:
+                totals = self.trend[p] = np.zeros(3, dtype=np.float64)
+            totals += (c, s, k)
+
+    def _period_start(self, period: int) -> str:
+        day = period * 7 - 3 if self.period == "week" else period
+        return (_EPOCH + timedelta(days=day)).date().isoformat()
+
+    def _time_quantile(self, q: float) -> Optional[int]:
+        total = self.time_histogram.sum()
+        if total == 0:
+            return None
+        index = int(np.searchsorted(np.cumsum(self.time_histogram), q * total))
+        return int(TIME_BUCKET_EDGES[min(index, len(TIME_BUCKET_EDGES) - 1)])
+
+    def to_dict(self) -> Dict[str, Any]:
+        attempts = np.maximum(self.attempts, 1)
+        timed = np.maximum(self.time_count, 1)
+        mean_percentage = self.percentage_sum / attempts
+        pass_rate = self.passes / attempts * 100
+        mean_time = np.where(self.time_count > 0, self.time_sum / timed, np.nan)
+
+        groups = [
+            {
+                "topic": topic,
+                "difficulty": difficulty,
+                "attempts": int(self.attempts[i]),
+                "mean_percentage": round(float(mean_percentage[i]), 2),
+                "pass_rate": round(float(pass_rate[i]), 2),
+                "mean_time_taken": None if np.isnan(mean_time[i]) else round(float(mean_time[i]), 1)
+            }
+            for i, (topic, difficulty) in enumerate(self.groups.values)
+        ]
+
+        # Roll pairs up to topics with one more grouped reduction
+        topics = _Categories()
+        topic_codes = np.fromiter((topics.code(topic) for topic, _ in self.groups.values), dtype=np.int64, count=len(self.groups.values))
+        topic_attempts = np.bincount(topic_codes, weights=self.attempts, minlength=len(topics.values))
+        topic_sum = np.bincount(topic_codes, weights=self.percentage_sum, minlength=len(topics.values))
+        topic_passes = np.bincount(topic_codes, weights=self.passes, minlength=len(topics.values))
+        topic_rows = [
+            {
+                "topic": topic,
+                "attempts": int(topic_attempts[i]),
+                "mean_percentage": round(float(topic_sum[i] / max(topic_attempts[i], 1)), 2),
+                "pass_rate": round(float(topic_passes[i] / max(topic_attempts[i], 1) * 100), 2)
+            }
+            for i, topic in enumerate(topics.values)
+        ]
+
+        total_attempts = int(self.attempts.sum())
+        return {
+            "total_attempts": total_attempts,
+            "mean_percentage": round(float(self.percentage_sum.sum() / max(total_attempts, 1)), 2),
+            "pass_rate": round(float(self.passes.sum() / max(total_attempts, 1) * 100), 2),
+            "pass_mark": self.pass_mark,
+            "groups": sorted(groups, key=lambda g: g["attempts"], reverse=True),
+            "topics": sorted(topic_rows, key=lambda t: t["attempts"], reverse=True),
+            "time_taken": {
+                "bucket_edges": TIME_BUCKET_EDGES.tolist(),
+                "counts": self.time_histogram.tolist(),
+                "p50": self._time_quantile(0.5),
+                "p90": self._time_quantile(0.9)
+            },
+            "trend": [
+                {
+                    "period_start": self._period_start(p),
+                    "attempts": int(t[0]),
+                    "mean_percentage": round(float(t[1] / t[0]), 2),
+                    "pass_rate": round(float(t[2] / t[0] * 100), 2)
+                }
+                for p, t in sorted(self.trend.items())
+            ]
+        }
+
+def _summary_pipeline(match: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Project each result down to the few scalar columns the report needs"""
+    return [
+        {"$match": match},
+        {"$project": {
+            "_id": 0,
+            "topic": 1,
+            "difficulty": 1,
+            "percentage": {"$ifNull": ["$percentage", {"$cond": [
+                {"$gt": ["$total_questions", 0]},
+                {"$multiply": [{"$divide": ["$score", "$total_questions"]}, 100]},
+                0
+            ]}]},
+            "time_taken": {"$ifNull": ["$time_taken", -1]},
+            "date_ms": {"$toLong": "$date"}
+        }}
+    ]
+
+async def build_institution_report(
+    db,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    pass_mark: float = 60.0,
+    period: str = "week",
+    include_archived: bool = True,
+    chunk_size: int = REPORT_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """Stream result summaries from Mongo into a columnar report"""
+    match: Dict[str, Any] = {}
+    if start or end:
+        match["date"] = {}
+        if start:
+            match["date"]["$gte"] = start
+        if end:
+            match["date"]["$lt"] = end
+
+    pipeline = _summary_pipeline(match)
+    if include_archived:
+        pipeline.append({"$unionWith": {"coll": ARCHIVE_COLLECTION, "pipeline": _summary_pipeline(match)}})
+
+    report = ColumnarReport(pass_mark=pass_mark, period=period)
+    cursor = db.results.aggregate(pipeline, allowDiskUse=True, batchSize=chunk_size)
+    while True:
+        rows = await cursor.to_list(length=chunk_size)
+        if not rows:
+            break
+        report.add_rows(rows)
+
+    return report.to_dict()
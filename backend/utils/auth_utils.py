@@ -1,14 +1,23 @@
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
+import hashlib
 import os
+import time
 import numpy as np
 from typing import Optional, Dict, Any
 
+from utils.cache import LRUCache
+
 # JWT settings
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Recently verified tokens keyed by SHA-256 digest; entries never outlive the token's exp
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_MAX_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_MAX_TTL_SECONDS", "300"))
+token_cache = LRUCache(max_size=TOKEN_CACHE_SIZE)
+
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
     to_encode = data.copy()
@@ -22,12 +31,24 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
     return encoded_jwt
 
 def verify_token(token: str) -> Dict[str, Any]:
-    """Verify and decode JWT token"""
+    """Verify and decode JWT token, reusing claims of tokens verified recently"""
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        # Callers get their own copy, so changing it cannot alter later verifications
+        return dict(payload)
+    
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
         raise ValueError("Invalid token")
+    
+    ttl = TOKEN_CACHE_MAX_TTL_SECONDS
+    if payload.get("exp") is not None:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        token_cache.set(key, dict(payload), ttl=ttl)
+    return payload
 
 def euclidean_distance(descriptor1: list, descriptor2: list) -> float:
     """Calculate Euclidean distance between two face descriptors"""
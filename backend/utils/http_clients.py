@@ -0,0 +1,118 @@
+import asyncio
+import os
+import re
+import time
+from typing import Any, Dict, Optional, Tuple
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Outbound pool settings, applied to each upstream host of every named client
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+
+# Used when a cached document's response carries no max-age
+DEFAULT_DOCUMENT_TTL_SECONDS = float(os.getenv("HTTP_DOCUMENT_TTL_SECONDS", "3600"))
+
+try:
+    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+except ImportError:
+    h2 = None
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+class _PerHostTransport(httpx.AsyncBaseTransport):
+    """Routes each upstream host to its own connection pool
+
+    httpx applies ``Limits`` to a client's single pool, shared by every host it
+    talks to; one integration (Google uses three hosts) would otherwise let a
+    slow host take all of the connections.
+    """
+
+    def __init__(self, **options):
+        self._options = options
+        self._pools: Dict[Tuple[bytes, bytes, Optional[int]], httpx.AsyncHTTPTransport] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = (request.url.raw_scheme, request.url.raw_host, request.url.port)
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = httpx.AsyncHTTPTransport(**self._options)
+        return await pool.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        for pool in self._pools.values():
+            await pool.aclose()
+        self._pools = {}
+
+class HttpClientRegistry:
+    """App-lifetime pooled httpx clients, one per named integration
+
+    Clients are created on first use and closed by the FastAPI lifespan, so
+    connections (and TLS sessions) to the same host are reused across requests.
+    JSON documents such as OpenID discovery and JWKS are cached for the
+    max-age their server sends.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._documents: Dict[str, Tuple[float, Any]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.stats = {"document_hits": 0, "document_fetches": 0}
+
+    def get(self, name: str, **overrides) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            http2 = overrides.pop("http2", HTTP2_ENABLED and h2 is not None)
+            limits = overrides.pop("limits", httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS
+            ))
+            options = {
+                "transport": _PerHostTransport(http2=http2, limits=limits),
+                "timeout": httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+                **overrides
+            }
+            client = self._clients[name] = httpx.AsyncClient(**options)
+            print(f"🌐 [HTTP] Created pooled client '{name}' (http2={http2})")
+        return client
+
+    async def get_json_document(self, name: str, url: str) -> Any:
+        """GET a JSON document through a named client, cached for its Cache-Control max-age"""
+        cached = self._documents.get(url)
+        if cached and cached[0] > time.monotonic():
+            self.stats["document_hits"] += 1
+            return cached[1]
+
+        # One fetch per URL at a time; concurrent callers reuse its result
+        lock = self._locks.setdefault(url, asyncio.Lock())
+        async with lock:
+            cached = self._documents.get(url)
+            if cached and cached[0] > time.monotonic():
+                self.stats["document_hits"] += 1
+                return cached[1]
+            response = await self.get(name).get(url)
+            response.raise_for_status()
+            document = response.json()
+            match = _MAX_AGE.search(response.headers.get("cache-control", ""))
+            ttl = float(match.group(1)) if match else DEFAULT_DOCUMENT_TTL_SECONDS
+            self._documents[url] = (time.monotonic() + ttl, document)
+            self.stats["document_fetches"] += 1
+            return document
+
+    async def aclose(self) -> None:
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients = {}
+        self._documents = {}
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"clients": sorted(self._clients), "cached_documents": len(self._documents), **self.stats}
+
+http_clients = HttpClientRegistry()
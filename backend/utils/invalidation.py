@@ -0,0 +1,109 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+from dotenv import load_dotenv
+
+from utils.leases import WORKER_ID
+
+load_dotenv()
+
+# "none" keeps invalidations inside the worker; "mongo" broadcasts them to every worker and host
+CACHE_INVALIDATION_BACKEND = os.getenv("CACHE_INVALIDATION_BACKEND", "none").lower()
+CACHE_INVALIDATION_POLL_MS = int(os.getenv("CACHE_INVALIDATION_POLL_MS", "500"))
+
+CACHE_INVALIDATIONS_COLLECTION = "cache_invalidations"
+# Invalidations are only interesting to workers that were running when they were published
+INVALIDATION_RETENTION_SECONDS = 600
+# Re-read this far back on every poll to tolerate clock skew between hosts; already applied ids are skipped
+INVALIDATION_OVERLAP_SECONDS = 5
+
+class InvalidationBus:
+    """Broadcasts cache invalidations between workers through a shared collection
+
+    Each cache registers a handler under a name. ``publish`` is synchronous, so
+    the existing invalidate helpers keep their signatures: the message is
+    buffered and written by the next ``sync``, which also applies messages
+    published by other workers. A peer's cache is therefore stale for at most
+    one poll interval after a write.
+    """
+
+    def __init__(self, backend: str = CACHE_INVALIDATION_BACKEND):
+        self.enabled = backend == "mongo"
+        self.worker_id = WORKER_ID
+        self._handlers: Dict[str, Callable[[Any], Any]] = {}
+        self._outbox: List[Dict[str, Any]] = []
+        self._since = datetime.utcnow()
+        self._applied: Dict[Any, datetime] = {}
+        self.stats = {"published": 0, "received": 0, "failed": 0}
+
+    def register(self, cache: str, handler: Callable[[Any], Any]) -> None:
+        """Handler applied to invalidations of ``cache`` published by other workers"""
+        self._handlers[cache] = handler
+
+    def publish(self, cache: str, key: Any) -> None:
+        if not self.enabled:
+            return
+        self._outbox.append({"cache": cache, "key": key})
+        self.stats["published"] += 1
+
+    async def sync(self, db) -> int:
+        """Write buffered invalidations and apply everyone else's; returns how many were applied"""
+        collection = db[CACHE_INVALIDATIONS_COLLECTION]
+        now = datetime.utcnow()
+        if self._outbox:
+            outbox, self._outbox = self._outbox, []
+            expires_at = now + timedelta(seconds=INVALIDATION_RETENTION_SECONDS)
+            try:
+                await collection.insert_many(
+                    [{**message, "origin": self.worker_id, "created_at": now, "expires_at": expires_at} for message in outbox],
+                    ordered=False
+                )
+            except Exception:
+                self._outbox = outbox + self._outbox
+                raise
+
+        since = self._since - timedelta(seconds=INVALIDATION_OVERLAP_SECONDS)
+        applied = 0
+        async for message in collection.find({"created_at": {"$gte": since}, "origin": {"$ne": self.worker_id}}):
+            if message["_id"] in self._applied:
+                continue
+            self._applied[message["_id"]] = message["created_at"]
+            handler = self._handlers.get(message["cache"])
+            if handler is None:
+                continue
+            try:
+                handler(message["key"])
+                applied += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"❌ [CACHE] Applying invalidation of {message['cache']} failed: {e}")
+        self.stats["received"] += applied
+
+        self._since = now
+        self._applied = {key: created for key, created in self._applied.items() if created >= since}
+        return applied
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "backend": "mongo" if self.enabled else "none",
+            "worker_id": self.worker_id,
+            "pending": len(self._outbox),
+            "caches": sorted(self._handlers),
+            **self.stats
+        }
+
+invalidation_bus = InvalidationBus()
+
+async def run_invalidation_sync_loop() -> None:
+    """Exchange cache invalidations with the other workers"""
+    if not invalidation_bus.enabled:
+        return
+    from database import get_db
+    print(f"📣 [CACHE] Cross-worker invalidation enabled ({invalidation_bus.worker_id})")
+    while True:
+        await asyncio.sleep(CACHE_INVALIDATION_POLL_MS / 1000)
+        try:
+            await invalidation_bus.sync(await get_db())
+        except Exception as e:
+            print(f"❌ [CACHE] Invalidation sync failed: {e}")
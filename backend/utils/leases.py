@@ -0,0 +1,31 @@
+import os
+import secrets
+import socket
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+# Identifies this worker process across hosts and restarts
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+
+LEASES_COLLECTION = "leases"
+
+async def acquire_lease(db, name: str, ttl_seconds: float, owner: str = WORKER_ID) -> bool:
+    """Take or renew a named lease; False while another worker holds an unexpired one
+
+    Singleton background jobs run only in the worker holding their lease, so they
+    do not run once per worker; if that worker dies, another takes over once the
+    lease expires.
+    """
+    now = datetime.utcnow()
+    try:
+        await db[LEASES_COLLECTION].find_one_and_update(
+            {"_id": name, "$or": [{"owner": owner}, {"expires_at": {"$lte": now}}]},
+            {"$set": {"owner": owner, "acquired_at": now, "expires_at": now + timedelta(seconds=ttl_seconds)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return True
+    except DuplicateKeyError:
+        # The lease exists and belongs to someone else, so the upsert collided on _id
+        return False
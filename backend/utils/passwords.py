@@ -0,0 +1,108 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+import bcrypt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# bcrypt cost factor for new hashes; existing hashes keep their own cost until rehashed on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Threads running bcrypt at once; bcrypt releases the GIL, so this is real CPU parallelism
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Hash operations allowed to wait for a thread before new ones are rejected
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hash operations are already waiting for the pool"""
+
+def hash_password_sync(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+def verify_password_sync(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+def hash_rounds(hashed: str) -> Optional[int]:
+    """Cost factor encoded in a bcrypt hash ($2b$12$...)"""
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+def needs_rehash(hashed: str) -> bool:
+    return hash_rounds(hashed) != BCRYPT_ROUNDS
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated bounded thread pool so hashing never blocks the event loop
+
+    At most ``workers`` operations run at once and at most ``max_pending`` more
+    may queue for a thread; beyond that callers get PasswordHasherBusy instead
+    of piling up behind a login storm. Queue and run times are tracked for
+    /api/health.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._in_flight = 0
+        self.stats = {"completed": 0, "rejected": 0, "queue_ms_total": 0.0, "queue_ms_max": 0.0, "run_ms_total": 0.0}
+
+    async def _run(self, fn, *args) -> Any:
+        if self._in_flight >= self.workers + self.max_pending:
+            self.stats["rejected"] += 1
+            raise PasswordHasherBusy("Too many password operations in progress")
+
+        submitted = time.perf_counter()
+        started = None
+
+        def timed():
+            nonlocal started
+            started = time.perf_counter()
+            return fn(*args)
+
+        self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self._in_flight -= 1
+            if started is not None:
+                queue_ms = (started - submitted) * 1000
+                self.stats["completed"] += 1
+                self.stats["queue_ms_total"] += queue_ms
+                self.stats["queue_ms_max"] = max(self.stats["queue_ms_max"], queue_ms)
+                self.stats["run_ms_total"] += (time.perf_counter() - started) * 1000
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password_sync, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(verify_password_sync, password, hashed)
+
+    def metrics(self) -> Dict[str, Any]:
+        completed = self.stats["completed"]
+        return {
+            "workers": self.workers,
+            "in_flight": self._in_flight,
+            "rounds": BCRYPT_ROUNDS,
+            "completed": completed,
+            "rejected": self.stats["rejected"],
+            "avg_queue_ms": round(self.stats["queue_ms_total"] / completed, 2) if completed else 0.0,
+            "max_queue_ms": round(self.stats["queue_ms_max"], 2),
+            "avg_run_ms": round(self.stats["run_ms_total"] / completed, 2) if completed else 0.0
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+password_hasher = PasswordHasher()
+
+async def hash_password(password: str) -> str:
+    """Hash a password off the event loop"""
+    return await password_hasher.hash(password)
+
+async def verify_password(password: str, hashed: str) -> bool:
+    """Verify a password off the event loop"""
+    return await password_hasher.verify(password, hashed)
@@ -0,0 +1,181 @@
+import ipaddress
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from pymongo import ReturnDocument
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Login attempts per client IP and per account email: a burst allowance refilled over a window.
+# A whole classroom behind one NAT shares an IP, so size LOGIN_IP_LIMIT for the largest class.
+LOGIN_IP_LIMIT = int(os.getenv("LOGIN_IP_LIMIT", "100"))
+LOGIN_EMAIL_LIMIT = int(os.getenv("LOGIN_EMAIL_LIMIT", "5"))
+LOGIN_WINDOW_SECONDS = float(os.getenv("LOGIN_WINDOW_SECONDS", "60"))
+# Registrations are limited separately, so sign-ups do not use up the login allowance
+REGISTER_IP_LIMIT = int(os.getenv("REGISTER_IP_LIMIT", "50"))
+REGISTER_EMAIL_LIMIT = int(os.getenv("REGISTER_EMAIL_LIMIT", "5"))
+LOGIN_LIMITER_MAX_KEYS = int(os.getenv("LOGIN_LIMITER_MAX_KEYS", "100000"))
+# "memory" keeps limits per worker; "mongo" also enforces them across workers
+LOGIN_LIMITER_BACKEND = os.getenv("LOGIN_LIMITER_BACKEND", "memory").lower()
+
+# Reverse proxies / load balancers (IPs or CIDRs) whose X-Forwarded-For is believed
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(proxy.strip(), strict=False)
+    for proxy in os.getenv("TRUSTED_PROXIES", "").split(",") if proxy.strip()
+]
+
+LOGIN_ATTEMPTS_COLLECTION = "login_attempts"
+
+def _trusted(address: str, proxies: List[Any]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in proxies)
+
+def client_ip(peer: Optional[str], forwarded_for: Optional[str], proxies: Optional[List[Any]] = None) -> str:
+    """Address of the client behind any trusted proxies
+
+    X-Forwarded-For is read right to left, skipping proxies we trust; the first
+    other address is the client. Entries left of it could be forged by the
+    client, and the header is ignored entirely unless the peer is trusted.
+    """
+    proxies = TRUSTED_PROXIES if proxies is None else proxies
+    address = peer or "unknown"
+    if not forwarded_for or not _trusted(address, proxies):
+        return address
+    for hop in reversed([hop.strip() for hop in forwarded_for.split(",") if hop.strip()]):
+        address = hop
+        if not _trusted(hop, proxies):
+            break
+    return address
+
+class TokenBucketLimiter:
+    """Per-key token buckets held in a bounded LRU
+
+    Each key may spend ``capacity`` attempts at once and regains them at
+    ``capacity / window`` per second. Memory is capped at ``max_keys`` buckets;
+    evicting the least recently used one only forgets a bucket that has been
+    idle the longest and is therefore the closest to full anyway.
+    """
+
+    def __init__(self, capacity: int, window_seconds: float, max_keys: int = LOGIN_LIMITER_MAX_KEYS):
+        self.capacity = capacity
+        self.refill_rate = capacity / window_seconds
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, Tuple[float, float]]" = OrderedDict()
+        self.rejected = 0
+
+    def take(self, key: Hashable) -> float:
+        """Spend one token; returns 0 when allowed, otherwise seconds until the next token"""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (float(self.capacity), now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.refill_rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            self.rejected += 1
+            return (1 - tokens) / self.refill_rate
+
+        self._buckets[key] = (tokens - 1, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return 0.0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+class SharedWindowCounter:
+    """Sliding-window counter kept in MongoDB so every worker sees the same totals
+
+    Counts live in fixed windows; the estimate weights the previous window by how
+    much of it still overlaps the sliding window. Documents expire via a TTL index.
+    """
+
+    def __init__(self, limit: int, window_seconds: float):
+        self.limit = limit
+        self.window = window_seconds
+        self.rejected = 0
+
+    async def take(self, db, key: str) -> float:
+        now = time.time()
+        window = int(now // self.window)
+        elapsed = now - window * self.window
+        attempts = db[LOGIN_ATTEMPTS_COLLECTION]
+
+        current = await attempts.find_one_and_update(
+            {"_id": f"{key}:{window}"},
+            {"$inc": {"count": 1}, "$setOnInsert": {"expires_at": datetime.utcfromtimestamp((window + 2) * self.window)}},
+            upsert=True,
+            projection={"count": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        previous = await attempts.find_one({"_id": f"{key}:{window - 1}"}, {"count": 1})
+        estimate = current["count"] + (previous["count"] if previous else 0) * (1 - elapsed / self.window)
+        if estimate > self.limit:
+            self.rejected += 1
+            return self.window - elapsed
+        return 0.0
+
+class LoginThrottled(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__("Too many login attempts")
+        self.retry_after = retry_after
+
+class LoginThrottle:
+    """Limits attempts per IP and per email before any user lookup or password hashing
+
+    ``action`` namespaces the shared counters, so logins and registrations keep
+    separate buckets.
+    """
+
+    def __init__(
+        self,
+        action: str = "login",
+        ip_limit: int = LOGIN_IP_LIMIT,
+        email_limit: int = LOGIN_EMAIL_LIMIT,
+        backend: str = LOGIN_LIMITER_BACKEND
+    ):
+        self.action = action
+        self.by_ip = TokenBucketLimiter(ip_limit, LOGIN_WINDOW_SECONDS)
+        self.by_email = TokenBucketLimiter(email_limit, LOGIN_WINDOW_SECONDS)
+        self.shared = None
+        if backend == "mongo":
+            self.shared = (
+                SharedWindowCounter(ip_limit, LOGIN_WINDOW_SECONDS),
+                SharedWindowCounter(email_limit, LOGIN_WINDOW_SECONDS)
+            )
+
+    async def check(self, ip: str, email: Optional[str] = None, db=None) -> None:
+        """Raise LoginThrottled when either the IP or the email is over its limit"""
+        email = email.strip().lower() if email else None
+        # Local buckets first: a flood is rejected without leaving the process
+        retry_after = self.by_ip.take(ip)
+        if not retry_after and email:
+            retry_after = self.by_email.take(email)
+        if not retry_after and self.shared and db is not None:
+            ip_counter, email_counter = self.shared
+            retry_after = await ip_counter.take(db, f"{self.action}:ip:{ip}")
+            if not retry_after and email:
+                retry_after = await email_counter.take(db, f"{self.action}:email:{email}")
+        if retry_after:
+            raise LoginThrottled(retry_after)
+
+    def metrics(self) -> Dict[str, Any]:
+        metrics = {
+            "backend": "mongo" if self.shared else "memory",
+            "tracked_ips": len(self.by_ip),
+            "tracked_emails": len(self.by_email),
+            "rejected_ip": self.by_ip.rejected,
+            "rejected_email": self.by_email.rejected
+        }
+        if self.shared:
+            metrics["rejected_shared"] = sum(counter.rejected for counter in self.shared)
+        return metrics
+
+login_throttle = LoginThrottle("login")
+register_throttle = LoginThrottle("register", REGISTER_IP_LIMIT, REGISTER_EMAIL_LIMIT)
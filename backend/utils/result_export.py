@@ -0,0 +1,135 @@
+import csv
+import io
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from archive import ARCHIVE_COLLECTION
+
+# Parquet export needs pyarrow, which is optional
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+EXPORT_COLUMNS = [
+    "id", "date", "topic", "difficulty", "score", "total_questions",
+    "percentage", "correct_answers", "incorrect_answers", "time_taken"
+]
+EXPORT_BATCH_SIZE = 1000
+
+def _export_row(result: Dict[str, Any], columns: List[str]) -> Dict[str, Any]:
+    total = result.get("total_questions") or 0
+    values = {
+        "id": str(result["_id"]),
+        "date": result.get("date"),
+        "topic": result.get("topic"),
+        "difficulty": result.get("difficulty"),
+        "score": result.get("score"),
+        "total_questions": total,
+        "percentage": result.get("percentage", (result.get("score", 0) / total) * 100 if total else 0),
+        "correct_answers": result.get("correct_answers", result.get("score")),
+        "incorrect_answers": result.get("incorrect_answers", total - result.get("score", 0)),
+        "time_taken": result.get("time_taken")
+    }
+    return {column: values[column] for column in columns}
+
+async def iter_user_results(
+    db,
+    user_id,
+    columns: List[str],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield a user's results oldest first, archived ones before hot ones, one cursor batch at a time"""
+    query: Dict[str, Any] = {"user_id": user_id}
+    if start or end:
+        query["date"] = {}
+        if start:
+            query["date"]["$gte"] = start
+        if end:
+            query["date"]["$lt"] = end
+
+    projection = {"_id": 1, "date": 1, "topic": 1, "difficulty": 1, "score": 1, "total_questions": 1,
+                  "percentage": 1, "correct_answers": 1, "incorrect_answers": 1, "time_taken": 1}
+    for collection in (ARCHIVE_COLLECTION, "results"):
+        cursor = db[collection].find(query, projection).sort("date", 1).batch_size(EXPORT_BATCH_SIZE)
+        async for result in cursor:
+            yield _export_row(result, columns)
+
+async def stream_csv(rows: AsyncIterator[Dict[str, Any]], columns: List[str]) -> AsyncIterator[bytes]:
+    """Encode rows as CSV, flushing roughly every batch"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    count = 0
+    async for row in rows:
+        if isinstance(row.get("date"), datetime):
+            row["date"] = row["date"].isoformat()
+        writer.writerow(row)
+        count += 1
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue().encode("utf-8")
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only stream that hands written bytes back to the caller while tracking position"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def _parquet_schema(columns: List[str]):
+    types = {
+        "id": pa.string(),
+        "date": pa.timestamp("ms"),
+        "topic": pa.string(),
+        "difficulty": pa.string(),
+        "score": pa.int32(),
+        "total_questions": pa.int32(),
+        "percentage": pa.float64(),
+        "correct_answers": pa.int32(),
+        "incorrect_answers": pa.int32(),
+        "time_taken": pa.int32()
+    }
+    return pa.schema([(column, types[column]) for column in columns])
+
+async def stream_parquet(rows: AsyncIterator[Dict[str, Any]], columns: List[str]) -> AsyncIterator[bytes]:
+    """Encode rows as Parquet, writing and flushing one row group per batch"""
+    schema = _parquet_schema(columns)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    batch: Dict[str, List[Any]] = {column: [] for column in columns}
+    count = 0
+    async for row in rows:
+        for column in columns:
+            batch[column].append(row[column])
+        count += 1
+        if count % EXPORT_BATCH_SIZE == 0:
+            writer.write_table(pa.table(batch, schema=schema))
+            batch = {column: [] for column in columns}
+            yield sink.drain()
+    if count % EXPORT_BATCH_SIZE:
+        writer.write_table(pa.table(batch, schema=schema))
+    writer.close()
+    yield sink.drain()
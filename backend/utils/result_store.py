@@ -0,0 +1,231 @@
+import os
+from typing import List, Optional, Dict, Any, Tuple
+from pymongo import UpdateOne
+
+from utils.cache import LRUCache
+from utils.invalidation import invalidation_bus
+
+# Results reference questions in db.questions by id and record each answer as an
+# index into that question's options (-1 when unanswered). An answer that is not
+# one of the options is kept as its raw text instead of an index.
+UNANSWERED = -1
+
+# Placeholder explanations served while Gemini is unavailable carry this marker; they
+# are never stored, and stored ones are replaced once a real explanation arrives
+FALLBACK_EXPLANATION_MARKER = "The AI explanation service"
+
+def is_fallback_explanation(explanation: Dict[str, Any]) -> bool:
+    return bool(explanation.get("fallback")) or FALLBACK_EXPLANATION_MARKER in (explanation.get("explanation") or "")
+
+# Filter matching questions whose explanation may be (re)written
+EXPLANATION_REPLACEABLE = {"$or": [
+    {"explanation": {"$exists": False}},
+    {"explanation": {"$regex": FALLBACK_EXPLANATION_MARKER}}
+]}
+
+def question_key(topic: str, question: Dict[str, Any]) -> Tuple[str, str, Tuple[str, ...], str]:
+    """Identity of a stored question: generated questions often repeat a text with other options"""
+    return (
+        topic,
+        question.get("question", ""),
+        tuple(question.get("options", [])),
+        question.get("answer", question.get("correctAnswer", ""))
+    )
+
+def encode_answer(options: List[str], answer: Optional[str]) -> Any:
+    """Option index of an answer, UNANSWERED when empty, the raw text when it is not an option"""
+    if not answer:
+        return UNANSWERED
+    return options.index(answer) if answer in options else answer
+
+def decode_answer(options: List[str], index: Any) -> str:
+    if isinstance(index, str):
+        return index
+    return options[index] if isinstance(index, int) and 0 <= index < len(options) else ""
+
+# Serialized result views keyed by (view, result_id); each entry records its owner and ETag
+result_view_cache = LRUCache(max_size=int(os.getenv("RESULT_CACHE_SIZE", "2048")))
+
+# Recent create_result responses keyed by (user_id, Idempotency-Key), for replays without a database read
+idempotency_cache = LRUCache(
+    max_size=int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("IDEMPOTENCY_CACHE_TTL_SECONDS", "600"))
+)
+
+def _discard_result_views(result_id: Optional[str], user_id: Optional[str]) -> int:
+    return result_view_cache.discard_where(
+        lambda key, entry: key[1] == result_id or entry["user_id"] == user_id
+    )
+
+def invalidate_result_views(result_id: Optional[str] = None, user_id: Optional[str] = None) -> int:
+    """Drop cached views of one result or of every result owned by a user, here and in every other worker"""
+    invalidation_bus.publish("result_views", [result_id, user_id])
+    return _discard_result_views(result_id, user_id)
+
+invalidation_bus.register("result_views", lambda key: _discard_result_views(*key))
+
+async def normalize_results_questions(db, submissions: List[Dict[str, Any]]) -> List[Tuple[List[Any], List[Any]]]:
+    """Resolve the questions of many submissions to question ids and compact answer indices
+
+    Each submission is a dict with topic, difficulty, questions, user_answers and
+    optional explanations. Lookups, inserts and explanation writes are batched
+    across all submissions.
+    """
+    texts_by_topic: Dict[str, set] = {}
+    for sub in submissions:
+        topic_key = sub["topic"].strip()
+        texts_by_topic.setdefault(topic_key, set()).update(q.get("question", "") for q in sub["questions"])
+
+    # One batched lookup for every question already stored for these topics; the
+    # text narrows it down, options and answer must match as well
+    ids_by_key: Dict[Tuple[str, str, Tuple[str, ...], str], Any] = {}
+    if texts_by_topic:
+        existing = await db.questions.find(
+            {"$or": [{"topic": topic, "question": {"$in": list(texts)}} for topic, texts in texts_by_topic.items()]},
+            {"_id": 1, "topic": 1, "question": 1, "options": 1, "answer": 1}
+        ).to_list(None)
+        for q in existing:
+            ids_by_key.setdefault(question_key(q["topic"], q), q["_id"])
+
+    missing: Dict[Tuple[str, str, Tuple[str, ...], str], Dict[str, Any]] = {}
+    for sub in submissions:
+        topic_key = sub["topic"].strip()
+        for q in sub["questions"]:
+            key = question_key(topic_key, q)
+            if key in ids_by_key or key in missing:
+                continue
+            missing[key] = {
+                "topic": topic_key,
+                "difficulty": sub["difficulty"].strip(),
+                "question": key[1],
+                "answer": key[3],
+                "options": list(key[2])
+            }
+
+    if missing:
+        docs = list(missing.values())
+        inserted = await db.questions.insert_many(docs, ordered=False)
+        for key, inserted_id in zip(missing.keys(), inserted.inserted_ids):
+            ids_by_key[key] = inserted_id
+
+    normalized = []
+    updates = []
+    for sub in submissions:
+        topic_key = sub["topic"].strip()
+        questions = sub["questions"]
+        user_answers = sub.get("user_answers") or []
+        question_ids = [ids_by_key[question_key(topic_key, q)] for q in questions]
+
+        answer_indices = [
+            encode_answer(q.get("options", []), user_answers[i] if i < len(user_answers) else "")
+            for i, q in enumerate(questions)
+        ]
+
+        # Explanations belong to the question, so store each once on db.questions
+        for i, exp in enumerate(sub.get("explanations") or []):
+            index = exp.get("questionIndex", i)
+            text = exp.get("explanation")
+            if not text or is_fallback_explanation(exp) or not isinstance(index, int) or not 0 <= index < len(question_ids):
+                continue
+            updates.append(UpdateOne(
+                {"_id": question_ids[index], **EXPLANATION_REPLACEABLE},
+                {"$set": {"explanation": text}}
+            ))
+
+        normalized.append((question_ids, answer_indices))
+
+    if updates:
+        await db.questions.bulk_write(updates, ordered=False)
+
+    return normalized
+
+async def normalize_result_questions(
+    db,
+    topic: str,
+    difficulty: str,
+    questions: List[Dict[str, Any]],
+    user_answers: List[str],
+    explanations: Optional[List[Dict[str, Any]]] = None
+) -> Tuple[List[Any], List[Any]]:
+    """Resolve one submission's questions to question ids and compact answer indices"""
+    return (await normalize_results_questions(db, [{
+        "topic": topic,
+        "difficulty": difficulty,
+        "questions": questions,
+        "user_answers": user_answers,
+        "explanations": explanations
+    }]))[0]
+
+async def hydrate_results(db, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Expand normalized results back into embedded questions, answers and explanations"""
+    normalized = [r for r in results if "question_ids" in r]
+    if not normalized:
+        return results
+
+    # Single batched $in lookup across every referenced question
+    all_ids = list({qid for r in normalized for qid in r["question_ids"]})
+    docs = await db.questions.find({"_id": {"$in": all_ids}}).to_list(None)
+    by_id = {d["_id"]: d for d in docs}
+
+    hydrated = []
+    for result in results:
+        if "question_ids" not in result:
+            hydrated.append(result)
+            continue
+
+        questions = []
+        user_answers = []
+        explanations = []
+        indices = result.get("answer_indices", [])
+        for i, qid in enumerate(result["question_ids"]):
+            doc = by_id.get(qid, {})
+            options = doc.get("options", [])
+            index = indices[i] if i < len(indices) else UNANSWERED
+            questions.append({
+                "question": doc.get("question", ""),
+                "options": options,
+                "answer": doc.get("answer", "")
+            })
+            user_answers.append(decode_answer(options, index))
+            explanation = doc.get("explanation", "")
+            explanations.append({"questionIndex": i, "explanation": "" if FALLBACK_EXPLANATION_MARKER in explanation else explanation})
+
+        expanded = dict(result)
+        expanded["questions"] = questions
+        expanded["user_answers"] = user_answers
+        expanded["explanations"] = explanations if any(e["explanation"] for e in explanations) else None
+        hydrated.append(expanded)
+
+    return hydrated
+
+async def hydrate_result(db, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Expand a single normalized result"""
+    return (await hydrate_results(db, [result]))[0]
+
+async def normalize_embedded_batch(db, batch: List[Dict[str, Any]]) -> List[UpdateOne]:
+    """Updates rewriting legacy results that embed question copies into the normalized shape
+
+    Used by the normalize_results migration; questions the batch references are
+    stored (deduplicated) as a side effect.
+    """
+    normalized = await normalize_results_questions(db, [
+        {
+            "topic": result.get("topic", ""),
+            "difficulty": result.get("difficulty", ""),
+            "questions": result.get("questions") or [],
+            "user_answers": result.get("user_answers") or [],
+            "explanations": result.get("explanations")
+        }
+        for result in batch
+    ])
+
+    return [
+        UpdateOne(
+            {"_id": result["_id"]},
+            {
+                "$set": {"question_ids": question_ids, "answer_indices": answer_indices},
+                "$unset": {"questions": "", "user_answers": "", "explanations": ""}
+            }
+        )
+        for result, (question_ids, answer_indices) in zip(batch, normalized)
+    ]
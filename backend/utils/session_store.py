@@ -0,0 +1,192 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+
+from utils.cache import LRUCache
+
+load_dotenv()
+
+# "memory" is per worker; "sqlite" shares one WAL file between workers on a host; "mongo" shares across hosts
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE_BACKEND", "memory").lower()
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "14400"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "100000"))
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", "sessions.db")
+SESSION_EVICTION_INTERVAL_SECONDS = float(os.getenv("SESSION_EVICTION_INTERVAL_SECONDS", "60"))
+
+SESSION_COLLECTION = "sessions"
+
+class SessionStore(ABC):
+    """Key/value session state with a TTL; values are JSON-serializable dicts"""
+
+    backend = ""
+
+    def __init__(self, ttl: float = SESSION_TTL_SECONDS, max_entries: int = SESSION_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evicted = 0
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def evict(self) -> int:
+        """Remove expired sessions and trim to max_entries; returns how many were removed"""
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"backend": self.backend, "ttl_seconds": self.ttl, "max_entries": self.max_entries, "evicted": self.evicted}
+
+class MemorySessionStore(SessionStore):
+    """Bounded TTL/LRU store inside one worker"""
+
+    backend = "memory"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._cache = LRUCache(max_size=self.max_entries, ttl=self.ttl)
+
+    async def get(self, key):
+        return self._cache.get(key)
+
+    async def set(self, key, value):
+        self._cache.set(key, value)
+
+    async def delete(self, key):
+        self._cache.pop(key)
+
+    async def evict(self):
+        removed = self._cache.purge_expired()
+        self.evicted += removed
+        return removed
+
+    def metrics(self):
+        return {**super().metrics(), **self._cache.stats()}
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a SQLite file in WAL mode, shared by every worker on the host
+
+    Calls run in a thread so lock waits on the file never block the event loop;
+    the size reported in metrics is the count taken by the last eviction.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str = SESSION_SQLITE_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.size: Optional[int] = None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM sessions WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def get(self, key):
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key, value):
+        now = time.time()
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT OR REPLACE INTO sessions (key, value, expires_at, updated_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now + self.ttl, now)
+        )
+
+    async def delete(self, key):
+        await asyncio.to_thread(self._execute, "DELETE FROM sessions WHERE key = ?", (key,))
+
+    def _evict(self) -> int:
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+            # Least recently written sessions go first once over the cap
+            removed += self._conn.execute(
+                "DELETE FROM sessions WHERE key IN (SELECT key FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+            (self.size,) = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        return removed
+
+    async def evict(self):
+        removed = await asyncio.to_thread(self._evict)
+        self.evicted += removed
+        return removed
+
+    def metrics(self):
+        return {**super().metrics(), "path": self.path, "size": self.size}
+
+class MongoSessionStore(SessionStore):
+    """Sessions in MongoDB, shared by every worker; a TTL index expires them"""
+
+    backend = "mongo"
+
+    async def _collection(self):
+        from database import get_db
+        return (await get_db())[SESSION_COLLECTION]
+
+    async def get(self, key):
+        doc = await (await self._collection()).find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}}, {"value": 1})
+        return doc["value"] if doc else None
+
+    async def set(self, key, value):
+        await (await self._collection()).update_one(
+            {"_id": key},
+            {"$set": {"value": value, "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl)}},
+            upsert=True
+        )
+
+    async def delete(self, key):
+        await (await self._collection()).delete_one({"_id": key})
+
+    async def evict(self):
+        # The TTL monitor runs about once a minute; this keeps reads from seeing stale rows in between
+        result = await (await self._collection()).delete_many({"expires_at": {"$lte": datetime.utcnow()}})
+        self.evicted += result.deleted_count
+        return result.deleted_count
+
+def create_session_store(backend: str = SESSION_STORE_BACKEND) -> SessionStore:
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend == "mongo":
+        return MongoSessionStore()
+    return MemorySessionStore()
+
+session_store = create_session_store()
+
+async def run_session_eviction_loop() -> None:
+    """Periodically evict expired sessions"""
+    while True:
+        await asyncio.sleep(SESSION_EVICTION_INTERVAL_SECONDS)
+        try:
+            removed = await session_store.evict()
+            if removed:
+                print(f"🧹 [SESSIONS] Evicted {removed} expired sessions")
+        except Exception as e:
+            print(f"❌ [SESSIONS] Eviction failed: {e}")
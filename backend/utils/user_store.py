@@ -0,0 +1,184 @@
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from utils.cache import LRUCache
+from utils.invalidation import invalidation_bus
+
+# Rarely read user fields live in side collections keyed by the user's _id
+USER_FACES_COLLECTION = "user_faces"
+USER_SETTINGS_COLLECTION = "user_settings"
+# Until this migration has finished, users not yet migrated still embed those fields
+SIDE_FIELDS_MIGRATION = "split_user_side_fields"
+
+# Lean user profiles keyed by user id string; the TTL bounds staleness across workers
+user_cache = LRUCache(
+    max_size=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+)
+
+# One projection per use case; nothing reads the whole user document
+EXISTS_PROJECTION = {"_id": 1}
+PASSWORD_PROJECTION = {"password": 1}
+CREDENTIALS_PROJECTION = {
+    "email": 1,
+    "password": 1,
+    "username": 1,
+    "name": 1,
+    "profile_picture": 1,
+    "is_admin": 1
+}
+PROFILE_PROJECTION = {
+    "email": 1,
+    "username": 1,
+    "name": 1,
+    "profile_picture": 1,
+    "is_admin": 1,
+    "has_face_descriptor": 1
+}
+IDENTITY_PROJECTION = {"email": 1, "name": 1}
+
+_side_fields_migrated = False
+
+async def side_fields_migrated(db) -> bool:
+    """Whether every user's face descriptor and settings are in the side collections; cached once true"""
+    global _side_fields_migrated
+    if not _side_fields_migrated:
+        from migrations import MIGRATIONS_COLLECTION
+        state = await db[MIGRATIONS_COLLECTION].find_one({"_id": SIDE_FIELDS_MIGRATION}, {"status": 1})
+        _side_fields_migrated = bool(state) and state.get("status") == "done"
+    return _side_fields_migrated
+
+async def get_user_profile(db, user_id: str) -> Optional[Dict[str, Any]]:
+    """Read-through lookup of a user's lean profile; None when the user does not exist"""
+    profile = user_cache.get(user_id)
+    if profile is not None:
+        return profile
+    migrated = await side_fields_migrated(db)
+    projection = PROFILE_PROJECTION if migrated else {**PROFILE_PROJECTION, "face_descriptor": 1}
+    profile = await db.users.find_one({"_id": ObjectId(user_id)}, projection)
+    if profile is not None:
+        descriptor = profile.pop("face_descriptor", None)
+        if not migrated:
+            # Users the migration has not reached only have the embedded descriptor
+            profile["has_face_descriptor"] = bool(profile.get("has_face_descriptor") or descriptor)
+        user_cache.set(user_id, profile)
+    return profile
+
+def invalidate_user(user_id: Any) -> None:
+    """Drop a cached profile here and in every other worker; call after every write to the user document"""
+    user_cache.pop(str(user_id))
+    invalidation_bus.publish("user", str(user_id))
+
+invalidation_bus.register("user", user_cache.pop)
+
+async def email_exists(db, email: str) -> bool:
+    return await db.users.find_one({"email": email}, EXISTS_PROJECTION) is not None
+
+async def find_credentials(db, email: str) -> Optional[Dict[str, Any]]:
+    """Password hash plus the profile fields a login response returns"""
+    return await db.users.find_one({"email": email}, CREDENTIALS_PROJECTION)
+
+async def find_by_email(db, email: str) -> Optional[Dict[str, Any]]:
+    return await db.users.find_one({"email": email}, EXISTS_PROJECTION)
+
+async def get_password_hash(db, user_id: str) -> Optional[str]:
+    """The stored hash, '' for password-less (Google) accounts, None when the user does not exist"""
+    user = await db.users.find_one({"_id": ObjectId(user_id)}, PASSWORD_PROJECTION)
+    return user.get("password", "") if user else None
+
+async def create_user(db, user_doc: Dict[str, Any]) -> ObjectId:
+    """Insert a user, storing any face descriptor or settings in their side collections"""
+    user_doc = dict(user_doc)
+    face_descriptor = user_doc.pop("face_descriptor", None)
+    settings = user_doc.pop("settings", None)
+    user_doc["has_face_descriptor"] = bool(face_descriptor)
+    result = await db.users.insert_one(user_doc)
+    if face_descriptor:
+        await set_face_descriptor(db, result.inserted_id, face_descriptor)
+    if settings:
+        await save_settings(db, result.inserted_id, settings)
+    return result.inserted_id
+
+async def update_user(db, user_id: Any, fields: Dict[str, Any]) -> int:
+    """Set hot profile fields; returns the modified count"""
+    result = await db.users.update_one({"_id": ObjectId(user_id)}, {"$set": fields})
+    invalidate_user(user_id)
+    return result.modified_count
+
+async def set_password(db, user_id: Any, hashed_password: str) -> int:
+    return await update_user(db, user_id, {"password": hashed_password})
+
+async def delete_user(db, user_id: str) -> None:
+    """Delete a user together with their side documents"""
+    oid = ObjectId(user_id)
+    await asyncio.gather(
+        db.users.delete_one({"_id": oid}),
+        db[USER_FACES_COLLECTION].delete_one({"_id": oid}),
+        db[USER_SETTINGS_COLLECTION].delete_one({"_id": oid})
+    )
+    invalidate_user(user_id)
+
+async def set_face_descriptor(db, user_id: Any, descriptor: List[float]) -> bool:
+    """Store a face descriptor; False when the user does not exist"""
+    oid = ObjectId(user_id)
+    result = await db.users.update_one({"_id": oid}, {"$set": {"has_face_descriptor": True}, "$unset": {"face_descriptor": ""}})
+    invalidate_user(user_id)
+    if result.matched_count == 0:
+        return False
+    await db[USER_FACES_COLLECTION].update_one({"_id": oid}, {"$set": {"descriptor": descriptor}}, upsert=True)
+    return True
+
+async def list_face_descriptors(db) -> List[Tuple[ObjectId, List[float]]]:
+    """Every registered descriptor as (user_id, descriptor), for face matching"""
+    faces = {
+        doc["_id"]: doc["descriptor"]
+        async for doc in db[USER_FACES_COLLECTION].find({}, {"descriptor": 1})
+        if doc.get("descriptor")
+    }
+    if not await side_fields_migrated(db):
+        # Descriptors still embedded in users the migration has not reached
+        async for user in db.users.find({"face_descriptor.0": {"$exists": True}}, {"face_descriptor": 1}):
+            if user.get("face_descriptor") and user["_id"] not in faces:
+                faces[user["_id"]] = user["face_descriptor"]
+    return list(faces.items())
+
+async def list_identities(db, user_ids: List[ObjectId]) -> Dict[ObjectId, Dict[str, Any]]:
+    """Names and emails for many users in one query"""
+    users = await db.users.find({"_id": {"$in": user_ids}}, IDENTITY_PROJECTION).to_list(None)
+    return {user["_id"]: user for user in users}
+
+async def get_settings(db, user_id: str) -> Dict[str, Any]:
+    doc = await db[USER_SETTINGS_COLLECTION].find_one({"_id": ObjectId(user_id)}, {"settings": 1})
+    if doc is None and not await side_fields_migrated(db):
+        doc = await db.users.find_one({"_id": ObjectId(user_id)}, {"settings": 1})
+    return (doc or {}).get("settings") or {}
+
+async def save_settings(db, user_id: Any, settings: Dict[str, Any]) -> None:
+    await db[USER_SETTINGS_COLLECTION].update_one(
+        {"_id": ObjectId(user_id)}, {"$set": {"settings": settings}}, upsert=True
+    )
+
+def split_side_fields_batch(batch: List[Dict[str, Any]]) -> Dict[str, List[UpdateOne]]:
+    """Writes moving embedded face descriptors and settings of legacy users into their side collections
+
+    Keyed by collection, side collections first, so an interrupted run never drops data.
+    Side documents written since the deploy are newer than the embedded copies and are kept.
+    """
+    faces, settings, users = [], [], []
+    for user in batch:
+        descriptor = user.get("face_descriptor")
+        if descriptor:
+            faces.append(UpdateOne({"_id": user["_id"]}, {"$setOnInsert": {"descriptor": descriptor}}, upsert=True))
+        if user.get("settings"):
+            settings.append(UpdateOne({"_id": user["_id"]}, {"$setOnInsert": {"settings": user["settings"]}}, upsert=True))
+        users.append(UpdateOne(
+            {"_id": user["_id"]},
+            {
+                "$set": {"has_face_descriptor": bool(descriptor)},
+                "$unset": {"face_descriptor": "", "settings": ""}
+            }
+        ))
+    return {USER_FACES_COLLECTION: faces, USER_SETTINGS_COLLECTION: settings, "users": users}
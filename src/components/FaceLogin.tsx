@@ -4,7 +4,7 @@ import { motion, AnimatePresence } from 'framer-motion';
 import { Link } from 'react-router-dom';
 import { User } from '../types';
 import { useToast } from '../contexts/ToastContext';
-import api from '../utils/api';
+import api, { storeTokens } from '../utils/api';
 import Button from './ui/Button';
 import LoadingSpinner from './ui/LoadingSpinner';
 
@@ -220,7 +220,7 @@ const FaceLogin: React.FC<FaceLoginProps> = ({ onSuccess, onCancel }) => {
         setShowSuccessAnimation(true);
         
         // Store auth data
-        localStorage.setItem('access_token', response.data.access_token);
+        storeTokens(response.data);
         localStorage.setItem('user', JSON.stringify(response.data.user));
         
         // Wait for animation then navigate
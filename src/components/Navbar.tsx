@@ -7,7 +7,7 @@ import { useToast } from "../contexts/ToastContext";
 import ThemeToggle from "./ui/ThemeToggle";
 import UserProfileDropdown from "./ui/UserProfileDropdown";
 import BackendStatusIndicator from "./BackendStatusIndicator";
-import api from "../utils/api";
+import { logoutSession } from "../utils/api";
 import { ANIMATION_VARIANTS, TRANSITION_DEFAULTS } from "../utils/constants";
 
 interface NavbarProps {
@@ -37,17 +37,13 @@ const Navbar: React.FC<NavbarProps> = ({ user, setUser }) => {
 
     const handleLogout = useCallback(async () => {
         try {
-            await api.post("/auth/logout");
-            localStorage.removeItem('access_token');
-            localStorage.removeItem('user');
+            await logoutSession();
             setUser(null);
             success('Logout Successful!', 'You have been logged out successfully.');
             navigate("/login", { replace: true });
         } catch (error) {
             console.error("Logout failed:", error);
-            // Still logout locally even if server logout fails
-            localStorage.removeItem('access_token');
-            localStorage.removeItem('user');
+            // logoutSession clears the local session even if the server call fails
             setUser(null);
             success('Logout Successful!', 'You have been logged out successfully.');
             navigate("/login", { replace: true });
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import { User } from '../types';
-import api from '../utils/api';
+import api, { clearTokens, logoutSession } from '../utils/api';
 
 export const useAuth = () => {
   const [user, setUser] = useState<User | null>(() => {
@@ -29,14 +29,12 @@ export const useAuth = () => {
         } else {
           console.log('🔐 [AUTH] Token invalid, clearing session');
           setUser(null);
-          localStorage.removeItem('user');
-          localStorage.removeItem('access_token');
+          clearTokens();
         }
       } catch (error) {
         console.error('❌ [AUTH] Auth check failed:', error);
         setUser(null);
-        localStorage.removeItem('user');
-        localStorage.removeItem('access_token');
+        clearTokens();
       } finally {
         setIsLoading(false);
       }
@@ -54,11 +52,14 @@ export const useAuth = () => {
     }
   };
 
-  const logout = () => {
+  const logout = async () => {
     console.log('🔐 [AUTH] User logged out');
     setUser(null);
-    localStorage.removeItem('user');
-    localStorage.removeItem('access_token');
+    try {
+      await logoutSession();
+    } catch (error) {
+      console.error('❌ [AUTH] Server logout failed:', error);
+    }
   };
 
   return { user, setUser: login, logout, isLoading };
@@ -9,7 +9,7 @@ import Card from "../components/ui/Card";
 import Button from "../components/ui/Button";
 import Input from "../components/ui/Input";
 import LoadingSpinner from "../components/ui/LoadingSpinner";
-import api from "../utils/api";
+import api, { clearTokens } from "../utils/api";
 import { ANIMATION_VARIANTS, TRANSITION_DEFAULTS } from "../utils/constants";
 
 interface AssessConfigProps {
@@ -39,8 +39,7 @@ const AssessConfig: React.FC<AssessConfigProps> = ({ user }) => {
 
                 const response = await api.get('/auth/status');
                 if (!response.data.isAuthenticated) {
-                    localStorage.removeItem('access_token');
-                    localStorage.removeItem('user');
+                    clearTokens();
                     navigate('/login', { replace: true });
                     return;
                 }
@@ -48,8 +47,7 @@ const AssessConfig: React.FC<AssessConfigProps> = ({ user }) => {
                 setIsLoading(false);
             } catch (error) {
                 console.error('Auth check failed:', error);
-                localStorage.removeItem('access_token');
-                localStorage.removeItem('user');
+                clearTokens();
                 navigate('/login', { replace: true });
             }
         };
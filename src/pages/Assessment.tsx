@@ -9,20 +9,20 @@ import Card from "../components/ui/Card";
 import Button from "../components/ui/Button";
 import LoadingState from "../components/LoadingState";
 import ErrorState from "../components/ErrorState";
-import api from "../utils/api";
+import api, { clearTokens } from "../utils/api";
 import { ANIMATION_VARIANTS, TRANSITION_DEFAULTS } from "../utils/constants";
 
 interface AssessmentProps {
     user: User;
 }
 
-const Assessment: React.FC<AssessmentProps> = ({ user }) => {
+const Assessment: React.FC<AssessmentProps> = () => {
     const { mode, colorScheme } = useTheme();
     const { success, error: showError } = useToast();
     const [currentQuestion, setCurrentQuestion] = useState(0);
     const [userAnswers, setUserAnswers] = useState<string[]>([]);
-    const [score, setScore] = useState(0);
-    const [questions, setQuestions] = useState<Question[]>([]);
+    // The server keeps the answer key; questions arrive without answers
+    const [questions, setQuestions] = useState<Pick<Question, 'question' | 'options'>[]>([]);
     const [loading, setLoading] = useState(true);
     const [progress, setProgress] = useState(0);
     const [config, setConfig] = useState<AssessmentConfig | null>(null);
@@ -30,6 +30,7 @@ const Assessment: React.FC<AssessmentProps> = ({ user }) => {
     const [isAuthChecking, setIsAuthChecking] = useState(true);
     const [timeRemaining, setTimeRemaining] = useState<number | null>(null);
     const [isSubmitting, setIsSubmitting] = useState(false); // Add flag to prevent multiple submissions
+    const [attemptId, setAttemptId] = useState<string | null>(null); // Server-side attempt: timer, grading and autosave
     const navigate = useNavigate();
     const questionsFetched = useRef(false);
     const timerRef = useRef<NodeJS.Timeout | null>(null);
@@ -44,16 +45,14 @@ const Assessment: React.FC<AssessmentProps> = ({ user }) => {
                 }
                 const response = await api.get('/auth/status');
                 if (!response.data.isAuthenticated) {
-                    localStorage.removeItem('access_token');
-                    localStorage.removeItem('user');
+                    clearTokens();
                     navigate('/login', { replace: true });
                     return;
                 }
                 setIsAuthChecking(false);
             } catch (error) {
                 console.error('Auth check failed:', error);
-                localStorage.removeItem('access_token');
-                localStorage.removeItem('user');
+                clearTokens();
                 navigate('/login', { replace: true });
             }
         };
@@ -93,22 +92,24 @@ const Assessment: React.FC<AssessmentProps> = ({ user }) => {
             const totalTime = getDifficultyTime(difficulty, qnCount);
             setTimeRemaining(totalTime);
                         
-            console.log("🤖 [ASSESSMENT] Fetching questions from Gemini AI...");
-            const geminiResponse = await api.get("/db/questions", {
-                params: {
-                    topic,
-                    difficulty,
-                    count: qnCount
-                }
+            // Start the server-side attempt; the server picks the questions and keeps the answer key and the deadline
+            console.log("🤖 [ASSESSMENT] Starting attempt...");
+            const attemptResponse = await api.post("/api/attempts", {
+                topic,
+                difficulty,
+                count: qnCount,
+                time_limit_seconds: totalTime
             });
+            const attempt = attemptResponse.data.attempt;
                         
-            console.log("✅ [ASSESSMENT] Questions received from Gemini AI");
-                        
-            if (!Array.isArray(geminiResponse.data) || geminiResponse.data.length === 0) {
+            if (!Array.isArray(attempt?.questions) || attempt.questions.length === 0) {
                 throw new Error('No questions were generated. Please try again.');
             }
+            console.log("📝 [ASSESSMENT] Attempt started:", attempt.id);
+            setAttemptId(attempt.id);
+            setTimeRemaining(Math.round(attempt.remaining_seconds));
                         
-            setQuestions(geminiResponse.data);
+            setQuestions(attempt.questions);
             setLoading(false);
         } catch (error: any) {
             console.error("❌ [ASSESSMENT] Error fetching questions:", error);
@@ -127,25 +128,33 @@ const Assessment: React.FC<AssessmentProps> = ({ user }) => {
         }
     }, []);
 
-    const handleEndAssessment = useCallback(async (finalScore: number) => {
+    const handleEndAssessment = useCallback(async () => {
         if (isSubmitting) return; // Prevent multiple submissions
         setIsSubmitting(true);
         try {
-            if (!config) {
+            if (!config || !attemptId) {
                 throw new Error('No assessment configuration found');
             }
 
-            // Calculate time taken
-            const totalTime = getDifficultyTime(config.difficulty, config.qnCount);
-            const timeTaken = Math.max(0, totalTime - (timeRemaining || 0));
-            console.log(`⏱️ [ASSESSMENT] Assessment completed - Time taken: ${timeTaken}s, Score: ${finalScore}/${config.qnCount}`);
+            // The server grades from its answer key; the full answer map covers saves that did not arrive
+            console.log("📤 Submitting attempt:", attemptId);
+            const response = await api.post(`/api/attempts/${attemptId}/submit`, {
+                answers: Object.fromEntries(userAnswers.map((answer, index) => [index, answer]))
+            });
+                        
+            if (!response.data.success) {
+                throw new Error(response.data.error || 'Failed to save results');
+            }
+            const { score: savedScore, time_taken: timeTaken } = response.data.result;
+            const gradedQuestions: Question[] = response.data.questions;
+            console.log(`⏱️ [ASSESSMENT] Assessment completed - Time taken: ${timeTaken}s, Score: ${savedScore}/${questions.length}`);
 
-            // Fetch explanations for questions
+            // Fetch explanations for the graded questions
             let explanations = [];
             try {
                 console.log("🤖 [ASSESSMENT] Fetching explanations from Gemini AI...");
                 const explanationsResponse = await api.post("/db/questions/explanations", {
-                    questions: questions,
+                    questions: gradedQuestions,
                     topic: config.topic,
                     difficulty: config.difficulty
                 });
@@ -161,43 +170,20 @@ const Assessment: React.FC<AssessmentProps> = ({ user }) => {
                 // Continue without explanations if they fail
                 console.log("⚠️ Continuing assessment completion without explanations");
             }
-
-            const result = {
-                user_id: user._id || user.id,
-                score: finalScore,
-                total_questions: questions.length,
-                questions: questions.map(q => ({
-                    question: q.question,
-                    options: q.options,
-                    answer: q.answer
-                })),
-                user_answers: userAnswers,
-                topic: config.topic,
-                difficulty: config.difficulty,
-                time_taken: timeTaken,
-                explanations: explanations
-            };
-            
-            console.log("📤 Saving result with enhanced data:", result);
-            const response = await api.post("/api/results", result);
-                        
-            if (!response.data.success) {
-                throw new Error(response.data.error || 'Failed to save results');
-            }
                         
             // Clear timer
             if (timerRef.current) {
                 clearInterval(timerRef.current);
             }
 
-            success('Assessment Complete!', `You scored ${finalScore}/${questions.length}`);
+            success('Assessment Complete!', `You scored ${savedScore}/${questions.length}`);
                         
             const resultState = {
-                score: finalScore,
+                score: savedScore,
                 totalQuestions: questions.length,
                 topic: config.topic,
                 difficulty: config.difficulty,
-                questions: questions,
+                questions: gradedQuestions,
                 userAnswers: userAnswers,
                 timeTaken: timeTaken,
                 explanations: explanations // Include explanations in state
@@ -220,7 +206,7 @@ const Assessment: React.FC<AssessmentProps> = ({ user }) => {
         } finally {
             setIsSubmitting(false);
         }
-    }, [config, questions, userAnswers, navigate, user._id, success, timeRemaining, isSubmitting]);
+    }, [config, attemptId, questions, userAnswers, navigate, success, isSubmitting]);
 
     useEffect(() => {
         if (!questionsFetched.current && !isAuthChecking) {
@@ -231,13 +217,7 @@ const Assessment: React.FC<AssessmentProps> = ({ user }) => {
 
     useEffect(() => {
         if (userAnswers.length === questions.length && questions.length > 0 && !isSubmitting) {
-            const newScore = userAnswers.reduce((acc, answer, index) => {
-                const correctAnswer = questions[index]?.answer;
-                const isCorrect = correctAnswer && answer === correctAnswer;
-                return isCorrect ? acc + 1 : acc;
-            }, 0);
-            setScore(newScore);
-            handleEndAssessment(newScore);
+            handleEndAssessment();
         }
     }, [userAnswers, questions, handleEndAssessment, isSubmitting]);
 
@@ -264,12 +244,8 @@ const Assessment: React.FC<AssessmentProps> = ({ user }) => {
                 setTimeRemaining(prev => {
                     if (prev === null || prev <= 1) {
                         // Time's up - auto submit
-                        const finalScore = userAnswers.reduce((acc, answer, index) => {
-                            const correctAnswer = questions[index]?.answer;
-                            return answer === correctAnswer ? acc + 1 : acc;
-                        }, 0);
                         showError('Time Up!', 'Assessment has been automatically submitted');
-                        handleEndAssessment(finalScore);
+                        handleEndAssessment();
                         return 0;
                     }
                     return prev - 1;
@@ -282,14 +258,19 @@ const Assessment: React.FC<AssessmentProps> = ({ user }) => {
                 }
             };
         }
-    }, [timeRemaining, loading, userAnswers, questions, handleEndAssessment, error, isSubmitting]);
+    }, [timeRemaining, loading, handleEndAssessment, error, isSubmitting]);
 
     const handleAnswer = useCallback((answer: string) => {
         setUserAnswers(prevAnswers => [...prevAnswers, answer]);
+        if (attemptId) {
+            // Autosave; the submission resends every answer, so a failed save is not lost
+            api.put(`/api/attempts/${attemptId}/answers`, { answers: { [currentQuestion]: answer } })
+                .catch((err) => console.error("⚠️ [ASSESSMENT] Autosave failed:", err));
+        }
         if (currentQuestion < questions.length - 1) {
             setCurrentQuestion(prev => prev + 1);
         }
-    }, [currentQuestion, questions.length]);
+    }, [attemptId, currentQuestion, questions.length]);
 
     const formatTime = (seconds: number): string => {
         const minutes = Math.floor(seconds / 60);
@@ -9,7 +9,7 @@ import Card from "../components/ui/Card";
 import Button from "../components/ui/Button";
 import Input from "../components/ui/Input";
 import FaceLogin from "../components/FaceLogin";
-import api from "../utils/api";
+import api, { storeTokens } from "../utils/api";
 import { ANIMATION_VARIANTS, TRANSITION_DEFAULTS } from "../utils/constants";
 
 interface LoginProps {
@@ -28,9 +28,9 @@ const Login: React.FC<LoginProps> = ({ setUser }) => {
     const navigate = useNavigate();
     const [searchParams] = useSearchParams();
 
-    // Handle Google OAuth callback
+    // Handle Google OAuth callback: redeem the one-time code for tokens
     useEffect(() => {
-        const token = searchParams.get('token');
+        const code = searchParams.get('code');
         const errorParam = searchParams.get('error');
         
         if (errorParam) {
@@ -41,38 +41,28 @@ const Login: React.FC<LoginProps> = ({ setUser }) => {
             return;
         }
         
-        if (token) {
-            console.log('🔐 [GOOGLE_LOGIN] Processing OAuth token');
-            // Handle successful Google OAuth callback
-            localStorage.setItem('access_token', token);
+        if (code) {
+            console.log('🔐 [GOOGLE_LOGIN] Redeeming OAuth login code');
+            // Drop the code from the URL right away; it only works once
+            navigate('/login', { replace: true });
             
-            // Fetch user info using the token
-            const fetchUserInfo = async () => {
+            const exchangeCode = async () => {
                 try {
-                    console.log('🔐 [GOOGLE_LOGIN] Fetching user profile');
-                    const response = await api.get('/auth/status', {
-                        headers: {
-                            'Authorization': `Bearer ${token}`
-                        }
-                    });
-                    
-                    if (response.data.isAuthenticated && response.data.user) {
-                        console.log('✅ [GOOGLE_LOGIN] Login successful for:', response.data.user.email);
-                        setUser(response.data.user);
-                        success('Google Login Successful!', `Welcome back, ${response.data.user.name || response.data.user.username}!`);
-                        navigate("/dashboard", { replace: true });
-                    } else {
-                        console.log('❌ [GOOGLE_LOGIN] Authentication failed');
-                        throw new Error('Failed to get user info');
-                    }
+                    const response = await api.post('/auth/google/exchange', { code });
+                    const { user } = response.data;
+                    storeTokens(response.data);
+                    localStorage.setItem('user', JSON.stringify(user));
+                    console.log('✅ [GOOGLE_LOGIN] Login successful for:', user.email);
+                    setUser(user);
+                    success('Google Login Successful!', `Welcome back, ${user.name || user.username}!`);
+                    navigate("/dashboard", { replace: true });
                 } catch (err: any) {
                     console.error("❌ [GOOGLE_LOGIN] Error:", err);
                     error('Google Login Failed', 'Failed to complete Google login. Please try again.');
-                    localStorage.removeItem('access_token');
                 }
             };
             
-            fetchUserInfo();
+            exchangeCode();
         }
     }, [searchParams, setUser, success, error, navigate]);
 
@@ -93,8 +83,8 @@ const Login: React.FC<LoginProps> = ({ setUser }) => {
             const response = await api.post("/auth/login", formData);
             
             if (response.data.success) {
-                const { access_token, user } = response.data;
-                localStorage.setItem('access_token', access_token);
+                const { user } = response.data;
+                storeTokens(response.data);
                 localStorage.setItem('user', JSON.stringify(user));
                 setUser(user);
                 console.log('✅ [LOGIN] Login successful for:', user.email);
@@ -8,7 +8,7 @@ import AnimatedBackground from "../components/AnimatedBackground";
 import Card from "../components/ui/Card";
 import Button from "../components/ui/Button";
 import Input from "../components/ui/Input";
-import api from "../utils/api";
+import api, { storeTokens } from "../utils/api";
 import { ANIMATION_VARIANTS, TRANSITION_DEFAULTS } from "../utils/constants";
 
 interface SignupProps {
@@ -54,9 +54,7 @@ const Signup: React.FC<SignupProps> = ({ setUser }) => {
                 password: formData.password
             });
 
-            if (response.data.access_token) {
-                localStorage.setItem('access_token', response.data.access_token);
-            }
+            storeTokens(response.data);
             
             setUser(response.data.user);
             success('Registration Successful!', `Welcome, ${response.data.user.name || response.data.user.username}!`);
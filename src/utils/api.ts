@@ -1,4 +1,4 @@
-import axios, { AxiosResponse } from 'axios';
+import axios, { AxiosResponse, InternalAxiosRequestConfig } from 'axios';
 import { ApiResponse } from '../types';
 
 // Environment-based API configuration
@@ -23,6 +23,57 @@ const api = axios.create({
     timeout: 30000, // 30 second timeout - increased from 10 seconds
 });
 
+// Token storage shared by every login flow
+export const storeTokens = (data: { access_token?: string; refresh_token?: string }) => {
+    if (data.access_token) {
+        localStorage.setItem('access_token', data.access_token);
+    }
+    if (data.refresh_token) {
+        localStorage.setItem('refresh_token', data.refresh_token);
+    }
+};
+
+export const clearTokens = () => {
+    localStorage.removeItem('access_token');
+    localStorage.removeItem('refresh_token');
+    localStorage.removeItem('user');
+};
+
+// Revoke the session server-side, then forget it locally
+export const logoutSession = async () => {
+    const refreshToken = localStorage.getItem('refresh_token');
+    try {
+        await api.post('/auth/logout', refreshToken ? { refresh_token: refreshToken } : undefined);
+    } finally {
+        clearTokens();
+    }
+};
+
+// Endpoints whose 401 means bad credentials, not an expired access token
+const NO_REFRESH_PATHS = ['/auth/login', '/auth/register', '/auth/face', '/auth/google/exchange', '/auth/refresh', '/auth/logout'];
+
+// A single refresh in flight; concurrent 401s wait for it instead of rotating twice
+let refreshing: Promise<string | null> | null = null;
+
+const refreshAccessToken = (): Promise<string | null> => {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (!refreshToken) {
+        return Promise.resolve(null);
+    }
+    if (!refreshing) {
+        refreshing = axios.post(`${getApiBaseUrl()}/auth/refresh`, { refresh_token: refreshToken }, { withCredentials: true })
+            .then((response) => {
+                storeTokens(response.data);
+                return response.data.access_token as string;
+            })
+            .catch(() => null)
+            .finally(() => {
+                refreshing = null;
+            });
+    }
+    return refreshing;
+};
+
 // Request interceptor to add auth token
 api.interceptors.request.use(
     (config) => {
@@ -45,12 +96,21 @@ api.interceptors.response.use(
     (response: AxiosResponse) => {
         return response;
     },
-    (error) => {
+    async (error) => {
+        const original = error.config as (InternalAxiosRequestConfig & { _retried?: boolean }) | undefined;
+        if (error.response?.status === 401 && original && !original._retried && !NO_REFRESH_PATHS.includes(original.url || '')) {
+            // Access tokens are short-lived; rotate the refresh token once and replay the request
+            original._retried = true;
+            const accessToken = await refreshAccessToken();
+            if (accessToken) {
+                original.headers.Authorization = `Bearer ${accessToken}`;
+                return api(original);
+            }
+        }
         if (error.response?.status === 401) {
             console.log('🔐 [API] Unauthorized request, clearing token');
             // Clear invalid token
-            localStorage.removeItem('access_token');
-            localStorage.removeItem('user');
+            clearTokens();
             // Redirect to login only if not already on login page
             if (window.location.pathname !== '/login') {
                 window.location.href = '/login';